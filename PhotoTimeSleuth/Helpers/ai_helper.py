@@ -1,15 +1,136 @@
+import asyncio
 import base64
+import functools
+import io
+import logging
+import os
+import queue
+import random
 import re
-from typing import Optional
+import threading
+import time
+from collections.abc import AsyncIterator, Iterable, Iterator
+from typing import TYPE_CHECKING, Optional
 
-import openai
+from PhotoTimeSleuth.Helpers.metrics_helper import METRICS, timed
+from PhotoTimeSleuth.Helpers.thumbnail_helper import load_thumbnail
 
-import logging
+if TYPE_CHECKING:  # openai takes most of a second to import, so it is deferred
+    import openai
 
 logger = logging.getLogger(__name__)
 
+MODEL = "gpt-4o"
+PROMPT = (
+    "Estimate the date this photo was taken. "
+    "Respond only with a date in YYYY-MM-DD format."
+)
+# Bump whenever PROMPT or the image preprocessing changes, so cached
+# estimates made with the old version are not reused
+PROMPT_VERSION = 1
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE_LIMIT = 2.0  # Requests per second
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # Seconds, doubled on every retry
+BACKOFF_MAX = 60.0
+
+# Images are downsized and re-encoded before upload; the model does not see
+# more detail than this in any case and the payload stays small.
+DEFAULT_MAX_EDGE = 1024
+DEFAULT_MAX_PAYLOAD_BYTES = 512 * 1024
+JPEG_QUALITIES = (85, 75, 65, 50, 35)
+MIN_EDGE = 256
+
+# (image path, estimated date or None, error message or None)
+Estimate = tuple[str, Optional[str], Optional[str]]
+
+
+def _build_messages(encoded: str) -> list:
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": PROMPT},
+                {
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/jpeg;base64,{encoded}"},
+                },
+            ],
+        }
+    ]
+
+
+def prepare_image(
+    image_path: str,
+    max_edge: int = DEFAULT_MAX_EDGE,
+    max_bytes: int = DEFAULT_MAX_PAYLOAD_BYTES,
+) -> bytes:
+    """Return a JPEG of the image for the estimator.
+
+    The image is decoded through the thumbnail pipeline (EXIF orientation,
+    reduced-scale JPEG decode) so its long edge is at most ``max_edge``. It is
+    then encoded with decreasing quality, and halved in size if needed, until
+    it fits in ``max_bytes``.
+    """
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        edge = min(max_edge, max(img.size))
+    image, _ = load_thumbnail(image_path, edge, edge)
+    while True:
+        for quality in JPEG_QUALITIES:
+            img_io = io.BytesIO()
+            image.save(img_io, format="JPEG", quality=quality, optimize=True)
+            if img_io.tell() <= max_bytes:
+                return img_io.getvalue()
+        if max(image.size) // 2 < MIN_EDGE:
+            return img_io.getvalue()  # Best effort
+        image = image.reduce(2)
+
+
+@timed("ai_prepare")
+def _encode_image(image_path: str, max_edge: int = DEFAULT_MAX_EDGE) -> str:
+    data = prepare_image(image_path, max_edge)
+    logger.debug(
+        f"Prepared '{image_path}' for AI: {os.path.getsize(image_path)} bytes "
+        f"on disk, {len(data)} bytes uploaded"
+    )
+    return base64.b64encode(data).decode("utf-8")
+
 
-def ask_ai_for_date(image_path: str, api_key: str) -> Optional[str]:
+def _log_request(image_path: str, encoded: str, start: float) -> None:
+    elapsed = time.perf_counter() - start
+    METRICS.observe_phase("ai_request", elapsed)
+    logger.info(
+        f"AI request for '{image_path}': {len(encoded)} byte payload, "
+        f"{elapsed * 1000:.0f} ms"
+    )
+
+
+def _parse_date(message: str) -> Optional[str]:
+    message = message.strip()
+    match = re.search(r"\d{4}[-:]\d{2}[-:]\d{2}", message)
+    if match:
+        return match.group(0).replace(":", "-")
+    logger.error(f"ERROR: Failed to get date from AI | Response: {message}")
+    return None
+
+
+@functools.lru_cache(maxsize=4)
+def get_client(api_key: str, base_url: Optional[str] = None) -> "openai.OpenAI":
+    """Return a shared client so its connection pool is reused between calls."""
+    import openai
+
+    return openai.OpenAI(api_key=api_key, base_url=base_url)
+
+
+def ask_ai_for_date(
+    image_path: str,
+    api_key: str,
+    base_url: Optional[str] = None,
+    max_edge: int = DEFAULT_MAX_EDGE,
+) -> Optional[str]:
     """Send the given image to OpenAI to estimate a date.
 
     Parameters
@@ -18,6 +139,10 @@ def ask_ai_for_date(image_path: str, api_key: str) -> Optional[str]:
         Path to the image file.
     api_key: str
         OpenAI API key.
+    base_url: Optional[str]
+        Alternative chat-completions endpoint, e.g. a local stand-in server.
+    max_edge: int
+        Long edge in pixels the image is downsized to before it is sent.
 
     Returns
     -------
@@ -26,37 +151,210 @@ def ask_ai_for_date(image_path: str, api_key: str) -> Optional[str]:
         response, otherwise ``None``.
     """
 
-    client = openai.OpenAI(api_key=api_key)
-
-    with open(image_path, "rb") as img_file:
-        encoded = base64.b64encode(img_file.read()).decode("utf-8")
+    client = get_client(api_key, base_url)
+    encoded = _encode_image(image_path, max_edge)
 
+    start = time.perf_counter()
     response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": (
-                            "Estimate the date this photo was taken. "
-                            "Respond only with a date in YYYY-MM-DD format."
-                        ),
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{encoded}"},
-                    },
-                ],
-            }
-        ],
+        model=MODEL,
+        messages=_build_messages(encoded),
         max_tokens=20,
     )
+    _log_request(image_path, encoded, start)
 
-    message = response.choices[0].message.content.strip()
-    match = re.search(r"\d{4}[-:]\d{2}[-:]\d{2}", message)
-    if match:
-        return match.group(0).replace(":", "-")
-    logger.error(f"ERROR: Failed to get date from AI | Response: {message}")
-    return None
+    return _parse_date(response.choices[0].message.content)
+
+
+class TokenBucket:
+    """Asyncio token bucket allowing ``rate`` requests per second on average."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying, honouring a Retry-After header."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except (TypeError, ValueError):
+            pass
+    delay = min(BACKOFF_BASE * 2**attempt, BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def _estimate_one(
+    client: "openai.AsyncOpenAI",
+    image_path: str,
+    semaphore: asyncio.Semaphore,
+    bucket: TokenBucket,
+    max_retries: int,
+    max_edge: int,
+) -> Estimate:
+    # Any failure (unreadable or oversized image, unexpected client error)
+    # becomes the error of this photo rather than ending the whole batch
+    async with semaphore:
+        try:
+            return await _request_estimate(
+                client, image_path, bucket, max_retries, max_edge
+            )
+        except Exception as e:
+            logger.error(f"ERROR: AI estimate of '{image_path}' failed | Reason: {e}")
+            return image_path, None, str(e) or type(e).__name__
+
+
+async def _request_estimate(
+    client: "openai.AsyncOpenAI",
+    image_path: str,
+    bucket: TokenBucket,
+    max_retries: int,
+    max_edge: int,
+) -> Estimate:
+    import openai
+
+    encoded = await asyncio.to_thread(_encode_image, image_path, max_edge)
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        start = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(
+                model=MODEL,
+                messages=_build_messages(encoded),
+                max_tokens=20,
+            )
+        except (
+            openai.RateLimitError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+        ) as e:
+            if attempt == max_retries:
+                return image_path, None, str(e)
+            delay = _retry_delay(e, attempt)
+            logger.warning(
+                f"AI request for '{image_path}' failed ({type(e).__name__}), "
+                f"retrying in {delay:.1f} s"
+            )
+            await asyncio.sleep(delay)
+            continue
+        _log_request(image_path, encoded, start)
+
+        date = _parse_date(response.choices[0].message.content or "")
+        return image_path, date, None if date else "Not Sure on Date"
+    return image_path, None, "Retries exhausted"  # pragma: no cover
+
+
+async def estimate_dates_async(
+    image_paths: Iterable[str],
+    api_key: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate_limit: float = DEFAULT_RATE_LIMIT,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    base_url: Optional[str] = None,
+    max_edge: int = DEFAULT_MAX_EDGE,
+) -> AsyncIterator[Estimate]:
+    """Estimate dates of many photos, yielding results as they complete.
+
+    A single client (and connection pool) is shared by all requests. At most
+    ``concurrency`` requests are in flight, new requests are started at no
+    more than ``rate_limit`` per second, and rate-limit (429), connection and
+    server errors are retried with exponential backoff.
+
+    Yields
+    ------
+    Estimate
+        ``(image_path, date or None, error or None)`` tuples.
+    """
+    import openai
+
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate_limit)
+    # Retries are handled here so they count against the rate limit
+    client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+    try:
+        tasks = [
+            asyncio.ensure_future(
+                _estimate_one(client, path, semaphore, bucket, max_retries, max_edge)
+            )
+            for path in image_paths
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+    finally:
+        await client.close()
+
+
+def iter_estimated_dates(
+    image_paths: Iterable[str], api_key: str, **kwargs
+) -> Iterator[Estimate]:
+    """Blocking wrapper around :func:`estimate_dates_async`.
+
+    The event loop runs in a background thread so results can be streamed
+    from synchronous code such as a Flask response generator. Closing the
+    iterator early (e.g. when the client disconnects) cancels the requests
+    still pending or in flight.
+    """
+    results: queue.Queue = queue.Queue()
+    done = object()
+
+    async def produce():
+        try:
+            async for estimate in estimate_dates_async(image_paths, api_key, **kwargs):
+                results.put(estimate)
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    loop = asyncio.new_event_loop()
+    producer = loop.create_task(produce())
+
+    def run():
+        try:
+            try:
+                loop.run_until_complete(producer)
+            except asyncio.CancelledError:
+                pass
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            loop.close()
+
+    thread = threading.Thread(target=run, name="ai-estimates", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if not producer.done():
+            try:
+                loop.call_soon_threadsafe(producer.cancel)
+            except RuntimeError:
+                pass  # The loop finished meanwhile
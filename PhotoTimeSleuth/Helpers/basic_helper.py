@@ -1,7 +1,6 @@
-import psutil
-
-
 def get_local_ip():
+    import psutil
+
     for _, addrs in psutil.net_if_addrs().items():
         for addr in addrs:
             if addr.family == 2 and addr.address.startswith("192.168.1."):
@@ -0,0 +1,239 @@
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from datetime import datetime
+
+from PhotoTimeSleuth.Helpers.exif_helper import read_image_date
+from PhotoTimeSleuth.Helpers.image_helper import change_image_date
+
+logger = logging.getLogger(__name__)
+
+HEADER_NAMES = ("filename", "file", "name", "image", "image_path")
+DATE_FORMATS = ("%Y-%m-%d", "%Y:%m:%d")
+TIME_FORMATS = ("%H:%M:%S", "%H:%M")
+
+
+class CsvRowError(ValueError):
+    pass
+
+
+def _parse(value, formats, what):
+    for fmt in formats:
+        try:
+            return datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            pass
+    raise CsvRowError(f"Invalid {what} '{value}'")
+
+
+def load_date_rows(csv_path):
+    """
+    Read a CSV of filename, date (YYYY-MM-DD or YYYY:MM:DD) and optional time.
+
+    A header row is skipped when its first cell is a column name like
+    "filename".
+
+    :return: (rows, errors). Rows are (filename, 'YYYY:MM:DD', 'HH:MM:SS')
+             tuples; errors are (line number, filename, message) tuples.
+    """
+    rows, errors, seen = [], [], set()
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for line_number, record in enumerate(csv.reader(f), start=1):
+            if not record or not any(cell.strip() for cell in record):
+                continue
+            if line_number == 1 and record[0].strip().lower() in HEADER_NAMES:
+                continue
+            filename = record[0].strip()
+            try:
+                if len(record) < 2 or not record[1].strip():
+                    raise CsvRowError("Missing date")
+                if os.path.basename(filename) != filename or filename in ("", ".."):
+                    raise CsvRowError("Filename must not contain a directory")
+                if filename in seen:
+                    raise CsvRowError("Duplicate filename")
+                date = _parse(record[1], DATE_FORMATS, "date").strftime("%Y:%m:%d")
+                new_time = "00:00:00"
+                if len(record) > 2 and record[2].strip():
+                    new_time = _parse(record[2], TIME_FORMATS, "time").strftime(
+                        "%H:%M:%S"
+                    )
+            except CsvRowError as e:
+                errors.append((line_number, filename, str(e)))
+                continue
+            seen.add(filename)
+            rows.append((filename, date, new_time))
+    return rows, errors
+
+
+class _RecordedChange:
+    """Stands in for a ChangeJournal in workers; the parent journals the change."""
+
+    def __init__(self):
+        self.old_dates = None
+
+    def record(self, image_path, old_dates, new_date):
+        self.old_dates = old_dates
+
+
+def _init_worker():
+    # Failures are returned to the parent, which reports and logs them
+    logging.getLogger().addHandler(logging.NullHandler())
+
+
+def _apply_one(image_path, date, new_time):
+    change = _RecordedChange()
+    success, message = change_image_date(
+        image_path, date, journal=change, new_time=new_time
+    )
+    return success, message, change.old_dates
+
+
+def _load_state(state_path):
+    """Return the files a previous run already changed."""
+    done = set()
+    if not os.path.isfile(state_path):
+        return done
+    with open(state_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn last line of an interrupted run
+            if entry.get("status") == "ok":
+                done.add(entry["file"])
+    return done
+
+
+def apply_dates(
+    rows,
+    directory,
+    workers=None,
+    dry_run=False,
+    state_path=None,
+    resume=False,
+    journal=None,
+    progress=None,
+):
+    """
+    Apply dates to many photos with ``change_image_date`` in a process pool.
+
+    Each finished file is appended to ``state_path``, so an interrupted run
+    continues where it stopped when called again with ``resume``.
+
+    :param rows: (filename, 'YYYY:MM:DD', 'HH:MM:SS') tuples from
+                 :func:`load_date_rows`.
+    :param directory: Directory the filenames are relative to.
+    :param workers: Number of processes, default one per CPU.
+    :param dry_run: Only report what would change.
+    :param state_path: Progress file for ``resume``, or None.
+    :param resume: Skip files a previous run with the same state file changed.
+    :param journal: Optional ``ChangeJournal`` recording every change.
+    :param progress: Optional callable taking each result dict.
+    :return: Summary dict with counts, bytes, seconds and per-file "errors".
+    """
+    done = _load_state(state_path) if resume and state_path else set()
+    summary = {
+        "changed": 0,
+        "skipped": 0,
+        "failed": 0,
+        "bytes": 0,
+        "seconds": 0.0,
+        "errors": [],
+    }
+    tasks = []
+    for filename, date, new_time in rows:
+        if filename in done:
+            summary["skipped"] += 1
+            continue
+        image_path = os.path.join(directory, filename)
+        try:
+            size = os.path.getsize(image_path)
+        except OSError as e:
+            message = e.strerror or str(e)
+            summary["failed"] += 1
+            summary["errors"].append((filename, message))
+            if progress is not None:
+                progress({"file": filename, "status": "error", "error": message})
+            continue
+        tasks.append((filename, image_path, date, new_time, size))
+
+    start = time.perf_counter()
+    if dry_run:
+        for filename, image_path, date, new_time, size in tasks:
+            result = {
+                "file": filename,
+                "status": "dry_run",
+                "old": read_image_date(image_path),
+                "new": f"{date} {new_time}",
+            }
+            summary["changed"] += 1
+            summary["bytes"] += size
+            if progress is not None:
+                progress(result)
+        summary["seconds"] = time.perf_counter() - start
+        return summary
+
+    with ExitStack() as stack:
+        state = None
+        if state_path:
+            state = stack.enter_context(
+                open(state_path, "a" if resume else "w", encoding="utf-8")
+            )
+        # Spawned, not forked: the parent runs logging and journal threads
+        executor = stack.enter_context(
+            ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        )
+        futures = {
+            executor.submit(_apply_one, image_path, date, new_time): (
+                filename,
+                image_path,
+                date,
+                new_time,
+                size,
+            )
+            for filename, image_path, date, new_time, size in tasks
+        }
+        for future in as_completed(futures):
+            filename, image_path, date, new_time, size = futures[future]
+            try:
+                success, message, old_dates = future.result()
+            except Exception as e:  # E.g. a crashed worker
+                success, message, old_dates = False, str(e), None
+            result = {"file": filename, "new": f"{date} {new_time}"}
+            if success:
+                summary["changed"] += 1
+                summary["bytes"] += size
+                result["status"] = "ok"
+                if journal is not None and old_dates is not None:
+                    journal.record(image_path, old_dates, result["new"])
+            else:
+                summary["failed"] += 1
+                summary["errors"].append((filename, message))
+                result.update(status="error", error=message)
+            if state is not None:
+                state.write(json.dumps(result) + "\n")
+                state.flush()
+            if progress is not None:
+                progress(result)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def write_error_report(report_path, csv_errors, apply_errors):
+    """Write rejected CSV rows and failed files to a CSV report."""
+    with open(report_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["line", "filename", "error"])
+        for line_number, filename, message in csv_errors:
+            writer.writerow([line_number, filename, message])
+        for filename, message in apply_errors:
+            writer.writerow(["", filename, message])
@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from PhotoTimeSleuth.Helpers.exif_helper import read_exif_dates
+from PhotoTimeSleuth.Helpers.file_helper import PHOTO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Seconds a scan stays fresh before list requests trigger another one
+REFRESH_INTERVAL = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    filename TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    date_original TEXT,
+    date_digitized TEXT,
+    date_image TEXT,
+    corrected INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS photos_by_date
+    ON photos (COALESCE(date_original, date_digitized, date_image));
+"""
+
+DATE_EXPRESSION = "COALESCE(date_original, date_digitized, date_image)"
+
+SORT_ORDERS = {
+    "name": "filename",
+    # Undated photos go last when sorting by date
+    "date": f"{DATE_EXPRESSION} IS NULL, {DATE_EXPRESSION}, filename",
+}
+
+
+def _read_photo_metadata(image_path):
+    """Return (width, height, dates) of a photo, tolerating unreadable files."""
+    from PIL import Image
+
+    width = height = None
+    dates = {"original": None, "digitized": None, "image": None}
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+    except Exception as e:
+        logger.error(f"ERROR: Failed to read size of '{image_path}' | Reason: {str(e)}")
+    try:
+        dates = read_exif_dates(image_path)
+    except Exception as e:
+        # Malformed EXIF is treated as undated
+        logger.warning(f"Could not read dates of '{image_path}' | Reason: {str(e)}")
+    return width, height, dates
+
+
+class PhotoCatalog:
+    """
+    Persistent SQLite index of the photos in one directory.
+
+    :meth:`refresh` only stats the directory and re-reads files whose mtime or
+    size changed, so repeated listings of large archives stay cheap.
+    """
+
+    def __init__(self, photo_dir, db_path):
+        self.photo_dir = photo_dir
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def refresh(self, max_age=0.0):
+        """
+        Bring the catalog in line with the directory.
+
+        :param max_age: Skip the scan if the last one is younger than this.
+        :return: (added, updated, removed) counts.
+        """
+        with self._lock:
+            if time.monotonic() - self._last_refresh < max_age:
+                return 0, 0, 0
+            on_disk = {}
+            with os.scandir(self.photo_dir) as entries:
+                for entry in entries:
+                    if (
+                        entry.name.lower().endswith(PHOTO_EXTENSIONS)
+                        and entry.is_file()
+                    ):
+                        stat = entry.stat()
+                        on_disk[entry.name] = (stat.st_size, stat.st_mtime_ns)
+
+            with closing(self._connect()) as conn, conn:
+                known = {
+                    row[0]: (row[1], row[2])
+                    for row in conn.execute(
+                        "SELECT filename, size, mtime_ns FROM photos"
+                    )
+                }
+                removed = [name for name in known if name not in on_disk]
+                changed = [
+                    name
+                    for name, identity in on_disk.items()
+                    if known.get(name) != identity
+                ]
+                rows = []
+                for name in changed:
+                    size, mtime_ns = on_disk[name]
+                    width, height, dates = _read_photo_metadata(
+                        os.path.join(self.photo_dir, name)
+                    )
+                    rows.append(
+                        (
+                            name,
+                            size,
+                            mtime_ns,
+                            width,
+                            height,
+                            dates["original"],
+                            dates["digitized"],
+                            dates["image"],
+                        )
+                    )
+                conn.executemany(
+                    "INSERT INTO photos (filename, size, mtime_ns, width, height, "
+                    "date_original, date_digitized, date_image) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(filename) DO UPDATE SET size = excluded.size, "
+                    "mtime_ns = excluded.mtime_ns, width = excluded.width, "
+                    "height = excluded.height, date_original = excluded.date_original, "
+                    "date_digitized = excluded.date_digitized, "
+                    "date_image = excluded.date_image",
+                    rows,
+                )
+                conn.executemany(
+                    "DELETE FROM photos WHERE filename = ?",
+                    [(name,) for name in removed],
+                )
+            self._last_refresh = time.monotonic()
+
+        added = sum(1 for name in changed if name not in known)
+        return added, len(changed) - added, len(removed)
+
+    def mark_corrected(self, filename):
+        """Flag a photo as corrected by us and force it to be re-read."""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE photos SET corrected = 1, mtime_ns = -1 WHERE filename = ?",
+                (filename,),
+            )
+            self._last_refresh = 0.0
+
+    def query(self, sort="name", undated=False, offset=0, limit=None):
+        """
+        List photos from the index.
+
+        :param sort: "name" or "date".
+        :param undated: Only return photos without any EXIF date.
+        :param offset: Number of photos to skip.
+        :param limit: Maximum number of photos to return, or None for all.
+        :return: (total number of matching photos, list of photo dicts)
+        """
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort order: {sort}")
+        where = f"WHERE {DATE_EXPRESSION} IS NULL" if undated else ""
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM photos {where}").fetchone()[0]
+            rows = conn.execute(
+                "SELECT filename, width, height, date_original, date_digitized, "
+                f"date_image, corrected FROM photos {where} "
+                f"ORDER BY {SORT_ORDERS[sort]} LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        photos = [
+            {
+                "filename": row[0],
+                "width": row[1],
+                "height": row[2],
+                "date": row[3] or row[4] or row[5],
+                "date_original": row[3],
+                "date_digitized": row[4],
+                "date_image": row[5],
+                "corrected": bool(row[6]),
+            }
+            for row in rows
+        ]
+        return total, photos
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(photo_dir, catalog_dir):
+    """Return the shared catalog of ``photo_dir``, stored under ``catalog_dir``."""
+    photo_dir = os.path.abspath(photo_dir)
+    with _catalogs_lock:
+        catalog = _catalogs.get(photo_dir)
+        if catalog is None:
+            os.makedirs(catalog_dir, exist_ok=True)
+            digest = hashlib.sha1(os.path.normcase(photo_dir).encode("utf-8"))
+            db_path = os.path.join(catalog_dir, f"{digest.hexdigest()[:16]}.sqlite")
+            catalog = _catalogs[photo_dir] = PhotoCatalog(photo_dir, db_path)
+        return catalog
@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PhotoTimeSleuth.Helpers.metrics_helper import timed
+from PhotoTimeSleuth.Helpers.thumbnail_helper import (
+    DEFAULT_QUALITY,
+    FORMAT_JPEG,
+    encode_image,
+    load_thumbnail,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CELL = 160
+MIN_CELL = 32
+MAX_CELL = 400
+DEFAULT_COLUMNS = 10
+MAX_COLUMNS = 40
+DEFAULT_PER_PAGE = 100
+MAX_PER_PAGE = 400
+# Largest edge a WebP image can have
+MAX_SHEET_EDGE = 16383
+BACKGROUND = (34, 34, 34)
+# Padding between a thumbnail and its cell border
+CELL_MARGIN = 2
+# Sheets built in the background, e.g. the page after the one being viewed
+SHEET_WORKERS = 2
+
+_cell_pool = None
+_sheet_pool = None
+_pools_lock = threading.Lock()
+
+
+def _pools():
+    """Return the shared (thumbnail, sheet) executors, starting them once."""
+    global _cell_pool, _sheet_pool
+    with _pools_lock:
+        if _cell_pool is None:
+            # Pillow releases the GIL while decoding and resizing
+            _cell_pool = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 4, thread_name_prefix="sheet-cell"
+            )
+            _sheet_pool = ThreadPoolExecutor(
+                max_workers=SHEET_WORKERS, thread_name_prefix="sheet"
+            )
+        return _cell_pool, _sheet_pool
+
+
+def sheet_layout(names, cell=DEFAULT_CELL, columns=DEFAULT_COLUMNS):
+    """
+    Place photos on a sheet, row by row.
+
+    Each photo is fitted into its square cell and centered in it, so the
+    manifest can be written without decoding anything.
+
+    :return: (sheet width, sheet height, list of dicts with "filename" and
+             the "x", "y", "width" and "height" of its cell)
+    """
+    columns = max(1, min(columns, len(names)))
+    rows = math.ceil(len(names) / columns)
+    cells = [
+        {
+            "filename": name,
+            "x": (i % columns) * cell,
+            "y": (i // columns) * cell,
+            "width": cell,
+            "height": cell,
+        }
+        for i, name in enumerate(names)
+    ]
+    return columns * cell, rows * cell, cells
+
+
+def sheet_version(photo_dir, names, cell=DEFAULT_CELL, columns=DEFAULT_COLUMNS):
+    """
+    Return a digest identifying a sheet and the files on it.
+
+    Rewriting, adding or removing any photo of the sheet changes it, so it
+    serves both as the cache key and as the ETag of the sheet.
+    """
+    identity = [cell, columns]
+    for name in names:
+        try:
+            stat = os.stat(os.path.join(photo_dir, name))
+            identity.append((name, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            identity.append((name, None, None))
+    return hashlib.blake2b(repr(identity).encode(), digest_size=12).hexdigest()
+
+
+def _load_cell(image_path, size):
+    try:
+        return load_thumbnail(image_path, size, size)[0]
+    except Exception as e:
+        logger.error(
+            f"ERROR: Failed to add '{image_path}' to a contact sheet | Reason: {str(e)}"
+        )
+        return None
+
+
+def render_contact_sheet(
+    photo_dir,
+    names,
+    cell=DEFAULT_CELL,
+    columns=DEFAULT_COLUMNS,
+    fmt=FORMAT_JPEG,
+    quality=DEFAULT_QUALITY,
+):
+    """
+    Render a sprite image with one thumbnail per photo.
+
+    Thumbnails are decoded in parallel with the same fast paths as single
+    thumbnails (EXIF thumbnail or draft decode). Unreadable photos leave
+    their cell empty.
+
+    :param photo_dir: Directory of the photos.
+    :param names: Photo names, in the order of :func:`sheet_layout`.
+    :param cell: Edge of the square cell of each photo, in pixels.
+    :param columns: Number of cells per row.
+    :param fmt: FORMAT_JPEG or FORMAT_WEBP.
+    :param quality: Name of a tier in QUALITY_TIERS.
+    :return: Encoded bytes.
+    """
+    from PIL import Image
+
+    start = time.perf_counter()
+    width, height, cells = sheet_layout(names, cell, columns)
+    if max(width, height) > MAX_SHEET_EDGE:
+        raise ValueError(f"Contact sheet of {width}x{height} pixels is too large")
+    cell_pool, _ = _pools()
+    size = max(cell - 2 * CELL_MARGIN, 1)
+    thumbs = cell_pool.map(
+        _load_cell,
+        [os.path.join(photo_dir, name) for name in names],
+        [size] * len(names),
+    )
+    sheet = Image.new("RGB", (max(width, 1), max(height, 1)), BACKGROUND)
+    with timed("contact_sheet_compose"):
+        for position, thumb in zip(cells, thumbs):
+            if thumb is None:
+                continue
+            if thumb.mode != "RGB":
+                thumb = thumb.convert("RGB")
+            sheet.paste(
+                thumb,
+                (
+                    position["x"] + (cell - thumb.width) // 2,
+                    position["y"] + (cell - thumb.height) // 2,
+                ),
+            )
+    data = encode_image(sheet, fmt, quality)
+    logger.debug(
+        f"Contact sheet of {len(names)} photos at {sheet.size} as {fmt} "
+        f"({quality}) in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return data
+
+
+_inflight_lock = threading.Lock()
+_inflight = {}  # (photo_dir, variant) -> Event set once the render finished
+
+
+def get_contact_sheet(
+    photo_dir,
+    names,
+    cell=DEFAULT_CELL,
+    columns=DEFAULT_COLUMNS,
+    cache=None,
+    fmt=FORMAT_JPEG,
+    quality=DEFAULT_QUALITY,
+    version=None,
+):
+    """
+    Return a contact sheet from ``cache`` or render it, filling the cache.
+
+    Sheets are stored in the thumbnail cache under the photo directory,
+    keyed on :func:`sheet_version` rather than the directory mtime, which
+    changes whenever any file in it is created or removed. Concurrent
+    requests for the same sheet wait for the first render.
+
+    :param version: Result of :func:`sheet_version`, if already known.
+    :return: (Encoded bytes, True on a cache hit)
+    """
+    if version is None:
+        version = sheet_version(photo_dir, names, cell, columns)
+    if cache is None:
+        return render_contact_sheet(
+            photo_dir, names, cell, columns, fmt, quality
+        ), False
+
+    variant = ("contact_sheet", fmt, quality)
+    identity = (version,)
+    key = (os.path.abspath(photo_dir), version, fmt, quality)
+    while True:
+        data = cache.get(photo_dir, variant, identity)
+        if data is not None:
+            return data, True
+        with _inflight_lock:
+            event = _inflight.get(key)
+            if event is None:
+                event = _inflight[key] = threading.Event()
+                break
+        event.wait()
+
+    try:
+        data = render_contact_sheet(photo_dir, names, cell, columns, fmt, quality)
+        cache.put(photo_dir, variant, data, identity)
+        return data, False
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        event.set()
+
+
+def schedule_contact_sheet(photo_dir, names, cell, columns, cache, fmt, quality):
+    """Build a sheet into ``cache`` in the background, e.g. the next page."""
+    if cache is None or not names:
+        return None
+    _, sheet_pool = _pools()
+
+    def build():
+        try:
+            get_contact_sheet(photo_dir, names, cell, columns, cache, fmt, quality)
+        except Exception as e:
+            logger.error(
+                f"ERROR: Failed to build a contact sheet of '{photo_dir}' "
+                f"| Reason: {str(e)}"
+            )
+
+    return sheet_pool.submit(build)
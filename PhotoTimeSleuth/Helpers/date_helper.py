@@ -39,3 +39,98 @@ def find_closest_season_date(estimated_date, month, day):
     )
     closest_season_date = closest_season_date.replace(day=day)
     return closest_season_date.strftime("%Y-%m-%d")
+
+
+MICROSECONDS_PER_DAY = 86_400_000_000
+
+# Order matters: ties go to the first candidate, like in find_closest_season_date
+CANDIDATE_YEAR_OFFSETS = (0, -1, 1)
+
+
+def calculate_dates(bdays, ages, seasons):
+    """
+    Vectorized version of ``calculate_date`` for many (birthday, age, season) tuples.
+
+    The three arguments are broadcast against each other, so a single birthday
+    can be combined with arrays of ages and seasons. Results are identical to
+    calling ``calculate_date`` on every tuple.
+
+    :param bdays: Birthday(s) as 'YYYY-MM-DD' strings.
+    :param ages: Age(s) in years.
+    :param seasons: Season name(s), see SEASON_MAP plus "birthday" and "christmas".
+    :return: List of 'YYYY-MM-DD' strings, with None where the input is invalid.
+    """
+    import numpy as np  # Deferred to keep startup fast
+
+    bdays, ages, seasons = np.broadcast_arrays(
+        np.asarray(bdays, dtype=object),
+        np.asarray(ages, dtype=object),
+        np.asarray(seasons, dtype=object),
+    )
+    bdays, ages, seasons = bdays.ravel(), ages.ravel(), seasons.ravel()
+    count = len(bdays)
+    valid = np.ones(count, dtype=bool)
+
+    # Parse each distinct birthday once, with the same rules as strptime
+    parsed = {}
+    for bday in set(bdays.tolist()):
+        try:
+            parsed[bday] = np.datetime64(datetime.strptime(bday, "%Y-%m-%d").date())
+        except (TypeError, ValueError):
+            parsed[bday] = np.datetime64("NaT", "D")
+    birthdays = np.array([parsed[bday] for bday in bdays], dtype="datetime64[D]")
+    valid &= ~np.isnat(birthdays)
+
+    try:
+        age_values = ages.astype(float)
+    except (TypeError, ValueError):
+        age_values = np.array(
+            [age if isinstance(age, (int, float)) else np.nan for age in ages],
+            dtype=float,
+        )
+    valid &= np.isfinite(age_values)
+
+    months = np.zeros(count, dtype=np.int64)
+    days = np.ones(count, dtype=np.int64)
+    is_birthday = seasons == "birthday"
+    is_christmas = seasons == "christmas"
+    months[is_christmas], days[is_christmas] = 12, 25
+    for season, month in SEASON_MAP.items():
+        months[seasons == season] = month
+    valid &= is_birthday | (months > 0)
+
+    # timedelta(days=age * 365.25) rounds to microseconds; the date is the floor
+    offsets = np.round(np.where(valid, age_values, 0) * 365.25 * MICROSECONDS_PER_DAY)
+    offsets = offsets.astype(np.int64) // MICROSECONDS_PER_DAY
+    estimated = np.where(valid, birthdays, np.datetime64(0, "D")) + offsets.astype(
+        "timedelta64[D]"
+    )
+
+    # The season date keeps the time of day of the estimate, so comparing
+    # whole days gives the same distances as the scalar version
+    years = estimated.astype("datetime64[Y]")
+    month_offsets = (np.maximum(months, 1) - 1).astype("timedelta64[M]")
+    day_offsets = (days - 1).astype("timedelta64[D]")
+    candidates = np.stack(
+        [
+            (
+                (years + np.timedelta64(offset, "Y")).astype("datetime64[M]")
+                + month_offsets
+            ).astype("datetime64[D]")
+            + day_offsets
+            for offset in CANDIDATE_YEAR_OFFSETS
+        ]
+    )
+    distances = np.abs((candidates - estimated).astype(np.int64))
+    closest = candidates[np.argmin(distances, axis=0), np.arange(count)]
+    results = np.where(is_birthday, estimated, closest)
+
+    if not valid.all():
+        logger.error(
+            f"ERROR: Failed to calculate {count - int(valid.sum())} of {count} dates "
+            "| Reason: invalid birthday, age or season"
+        )
+    strings = np.datetime_as_string(results, unit="D")
+    return [
+        str(string) if is_valid else None for string, is_valid in zip(strings, valid)
+    ]
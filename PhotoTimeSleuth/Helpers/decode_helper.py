@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from PhotoTimeSleuth.Helpers.metrics_helper import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Pixel memory all concurrent decodes may hold at once
+DEFAULT_DECODE_BYTES = 512 * 1024 * 1024
+# Largest decode allowed; the size at which Pillow's own decompression bomb
+# check turns from a warning into an error
+DEFAULT_MAX_PIXELS = 2 * 89_478_485
+
+# Modes Pillow stores with one byte per pixel; the others take four
+# (RGB is padded to 32 bits)
+SINGLE_BYTE_MODES = ("1", "L", "P")
+
+
+class ImageTooLarge(Exception):
+    """Raised when decoding an image would exceed the pixel limit."""
+
+
+def decode_bytes(source_size, output_size, mode):
+    """
+    Estimate the memory a resize from ``source_size`` to ``output_size`` takes.
+
+    Pillow holds the decoded source plus an intermediate of the output width
+    and the source height while resampling in two passes.
+
+    :param source_size: (width, height) of the decoded source.
+    :param output_size: (width, height) of the resized output.
+    :param mode: Pillow mode of the source.
+    :return: Bytes.
+    """
+    width, height = source_size
+    bytes_per_pixel = 1 if mode in SINGLE_BYTE_MODES else 4
+    return bytes_per_pixel * height * (width + output_size[0])
+
+
+class DecodeBudget:
+    """
+    Weighted semaphore limiting the pixel memory of concurrent decodes.
+
+    Each decode reserves its estimated size before it starts and waits while
+    the reservations of others would exceed ``max_bytes``. A decode larger
+    than the whole budget runs alone rather than never.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_DECODE_BYTES, max_pixels=DEFAULT_MAX_PIXELS):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self._condition = threading.Condition()
+
+    def configure(self, max_bytes=None, max_pixels=None):
+        with self._condition:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if max_pixels is not None:
+                self.max_pixels = max_pixels
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, source_size, output_size, mode):
+        """
+        Hold budget for decoding ``source_size`` pixels into ``output_size``.
+
+        :raises ImageTooLarge: If the source has more than ``max_pixels``.
+        """
+        pixels = source_size[0] * source_size[1]
+        if self.max_pixels and pixels > self.max_pixels:
+            raise ImageTooLarge(
+                f"Decoding {source_size[0]}x{source_size[1]} pixels exceeds the "
+                f"limit of {self.max_pixels}"
+            )
+        cost = decode_bytes(source_size, output_size, mode)
+        with self._condition:
+            if not self._fits(cost):
+                self.waits += 1
+                logger.debug(
+                    f"Decode of {cost} bytes waits for {self.in_use} bytes in use"
+                )
+                start = time.perf_counter()
+                self._condition.wait_for(lambda: self._fits(cost))
+                METRICS.observe_phase("decode_wait", time.perf_counter() - start)
+            self.in_use += cost
+            self.peak = max(self.peak, self.in_use)
+        try:
+            yield cost
+        finally:
+            with self._condition:
+                self.in_use -= cost
+                self._condition.notify_all()
+
+    def _fits(self, cost):
+        return self.in_use == 0 or self.in_use + cost <= self.max_bytes
+
+
+# Shared by every decode in the process
+DECODE_BUDGET = DecodeBudget()
+
+
+def configure_decoding(max_bytes=None, max_pixels=None):
+    """
+    Set the decode budget and pixel limit of the process.
+
+    Pillow's decompression bomb check at open time is raised along with the
+    limit, so large JPEGs that are decoded at reduced scale can still be opened.
+    """
+    from PIL import Image
+
+    DECODE_BUDGET.configure(max_bytes, max_pixels)
+    if max_pixels is not None:
+        Image.MAX_IMAGE_PIXELS = max_pixels or None
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from PhotoTimeSleuth.Helpers.exif_helper import JPEG_MAGIC, SOS
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_NAME = "ai_estimates.sqlite"
+CHUNK_BYTES = 1024 * 1024
+MAX_CACHED_HASHES = 4096
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS estimates (
+    content_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_version INTEGER NOT NULL,
+    estimated_date TEXT NOT NULL,
+    image_path TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (content_hash, model, prompt_version)
+);
+"""
+
+
+def _hash_chunks(f, digest, length=None):
+    while length is None or length > 0:
+        chunk = f.read(CHUNK_BYTES if length is None else min(length, CHUNK_BYTES))
+        if not chunk:
+            break
+        digest.update(chunk)
+        if length is not None:
+            length -= len(chunk)
+
+
+def content_hash(image_path):
+    """
+    Return a digest of an image file that ignores its metadata.
+
+    For JPEGs the APPn segments (EXIF, XMP, ...) are skipped, so changing the
+    date of a photo does not change its hash. Other formats are hashed whole.
+    The file is read in chunks and never loaded into memory at once.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(image_path, "rb") as f:
+        if f.read(2) != JPEG_MAGIC:
+            f.seek(0)
+            _hash_chunks(f, digest)
+            return digest.hexdigest()
+        while True:
+            head = f.read(4)
+            if len(head) != 4 or head[:2] == SOS or head[:1] != b"\xff":
+                digest.update(head)
+                break
+            length = struct.unpack(">H", head[2:4])[0] - 2
+            if 0xE0 <= head[1] <= 0xEF:
+                f.seek(length, 1)  # Metadata segment
+            else:
+                digest.update(head)
+                _hash_chunks(f, digest, length)
+        _hash_chunks(f, digest)
+    return digest.hexdigest()
+
+
+class EstimateCache:
+    """
+    Persistent cache of AI date estimates keyed by image content.
+
+    Keys combine the :func:`content_hash` of a photo with the model and prompt
+    version that produced the estimate, so identical photos in different
+    folders share one entry and a prompt change starts afresh.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._hashes = OrderedDict()  # (path, mtime_ns, size) -> content hash
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def hash_image(self, image_path):
+        """Return the content hash of ``image_path``, memoized on mtime and size."""
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key in self._hashes:
+                self._hashes.move_to_end(key)
+                return self._hashes[key]
+        digest = content_hash(image_path)
+        with self._lock:
+            self._hashes[key] = digest
+            while len(self._hashes) > MAX_CACHED_HASHES:
+                self._hashes.popitem(last=False)
+        return digest
+
+    def get(self, image_path, model, prompt_version):
+        """Return the cached estimate of ``image_path``, or None on a miss."""
+        digest = self.hash_image(image_path)
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT estimated_date FROM estimates "
+                "WHERE content_hash = ? AND model = ? AND prompt_version = ?",
+                (digest, model, prompt_version),
+            ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, image_path, model, prompt_version, estimated_date):
+        """Store the estimate of ``image_path``."""
+        digest = self.hash_image(image_path)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO estimates (content_hash, model, "
+                "prompt_version, estimated_date, image_path, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    digest,
+                    model,
+                    prompt_version,
+                    estimated_date,
+                    os.path.abspath(image_path),
+                    time.time(),
+                ),
+            )
+
+    def entries(self, offset=0, limit=None):
+        """
+        List cached estimates, newest first.
+
+        :return: (total number of entries, list of entry dicts)
+        """
+        with closing(self._connect()) as conn:
+            total = conn.execute("SELECT COUNT(*) FROM estimates").fetchone()[0]
+            rows = conn.execute(
+                "SELECT content_hash, model, prompt_version, estimated_date, "
+                "image_path, created FROM estimates "
+                "ORDER BY created DESC LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        keys = (
+            "content_hash",
+            "model",
+            "prompt_version",
+            "estimated_date",
+            "image_path",
+            "created",
+        )
+        return total, [dict(zip(keys, row)) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_estimate_cache(bday_file):
+    """Return the shared estimate cache stored next to ``bday_file``."""
+    directory = os.path.dirname(os.path.abspath(bday_file))
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            db_path = os.path.join(directory, CACHE_FILE_NAME)
+            cache = _caches[directory] = EstimateCache(db_path)
+        return cache
@@ -0,0 +1,354 @@
+"""Minimal EXIF reader for the three date tags.
+
+Unlike ``piexif.load`` this only walks the JPEG markers up to the APP1 segment
+and then only the IFD entries that can hold a date, without converting any
+other tag or copying the embedded thumbnail.
+"""
+
+import json
+import logging
+import os
+import shutil
+import struct
+import tempfile
+from collections import namedtuple
+
+import piexif
+
+from PhotoTimeSleuth.Helpers.metrics_helper import timed
+
+logger = logging.getLogger(__name__)
+
+DATE_TIME = 0x0132
+EXIF_IFD_POINTER = 0x8769
+DATE_TIME_ORIGINAL = 0x9003
+DATE_TIME_DIGITIZED = 0x9004
+
+ASCII = 2
+SHORT = 3
+
+JPEG_MAGIC = b"\xff\xd8"
+TIFF_MAGICS = (b"II", b"MM")
+APP1 = b"\xff\xe1"
+SOS = b"\xff\xda"
+
+# The date tags nearly always sit in the first few KB of the APP1 segment,
+# ahead of MakerNote blobs; the rest is only read if parsing needs it.
+PREFIX_BYTES = 4096
+
+
+class ExifFormatError(ValueError):
+    pass
+
+
+# TIFF data of the APP1 segment, its file offset and the date tags found in it
+ExifSegment = namedtuple("ExifSegment", ["endian", "tiff", "tiff_offset", "tags"])
+
+# Type, value count and absolute file offset of the value bytes of one tag
+DateTag = namedtuple("DateTag", ["tag", "type", "count", "offset"])
+
+
+def _read_app1(f):
+    """
+    Return (start of the TIFF data, its file offset, TIFF data length).
+
+    Follows the same marker walk as piexif: it stops at the first APP1 segment
+    starting with ``Exif`` and returns None if there is none before the image
+    data starts. Only the first ``PREFIX_BYTES`` of the segment are read.
+    """
+    if f.read(2) != JPEG_MAGIC:
+        raise ExifFormatError("Not a JPEG file")
+    while True:
+        head = f.read(4)
+        if len(head) != 4 or head[:2] == SOS or head[:1] != b"\xff":
+            return None
+        length = struct.unpack(">H", head[2:4])[0] - 2
+        if length < 0:
+            raise ExifFormatError("Invalid JPEG segment length")
+        if head[:2] == APP1:
+            start = f.tell()
+            prefix = f.read(min(length, PREFIX_BYTES))
+            if prefix[:4] == b"Exif":
+                return prefix[6:], start + 6, length - 6
+            f.seek(start + length)
+        else:
+            f.seek(length, 1)
+
+
+def _read_ifd(tiff, endian, pointer, wanted):
+    """Return {tag: (type, count, value field offset)} for the ``wanted`` tags."""
+    (count,) = struct.unpack_from(endian + "H", tiff, pointer)
+    # Unpack all entries in one call; the 4-byte value field is skipped
+    fields = struct.unpack_from(endian + "HHL4x" * count, tiff, pointer + 2)
+    found = {}
+    for i in range(0, len(fields), 3):
+        if fields[i] in wanted:
+            entry = pointer + 2 + 4 * i
+            found[fields[i]] = (fields[i + 1], fields[i + 2], entry + 8)
+    return found
+
+
+def _value_offset(tiff, endian, value_type, count, field_offset):
+    """Return the offset of an ASCII value, following the pointer if needed."""
+    if value_type == ASCII and count > 4:
+        return struct.unpack_from(endian + "L", tiff, field_offset)[0]
+    return field_offset
+
+
+def _parse_tiff(tiff, tiff_offset):
+    if tiff[:2] not in TIFF_MAGICS:
+        raise ExifFormatError("Invalid TIFF header")
+    endian = "<" if tiff[:2] == b"II" else ">"
+
+    try:
+        ifd0_pointer = struct.unpack_from(endian + "L", tiff, 4)[0]
+        entries = _read_ifd(tiff, endian, ifd0_pointer, (DATE_TIME, EXIF_IFD_POINTER))
+        pointer_entry = entries.pop(EXIF_IFD_POINTER, None)
+        if pointer_entry is not None:
+            value_type, _, field_offset = pointer_entry
+            fmt = endian + ("H" if value_type == SHORT else "L")
+            exif_pointer = struct.unpack_from(fmt, tiff, field_offset)[0]
+            entries.update(
+                _read_ifd(
+                    tiff,
+                    endian,
+                    exif_pointer,
+                    (DATE_TIME_ORIGINAL, DATE_TIME_DIGITIZED),
+                )
+            )
+    except struct.error as e:
+        raise ExifFormatError(f"Truncated EXIF data: {e}") from e
+
+    tags = {}
+    for tag, (value_type, count, field_offset) in entries.items():
+        offset = _value_offset(tiff, endian, value_type, count, field_offset)
+        if offset + count > len(tiff):
+            raise ExifFormatError(f"EXIF value of tag {tag:#06x} is out of bounds")
+        tags[tag] = DateTag(tag, value_type, count, tiff_offset + offset)
+    return ExifSegment(endian, tiff, tiff_offset, tags)
+
+
+def locate_date_tags(f):
+    """
+    Find the date tags of an open JPEG file.
+
+    :param f: File object opened in binary mode at position 0.
+    :return: ExifSegment with a {tag: DateTag} mapping, or None if there is no EXIF.
+    :raises ExifFormatError: If the EXIF data is malformed.
+    """
+    app1 = _read_app1(f)
+    if app1 is None:
+        return None
+    tiff, tiff_offset, tiff_length = app1
+    try:
+        return _parse_tiff(tiff, tiff_offset)
+    except ExifFormatError:
+        if len(tiff) >= tiff_length:
+            raise
+    # Something lies beyond the prefix that was read, so read the whole segment
+    f.seek(tiff_offset)
+    return _parse_tiff(f.read(tiff_length), tiff_offset)
+
+
+def get_image_dates(image_path):
+    """
+    Get all three date fields from the metadata of an image using piexif.
+
+    :param image_path: Path to the input image.
+    :return: Dict with 'original', 'digitized' and 'image' keys holding dates as
+             strings in the format 'YYYY:MM:DD HH:MM:SS', or None where missing.
+    """
+    exif_dict = piexif.load(image_path)
+    values = {
+        "original": exif_dict["Exif"].get(piexif.ExifIFD.DateTimeOriginal),
+        "digitized": exif_dict["Exif"].get(piexif.ExifIFD.DateTimeDigitized),
+        "image": exif_dict["0th"].get(piexif.ImageIFD.DateTime),
+    }
+    return {
+        key: value.decode("utf-8") if value is not None else None
+        for key, value in values.items()
+    }
+
+
+def _dates_from_segment(segment):
+    values = {}
+    for key, tag in (
+        ("original", DATE_TIME_ORIGINAL),
+        ("digitized", DATE_TIME_DIGITIZED),
+        ("image", DATE_TIME),
+    ):
+        location = segment.tags.get(tag) if segment is not None else None
+        if location is None:
+            values[key] = None
+            continue
+        if location.type != ASCII:
+            raise ExifFormatError(f"Tag {tag:#06x} is not an ASCII value")
+        start = location.offset - segment.tiff_offset
+        # Like piexif, drop the last byte (the NUL terminator)
+        raw = segment.tiff[start : start + max(location.count - 1, 0)]
+        try:
+            values[key] = raw.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise ExifFormatError(str(e)) from e
+    return values
+
+
+def read_exif_dates(image_path):
+    """
+    Get all three date fields from the metadata of an image without piexif.
+
+    :param image_path: Path to the input image.
+    :return: Dict with 'original', 'digitized' and 'image' keys holding dates as
+             strings in the format 'YYYY:MM:DD HH:MM:SS', or None where missing.
+    :raises ExifFormatError: If the EXIF data is malformed.
+    """
+    with open(image_path, "rb") as f:
+        magic = f.read(2)
+        if magic == JPEG_MAGIC:
+            f.seek(0)
+            return _dates_from_segment(locate_date_tags(f))
+    if magic in TIFF_MAGICS:
+        return get_image_dates(image_path)
+    return {"original": None, "digitized": None, "image": None}
+
+
+@timed("exif_read")
+def read_image_date(image_path):
+    """
+    Get the date from the metadata of an image, like ``get_image_date``.
+
+    :param image_path: Path to the input image.
+    :return: Date as a string in the format 'YYYY:MM:DD HH:MM:SS' or None if not found.
+    """
+    try:
+        with open(image_path, "rb") as f:
+            magic = f.read(2)
+            if magic == JPEG_MAGIC:
+                f.seek(0)
+                dates = _dates_from_segment(locate_date_tags(f))
+        if magic != JPEG_MAGIC:
+            # TIFF and the error reporting of other formats are left to piexif
+            dates = get_image_dates(image_path)
+    except Exception as e:
+        logger.error(
+            f"ERROR: Failed to get date from '{image_path}' | Reason: {str(e)}"
+        )
+        return None
+
+    for key in ("original", "digitized", "image"):
+        if dates[key] is not None and dates[key] != "UNKNOWN":
+            return dates[key]
+    return None
+
+
+# Crash-safety modes of patch_image_date
+PATCH_JOURNAL = "journal"
+PATCH_ATOMIC = "atomic"
+PATCH_DIRECT = "direct"
+
+JOURNAL_SUFFIX = ".ptsjournal"
+
+
+def _journal_path(image_path):
+    return image_path + JOURNAL_SUFFIX
+
+
+def _write_patches(path, patches):
+    with open(path, "r+b") as f:
+        for offset, data in patches:
+            f.seek(offset)
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def recover_patch_journal(image_path):
+    """
+    Finish an in-place patch that was interrupted by a crash.
+
+    The journal is only renamed into place once it is complete, so a journal
+    that exists can always be replayed; the writes are idempotent.
+
+    :return: True if a journal was replayed.
+    """
+    journal_path = _journal_path(image_path)
+    if not os.path.isfile(journal_path):
+        return False
+    with open(journal_path, "r", encoding="utf-8") as f:
+        journal = json.load(f)
+    patches = [(offset, bytes.fromhex(data)) for offset, data in journal["patches"]]
+    _write_patches(image_path, patches)
+    os.remove(journal_path)
+    logger.warning(f"Replayed interrupted date patch of '{image_path}'")
+    return True
+
+
+def patch_image_date(image_path, new_date, mode=PATCH_JOURNAL):
+    """
+    Overwrite the three EXIF date tags of a JPEG in place.
+
+    This only works when all three tags already exist as ASCII values of the
+    same length as ``new_date`` (plus NUL); otherwise nothing is written and
+    the caller has to fall back to a full EXIF rewrite.
+
+    :param image_path: Path to the input image.
+    :param new_date: New date as a string in the format 'YYYY:MM:DD HH:MM:SS'.
+    :param mode: PATCH_JOURNAL writes the patch to a journal file before
+                 touching the image, PATCH_ATOMIC patches a copy and renames it
+                 over the original, PATCH_DIRECT writes without protection.
+    :return: Dict with the old 'original', 'digitized' and 'image' values, or
+             None if the tags cannot be patched in place.
+    """
+    recover_patch_journal(image_path)
+    value = new_date.encode("ascii") + b"\x00"
+    with open(image_path, "rb") as f:
+        if f.read(2) != JPEG_MAGIC:
+            return None
+        f.seek(0)
+        segment = locate_date_tags(f)
+    if segment is None:
+        return None
+
+    keys = (
+        ("original", DATE_TIME_ORIGINAL),
+        ("digitized", DATE_TIME_DIGITIZED),
+        ("image", DATE_TIME),
+    )
+    locations = [segment.tags.get(tag) for _, tag in keys]
+    if any(
+        location is None or location.type != ASCII or location.count != len(value)
+        for location in locations
+    ):
+        return None
+    old_dates = _dates_from_segment(segment)
+    patches = [(location.offset, value) for location in locations]
+
+    if mode == PATCH_ATOMIC:
+        directory = os.path.dirname(os.path.abspath(image_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copy2(image_path, tmp_path)
+            _write_patches(tmp_path, patches)
+            os.replace(tmp_path, image_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    elif mode == PATCH_JOURNAL:
+        journal_path = _journal_path(image_path)
+        tmp_path = journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"patches": [(offset, data.hex()) for offset, data in patches]}, f
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, journal_path)
+        _write_patches(image_path, patches)
+        os.remove(journal_path)
+    elif mode == PATCH_DIRECT:
+        _write_patches(image_path, patches)
+    else:
+        raise ValueError(f"Unknown patch mode: {mode}")
+    return old_dates
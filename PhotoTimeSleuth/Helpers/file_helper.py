@@ -1,11 +1,14 @@
+import logging
 import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+PHOTO_EXTENSIONS = ("jpg", "jpeg", "png")
+
+_keyring = None  # Imported by _get_keyring; False if not installed
+
 
-try:  # noqa: SIM105
-    import keyring  # type: ignore
-except Exception:  # pragma: no cover - optional dependency
-    keyring = None
-
-
 class FormatError(Exception):
     pass
 
@@ -14,50 +17,132 @@ def _key_file_path(bday_file):
     """Return the fallback path of the API key file."""
     directory = os.path.dirname(bday_file)
     return os.path.join(directory, "openai_key.txt")
-
-
+
+
 def load_names_and_bdays(bday_file):
-    """Helper function to load names and birthdays from the bday file."""
-    if not bday_file or not os.path.isfile(bday_file):
-        return []
-
+    """Helper function to load names and birthdays from the bday file."""
+    if not bday_file or not os.path.isfile(bday_file):
+        return []
+
     names_and_bdays = []
-    with open(bday_file, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.startswith("#") or len(line.strip()) == 0:
-                continue
-            if "\t" not in line:
-                raise FormatError(
-                    "It looks like the bday file is not formatted correctly. \
-                     Make sure each line has a tab between the name and the date."
-                )
-            name, bday = line.strip().split("\t")
-            year, month, day = map(int, bday.split("-"))
-            if year < 1900 or year > 2100:
-                raise FormatError(
-                    f"Invalid year in bday file. \
-                      Make sure the year ({year}) is between 1900 and 2100. \
-                      Also make sure that the order is correct (e.g. YYYY-MM-DD)."
-                )
-            if month < 1 or month > 12:
-                raise FormatError(
-                    f"Invalid month in bday file. \
-                      Make sure the month ({month}) is between 1 and 12. \
-                      Also make sure that the order is correct (e.g. YYYY-MM-DD)."
-                )
-            if day < 1 or day > 31:
-                raise FormatError(
-                    f"Invalid day in bday file. \
-                      Make sure the day({day}) is between 1 and 31. \
-                      Also make sure that the order is correct (e.g. YYYY-MM-DD)."
-                )
-            names_and_bdays.append({"name": name, "bday": bday})
-
+    with open(bday_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or len(line.strip()) == 0:
+                continue
+            if "\t" not in line:
+                raise FormatError(
+                    "It looks like the bday file is not formatted correctly. \
+                     Make sure each line has a tab between the name and the date."
+                )
+            name, bday = line.strip().split("\t")
+            year, month, day = map(int, bday.split("-"))
+            if year < 1900 or year > 2100:
+                raise FormatError(
+                    f"Invalid year in bday file. \
+                      Make sure the year ({year}) is between 1900 and 2100. \
+                      Also make sure that the order is correct (e.g. YYYY-MM-DD)."
+                )
+            if month < 1 or month > 12:
+                raise FormatError(
+                    f"Invalid month in bday file. \
+                      Make sure the month ({month}) is between 1 and 12. \
+                      Also make sure that the order is correct (e.g. YYYY-MM-DD)."
+                )
+            if day < 1 or day > 31:
+                raise FormatError(
+                    f"Invalid day in bday file. \
+                      Make sure the day({day}) is between 1 and 31. \
+                      Also make sure that the order is correct (e.g. YYYY-MM-DD)."
+                )
+            names_and_bdays.append({"name": name, "bday": bday})
+
     return names_and_bdays
 
 
+class BirthdayRegistry:
+    """
+    Parsed view of a bday file, indexed by name.
+
+    The file is only re-parsed when its mtime or size changes. A file that
+    fails to parse is logged once and the error is re-raised from the cache
+    until the file is fixed.
+    """
+
+    def __init__(self, bday_file):
+        self.bday_file = bday_file
+        self._lock = threading.Lock()
+        self._stamp = ()  # Never matches a real (mtime, size) stamp or None
+        self._people = []
+        self._by_name = {}
+        self._error = None
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.bday_file)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except (OSError, TypeError):
+            stamp = None
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            self._stamp = stamp
+            self._people, self._by_name, self._error = [], {}, None
+            try:
+                people = load_names_and_bdays(self.bday_file)
+            except (FormatError, ValueError) as e:
+                logger.error(
+                    f"ERROR: Failed to load '{self.bday_file}' | Reason: {str(e)}"
+                )
+                self._error = e if isinstance(e, FormatError) else FormatError(str(e))
+                return
+            self._people = people
+            for person in people:
+                # Keep the first entry for duplicated names, like before
+                self._by_name.setdefault(person["name"], person)
+
+    def people(self):
+        """Return all people as ``{"name": ..., "bday": ...}`` dicts."""
+        self._refresh()
+        if self._error is not None:
+            raise self._error
+        return list(self._people)
+
+    def get(self, name):
+        """Return the entry of ``name``, or None if the name is unknown."""
+        self._refresh()
+        if self._error is not None:
+            raise self._error
+        return self._by_name.get(name)
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_birthday_registry(bday_file):
+    """Return the shared registry of ``bday_file``."""
+    with _registries_lock:
+        registry = _registries.get(bday_file)
+        if registry is None:
+            registry = _registries[bday_file] = BirthdayRegistry(bday_file)
+        return registry
+
+
+def _get_keyring():
+    """Import keyring on first use, as it is optional and slow to import."""
+    global _keyring
+    if _keyring is None:
+        try:
+            import keyring  # type: ignore
+        except Exception:  # pragma: no cover - optional dependency
+            keyring = False
+        _keyring = keyring
+    return _keyring or None
+
+
 def load_api_key(bday_file):
     """Load the stored OpenAI API key if available."""
+    keyring = _get_keyring()
     if keyring is not None:
         try:  # pragma: no cover - depends on system keyring
             return keyring.get_password("PhotoTimeSleuth", bday_file or "default")
@@ -73,6 +158,7 @@ def load_api_key(bday_file):
 
 def save_api_key(bday_file, api_key):
     """Persist the OpenAI API key next to the birthday file."""
+    keyring = _get_keyring()
     if keyring is not None:
         try:  # pragma: no cover - depends on system keyring
             keyring.set_password(
@@ -85,3 +171,12 @@ def save_api_key(bday_file, api_key):
     key_path = _key_file_path(bday_file)
     with open(key_path, "w", encoding="utf-8") as f:
         f.write(api_key.strip())
+
+
+def list_photos(photo_dir):
+    """Return the sorted names of the supported photos in ``photo_dir``."""
+    return sorted(
+        file
+        for file in os.listdir(photo_dir)
+        if file.lower().endswith(PHOTO_EXTENSIONS)
+    )
@@ -0,0 +1,61 @@
+import hashlib
+import logging
+
+from PhotoTimeSleuth.Helpers.thumbnail_helper import (
+    FORMAT_JPEG,
+    FORMAT_WEBP,
+    MIME_TYPES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Photos can change on disk (e.g. a date rewrite) under the same URL, so
+# clients may store responses but must revalidate them; a 304 is cheap
+PHOTO_CACHE_CONTROL = "private, no-cache"
+
+# Bump when thumbnail encoding changes, so clients drop old thumbnails
+THUMBNAIL_VERSION = 1
+
+
+def photo_etag(stat, *variant):
+    """
+    Return a strong ETag for a photo or one of its renditions.
+
+    The tag is derived from the file identity (device and inode), its size,
+    mtime and ctime and the rendition parameters, so it is computed from one
+    ``os.stat`` without reading the file. Any rewrite of the file, including
+    an in-place EXIF date patch, changes it.
+
+    :param stat: ``os.stat_result`` of the photo.
+    :param variant: Rendition parameters, e.g. width, height, format and
+                    quality; empty for the original file.
+    :return: ETag value without quotes.
+    """
+    identity = (
+        stat.st_dev,
+        stat.st_ino,
+        stat.st_size,
+        stat.st_mtime_ns,
+        stat.st_ctime_ns,
+    )
+    if variant:
+        identity += (THUMBNAIL_VERSION,) + variant
+    return hashlib.blake2b(repr(identity).encode(), digest_size=12).hexdigest()
+
+
+def negotiate_image_format(accept, webp_available=True):
+    """
+    Pick the thumbnail format for a request.
+
+    WebP is only chosen when the client names ``image/webp`` explicitly, as
+    browsers that can decode it do; a bare ``*/*`` gets JPEG.
+
+    :param accept: ``request.accept_mimetypes`` of the request.
+    :param webp_available: Whether the server can encode WebP.
+    :return: FORMAT_WEBP or FORMAT_JPEG.
+    """
+    if webp_available:
+        for value, quality in accept:
+            if value == MIME_TYPES[FORMAT_WEBP] and quality > 0:
+                return FORMAT_WEBP
+    return FORMAT_JPEG
@@ -1,42 +1,81 @@
 import piexif
 import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from PhotoTimeSleuth.Helpers.exif_helper import PATCH_JOURNAL, patch_image_date
+from PhotoTimeSleuth.Helpers.metrics_helper import timed
 
 logger = logging.getLogger(__name__)
 
+EXIF_DATE_TAGS = {
+    "original": ("Exif", piexif.ExifIFD.DateTimeOriginal),
+    "digitized": ("Exif", piexif.ExifIFD.DateTimeDigitized),
+    "image": ("0th", piexif.ImageIFD.DateTime),
+}
+
+_file_locks = {}  # normalized path -> [lock, number of holders and waiters]
+_file_locks_guard = threading.Lock()
 
-def change_image_date(image_path, new_date):
+
+@contextmanager
+def file_lock(image_path):
+    """
+    Hold the in-process write lock of one image file.
+
+    Every metadata write goes through this lock, so concurrent requests for
+    the same file are serialized while writes to different files still run
+    in parallel. Locks are dropped once nobody holds or waits for them.
+    """
+    key = os.path.normcase(os.path.abspath(image_path))
+    with _file_locks_guard:
+        entry = _file_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _file_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _file_locks[key]
+
+
+@timed("exif_write")
+def change_image_date(
+    image_path, new_date, patch_mode=PATCH_JOURNAL, journal=None, new_time="00:00:00"
+):
     """
     Change the date in the metadata of an image and log the change.
 
+    When all three date tags already exist they are overwritten in place (see
+    ``patch_image_date``); otherwise the EXIF block is rebuilt with piexif.
+
     :param image_path: Path to the input image.
-    :param new_date: New date as a string in the format 'YYYY:MM:DD HH:MM:SS'.
+    :param new_date: New date as a string in the format 'YYYY:MM:DD'.
+    :param patch_mode: Crash-safety mode of the in-place patch.
+    :param journal: Optional ``ChangeJournal`` that records the old and new dates.
+    :param new_time: Time of day as a string in the format 'HH:MM:SS'.
     :return: (Success: True/False, Message: str)
     """
     try:
-        # Load EXIF data
-        exif_dict = piexif.load(image_path)
-
-        # Extract old date values if available
-        old_date_original = exif_dict["Exif"].get(
-            piexif.ExifIFD.DateTimeOriginal, "UNKNOWN"
-        )
-        old_date_digitized = exif_dict["Exif"].get(
-            piexif.ExifIFD.DateTimeDigitized, "UNKNOWN"
-        )
-        old_date_image = exif_dict["0th"].get(piexif.ImageIFD.DateTime, "UNKNOWN")
-
-        new_date = new_date + " 00:00:00"
-
-        # Update EXIF metadata with the new date
-        exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal] = new_date
-        exif_dict["Exif"][piexif.ExifIFD.DateTimeDigitized] = new_date
-        exif_dict["0th"][piexif.ImageIFD.DateTime] = new_date
-        exif_bytes = piexif.dump(exif_dict)
-
-        # Apply new EXIF data to the image
-        piexif.insert(exif_bytes, image_path, image_path)
+        new_date = f"{new_date} {new_time}"
+
+        with file_lock(image_path):
+            old_dates = patch_image_date(image_path, new_date, patch_mode)
+            if old_dates is None:
+                old_dates = _write_image_dates(
+                    image_path, dict.fromkeys(EXIF_DATE_TAGS, new_date)
+                )
+            # Journaled under the lock, so records keep the order of writes
+            if journal is not None:
+                journal.record(image_path, old_dates, new_date)
 
         # Log the change with old and new date values
+        old_date_original = old_dates["original"] or "UNKNOWN"
+        old_date_digitized = old_dates["digitized"] or "UNKNOWN"
+        old_date_image = old_dates["image"] or "UNKNOWN"
         logging.info(
             f"SUCCESS: Updated '{image_path}' | "
             f"Old Date (Original: {old_date_original}, Digitized: {old_date_digitized}, Image: {old_date_image}) | "
@@ -49,6 +88,38 @@ def change_image_date(image_path, new_date):
         return False, str(e)
 
 
+def set_image_dates(image_path, dates):
+    """
+    Write each of the three date tags of an image, rebuilding its EXIF block.
+
+    :param image_path: Path to the image.
+    :param dates: Dict with 'original', 'digitized' and 'image' values as
+                  'YYYY:MM:DD HH:MM:SS' strings; None removes the tag.
+    :return: Dict with the previous values (None where a tag was missing).
+    """
+    with file_lock(image_path):
+        return _write_image_dates(image_path, dates)
+
+
+def _write_image_dates(image_path, dates):
+    # Load EXIF data
+    exif_dict = piexif.load(image_path)
+
+    old_dates = {}
+    for key, (ifd, tag) in EXIF_DATE_TAGS.items():
+        old = exif_dict[ifd].get(tag)
+        old_dates[key] = old.decode("utf-8", "replace") if old is not None else None
+        if dates[key] is None:
+            exif_dict[ifd].pop(tag, None)
+        else:
+            exif_dict[ifd][tag] = dates[key]
+
+    # Apply new EXIF data to the image
+    piexif.insert(piexif.dump(exif_dict), image_path, image_path)
+    return old_dates
+
+
+@timed("exif_read")
 def get_image_date(image_path):
     """
     Get the date from the metadata of an image.
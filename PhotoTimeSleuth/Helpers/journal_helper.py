@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueListener, RotatingFileHandler
+
+from PhotoTimeSleuth.Helpers.image_helper import set_image_dates
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE_NAME = "changes.jsonl"
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 10
+
+ACTION_CHANGE = "change"
+ACTION_UNDO = "undo"
+ACTION_REPLAY = "replay"
+
+DATE_KEYS = ("original", "digitized", "image")
+
+
+def parse_time(value):
+    """
+    Parse a journal time filter.
+
+    :param value: Seconds since the epoch, an ISO 8601 string or None.
+    :return: Seconds since the epoch, or None.
+    :raises ValueError: If the value cannot be parsed.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()  # Local time, like the UI shows
+    return parsed.timestamp()
+
+
+class ChangeJournal:
+    """
+    Append-only JSON-lines journal of EXIF date changes.
+
+    Records are queued and written by a background thread, so recording a
+    change never waits for the disk. The file is rotated like a log file
+    (``changes.jsonl``, ``changes.jsonl.1``, ...). Every record carries the
+    id of the session (app run) that wrote it.
+    """
+
+    def __init__(
+        self,
+        path,
+        max_bytes=DEFAULT_MAX_BYTES,
+        backup_count=DEFAULT_BACKUP_COUNT,
+        session=None,
+    ):
+        self.path = path
+        self.backup_count = backup_count
+        self.session = session or uuid.uuid4().hex[:12]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._handler = RotatingFileHandler(
+            path,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue = queue.Queue()
+        self._listener = QueueListener(self._queue, self._handler)
+        self._listener.start()
+
+    def record(self, image_path, old_dates, new_date, action=ACTION_CHANGE):
+        """
+        Queue one change record.
+
+        :param image_path: Path of the changed image.
+        :param old_dates: Dict with the previous 'original', 'digitized' and
+                          'image' values (None where a tag was missing).
+        :param new_date: Date written to all three tags, or a dict per tag.
+        :param action: ACTION_CHANGE, ACTION_UNDO or ACTION_REPLAY.
+        """
+        now = time.time()
+        entry = {
+            "ts": now,
+            "time": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            "session": self.session,
+            "action": action,
+            "file": os.path.abspath(image_path),
+            "old": {key: old_dates.get(key) for key in DATE_KEYS},
+            "new": new_date,
+        }
+        record = logging.makeLogRecord(
+            {"msg": json.dumps(entry), "levelno": logging.INFO}
+        )
+        self._queue.put_nowait(record)
+
+    def flush(self):
+        """Wait until every queued record is on disk."""
+        self._queue.join()
+        self._handler.flush()
+
+    def close(self):
+        self._listener.stop()
+        self._handler.close()
+
+    def _files(self):
+        """Journal files from the oldest to the newest."""
+        paths = [f"{self.path}.{i}" for i in range(self.backup_count, 0, -1)]
+        paths.append(self.path)
+        return [path for path in paths if os.path.isfile(path)]
+
+    def entries(self, image_path=None, since=None, until=None, session=None):
+        """
+        Return journal records in the order they were written.
+
+        :param image_path: Only records of this file.
+        :param since: Only records at or after this time (see ``parse_time``).
+        :param until: Only records at or before this time.
+        :param session: Only records of this session id.
+        """
+        self.flush()
+        since, until = parse_time(since), parse_time(until)
+        image_path = os.path.abspath(image_path) if image_path else None
+        entries = []
+        for path in self._files():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping malformed journal line in '{path}'")
+                        continue
+                    if image_path is not None and entry["file"] != image_path:
+                        continue
+                    if since is not None and entry["ts"] < since:
+                        continue
+                    if until is not None and entry["ts"] > until:
+                        continue
+                    if session is not None and entry["session"] != session:
+                        continue
+                    entries.append(entry)
+        return entries
+
+    def _restore(self, targets, action, dry_run):
+        results = {"restored": [], "failed": []}
+        for image_path, dates in targets.items():
+            if dry_run:
+                results["restored"].append({"file": image_path, "dates": dates})
+                continue
+            try:
+                # The file may have changed since the journaled write, so the
+                # values it actually had are recorded
+                old_dates = set_image_dates(image_path, dates)
+            except Exception as e:
+                logger.error(
+                    f"ERROR: Failed to {action} '{image_path}' | Reason: {str(e)}"
+                )
+                results["failed"].append({"file": image_path, "error": str(e)})
+                continue
+            self.record(image_path, old_dates, dates, action)
+            results["restored"].append({"file": image_path, "dates": dates})
+        return results
+
+    def undo(
+        self, image_path=None, since=None, until=None, session=None, dry_run=False
+    ):
+        """
+        Restore the dates files had before the matching changes.
+
+        For each file the values from before its earliest matching change are
+        written back, so undoing a whole session or time window restores the
+        state before it started. Undo operations are journaled too.
+
+        :return: Dict with "restored" and "failed" lists of files.
+        """
+        targets = {}
+        for entry in self.entries(image_path, since, until, session):
+            if entry["action"] == ACTION_CHANGE and entry["file"] not in targets:
+                targets[entry["file"]] = entry["old"]
+        return self._restore(targets, ACTION_UNDO, dry_run)
+
+    def replay(
+        self, image_path=None, since=None, until=None, session=None, dry_run=False
+    ):
+        """
+        Re-apply the matching changes, e.g. after an undo went too far.
+
+        For each file the value of its latest matching change is written.
+
+        :return: Dict with "restored" and "failed" lists of files.
+        """
+        targets = {}
+        for entry in self.entries(image_path, since, until, session):
+            if entry["action"] == ACTION_CHANGE:
+                targets[entry["file"]] = _new_dates(entry)
+        return self._restore(targets, ACTION_REPLAY, dry_run)
+
+
+def _new_dates(entry):
+    new = entry["new"]
+    if isinstance(new, dict):
+        return {key: new.get(key) for key in DATE_KEYS}
+    return {key: new for key in DATE_KEYS}
@@ -0,0 +1,180 @@
+import bisect
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PREFIX = "phototimesleuth"
+
+# Upper bounds in seconds, from cached thumbnails up to AI requests
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, cheap enough to update on every request."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Metrics:
+    """
+    Request and phase timings, rendered in the Prometheus text format.
+
+    Histograms and counters are keyed by a tuple of ``(label, value)`` pairs.
+    A single lock guards all updates; each update is a handful of operations.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._requests = {}  # labels -> Histogram
+        self._responses = defaultdict(int)  # labels + status -> count
+        self._phases = {}  # labels -> Histogram
+        self._gauges = {}  # name -> (help, callable or value)
+
+    def _observe(self, histograms, labels, seconds):
+        with self._lock:
+            histogram = histograms.get(labels)
+            if histogram is None:
+                histogram = histograms[labels] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_request(self, route, method, status, seconds):
+        labels = (("route", route), ("method", method))
+        self._observe(self._requests, labels, seconds)
+        with self._lock:
+            self._responses[labels + (("status", str(status)),)] += 1
+
+    def observe_phase(self, phase, seconds):
+        self._observe(self._phases, (("phase", phase),), seconds)
+
+    @contextmanager
+    def timed(self, phase):
+        """Time the body of a ``with`` block as ``phase``, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(phase, time.perf_counter() - start)
+
+    def set_gauge(self, name, help_text, value):
+        """Export ``value``, or the result of calling it, as a gauge."""
+        with self._lock:
+            self._gauges[name] = (help_text, value)
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._responses.clear()
+            self._phases.clear()
+
+    def _render_histograms(self, lines, name, help_text, histograms):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(labels + (("le", le),))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            self._render_histograms(
+                lines,
+                f"{PREFIX}_request_duration_seconds",
+                "Latency of HTTP requests by route.",
+                self._requests,
+            )
+            name = f"{PREFIX}_requests_total"
+            lines.append(f"# HELP {name} HTTP responses by route and status code.")
+            lines.append(f"# TYPE {name} counter")
+            for labels, count in sorted(self._responses.items()):
+                lines.append(f"{name}{_format_labels(labels)} {count}")
+            self._render_histograms(
+                lines,
+                f"{PREFIX}_phase_duration_seconds",
+                "Latency of the stages of photo, EXIF and AI operations.",
+                self._phases,
+            )
+            gauges = sorted(self._gauges.items())
+        for name, (help_text, value) in gauges:
+            if callable(value):
+                value = value()
+            if value is None:
+                continue
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines.append(f"{PREFIX}_{name} {value!r}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared by the app and the helpers
+METRICS = Metrics()
+
+
+def timed(phase):
+    """Time a ``with`` block, or every call of a decorated function, as ``phase``."""
+    return METRICS.timed(phase)
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of the process in bytes."""
+    import psutil
+
+    memory = psutil.Process().memory_info()
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        peak = peak if sys.platform == "darwin" else peak * 1024
+    else:
+        peak = memory.peak_wset
+    # The kernel updates the high-water mark lazily, so it can trail the
+    # current size
+    return max(peak, memory.rss)
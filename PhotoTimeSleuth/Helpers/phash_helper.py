@@ -0,0 +1,354 @@
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PhotoTimeSleuth.Helpers.file_helper import PHOTO_EXTENSIONS
+from PhotoTimeSleuth.Helpers.thumbnail_helper import load_thumbnail
+
+logger = logging.getLogger(__name__)
+
+# dHash compares HASH_SIZE + 1 columns of HASH_SIZE rows into a 64-bit hash
+HASH_SIZE = 8
+# Edge of the downsized copy the hash is computed from; small enough for the
+# EXIF thumbnail or a 1/8 draft decode of most JPEGs to cover it
+DECODE_EDGE = 64
+# Differing bits up to which two photos count as near-duplicates
+DEFAULT_MAX_DISTANCE = 6
+# Neighbouring grid pixels closer than this many gray levels differ by noise
+# (JPEG artefacts, sensor grain) rather than picture content
+MIN_CONTRAST = 3
+# Fewer pixel pairs with MIN_CONTRAST than this make a photo too flat to hash:
+# its bits are mostly noise, and all flat photos would match each other
+MIN_TEXTURE = 16
+
+
+@functools.cache
+def _popcount8():
+    """Set bits per byte, for NumPy versions without np.bitwise_count."""
+    import numpy as np
+
+    return np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(
+        axis=1, dtype=np.uint8
+    )
+
+
+def dhash(image_path):
+    """
+    Compute the 64-bit difference hash of a photo.
+
+    The photo is decoded small and orientation-corrected, reduced to a 9x8
+    grayscale grid, and each bit records whether a pixel is brighter than its
+    left neighbour. Re-encodes, resizes and EXIF rewrites of the same picture
+    give hashes that differ in few bits.
+
+    :param image_path: Path to the image.
+    :return: Hash as a Python int, or None if the photo is too flat (blank,
+             single-coloured or nearly so) for the hash to mean anything.
+    """
+    import numpy as np
+    from PIL import Image
+
+    thumb, _ = load_thumbnail(image_path, DECODE_EDGE, DECODE_EDGE)
+    grid = np.asarray(
+        thumb.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR),
+        dtype=np.int16,
+    )
+    differences = grid[:, 1:] - grid[:, :-1]
+    if np.count_nonzero(np.abs(differences) >= MIN_CONTRAST) < MIN_TEXTURE:
+        return None
+    return int.from_bytes(np.packbits(differences > 0).tobytes(), "big")
+
+
+def hamming_distances(hashes, value):
+    """
+    Return the number of differing bits between each hash and ``value``.
+
+    :param hashes: uint64 NumPy array of hashes.
+    :param value: Hash to compare against.
+    :return: uint8 NumPy array of distances.
+    """
+    import numpy as np
+
+    diff = np.bitwise_xor(hashes, np.uint64(value))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(diff)
+    return _popcount8()[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+def _hash_one(image_path):
+    try:
+        return dhash(image_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+class DuplicateIndex:
+    """
+    Perceptual hashes of the photos in one directory, for near-duplicate lookups.
+
+    Hashes live in one uint64 NumPy array (8 bytes per photo), so a lookup is
+    a single vectorized XOR and popcount over the whole directory. Like the
+    photo catalog, :meth:`refresh` only stats the directory and hashes new or
+    changed files, in a thread pool whose decodes share the process-wide
+    decode budget. Photos too flat to hash are left out. With an
+    ``index_path`` the hashes are saved as a ``.npz`` file and reused on the
+    next start.
+    """
+
+    def __init__(self, photo_dir, index_path=None, workers=None):
+        import numpy as np
+
+        self.photo_dir = photo_dir
+        self.index_path = index_path
+        self.workers = workers
+        self.total = 0
+        self.hashed = 0
+        self._names = []
+        self._positions = {}
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._identities = {}  # name -> (size, mtime_ns) the hash was taken at
+        self._skipped = {}  # name -> (size, mtime_ns) of unreadable or flat files
+        self._lock = threading.Lock()  # Guards the arrays above
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._scanned_mtime = None  # Directory mtime the last scan started at
+        self._load()
+
+    def _load(self):
+        import numpy as np
+
+        if not self.index_path or not os.path.isfile(self.index_path):
+            return
+        try:
+            with np.load(self.index_path) as data:
+                names = [str(name) for name in data["names"]]
+                self._set(
+                    names,
+                    data["hashes"].astype(np.uint64),
+                    {
+                        name: (int(size), int(mtime_ns))
+                        for name, size, mtime_ns in zip(
+                            names, data["sizes"], data["mtimes"]
+                        )
+                    },
+                )
+        except Exception as e:
+            logger.error(
+                f"ERROR: Failed to load hash index '{self.index_path}' | Reason: {str(e)}"
+            )
+
+    def _save(self):
+        import numpy as np
+
+        with self._lock:
+            names = list(self._names)
+            hashes = self._hashes
+            identities = [self._identities[name] for name in names]
+        partial = self.index_path + ".tmp.npz"
+        np.savez(
+            partial,
+            names=np.array(names, dtype=str),
+            hashes=hashes,
+            sizes=np.array([size for size, _ in identities], dtype=np.int64),
+            mtimes=np.array([mtime_ns for _, mtime_ns in identities], dtype=np.int64),
+        )
+        os.replace(partial, self.index_path)
+
+    def _set(self, names, hashes, identities):
+        with self._lock:
+            self._names = names
+            self._positions = {name: i for i, name in enumerate(names)}
+            self._hashes = hashes
+            self._identities = identities
+
+    @property
+    def building(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._names)
+
+    def _directory_mtime(self):
+        return os.stat(self.photo_dir).st_mtime_ns
+
+    def changed(self):
+        """Return whether files were added, removed or renamed since the last scan."""
+        try:
+            return self._directory_mtime() != self._scanned_mtime
+        except OSError:
+            return False
+
+    def refresh(self):
+        """
+        Bring the index in line with the directory.
+
+        :return: (added or updated, removed) counts.
+        """
+        import numpy as np
+
+        with self._refresh_lock:
+            # Taken first, so changes made during the scan trigger another
+            scanned_mtime = self._directory_mtime()
+            on_disk = {}
+            with os.scandir(self.photo_dir) as entries:
+                for entry in entries:
+                    if (
+                        entry.name.lower().endswith(PHOTO_EXTENSIONS)
+                        and entry.is_file()
+                    ):
+                        stat = entry.stat()
+                        on_disk[entry.name] = (stat.st_size, stat.st_mtime_ns)
+
+            with self._lock:
+                known = dict(self._identities)
+                hashes = dict(zip(self._names, self._hashes.tolist()))
+            removed = [name for name in known if name not in on_disk]
+            changed = sorted(
+                name
+                for name, identity in on_disk.items()
+                if known.get(name) != identity and self._skipped.get(name) != identity
+            )
+            self.total, self.hashed = len(changed), 0
+            for name, (value, error) in zip(changed, self._hash_files(changed)):
+                if value is None:
+                    if error is not None:
+                        logger.error(
+                            f"ERROR: Failed to hash '{name}' | Reason: {error}"
+                        )
+                    else:
+                        logger.debug(f"Not hashing '{name}': too flat")
+                    self._skipped[name] = on_disk[name]
+                    hashes.pop(name, None)
+                    known.pop(name, None)
+                else:
+                    hashes[name] = value
+                    known[name] = on_disk[name]
+            for name in removed:
+                hashes.pop(name, None)
+                known.pop(name, None)
+
+            if changed or removed:
+                names = sorted(hashes)
+                self._set(
+                    names,
+                    np.fromiter(
+                        (hashes[name] for name in names), np.uint64, len(names)
+                    ),
+                    {name: known[name] for name in names},
+                )
+                if self.index_path:
+                    self._save()
+            self._scanned_mtime = scanned_mtime
+        return len(changed), len(removed)
+
+    def _hash_files(self, names):
+        paths = [os.path.join(self.photo_dir, name) for name in names]
+        if len(paths) < 2 or self.workers == 1:
+            for path in paths:
+                result = _hash_one(path)
+                self.hashed += 1
+                yield result
+            return
+        # Threads rather than processes, so every decode reserves memory from
+        # the shared DECODE_BUDGET; Pillow releases the GIL while decoding
+        # and resizing
+        with ThreadPoolExecutor(
+            max_workers=self.workers or os.cpu_count() or 4,
+            thread_name_prefix="dhash",
+        ) as executor:
+            for result in executor.map(_hash_one, paths):
+                self.hashed += 1
+                yield result
+
+    def refresh_async(self):
+        """
+        Start :meth:`refresh` in a background thread if the directory changed.
+
+        Only the directory is stat'ed, so this is cheap enough to call on
+        every listing. Files edited in place are picked up by the next scan.
+
+        :return: Whether a refresh was started.
+        """
+        with self._lock:
+            if self.building or not self.changed():
+                return False
+            self._thread = threading.Thread(
+                target=self._refresh_logged, name="duplicate-index", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _refresh_logged(self):
+        start = time.perf_counter()
+        try:
+            updated, removed = self.refresh()
+        except Exception as e:
+            logger.error(
+                f"ERROR: Failed to index '{self.photo_dir}' | Reason: {str(e)}"
+            )
+            return
+        if updated or removed:
+            logger.info(
+                f"Hashed {updated} photos in '{self.photo_dir}' "
+                f"({removed} removed) in {time.perf_counter() - start:.1f}s"
+            )
+
+    def wait(self, timeout=None):
+        """Wait for a background refresh; return whether none is running."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.building
+
+    def near_duplicates(self, filename, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Find the photos that look like ``filename``.
+
+        :param filename: Name of an indexed photo.
+        :param max_distance: Maximum number of differing hash bits.
+        :return: List of (filename, distance) tuples, closest first, without
+                 ``filename`` itself.
+        :raises KeyError: If ``filename`` is not indexed (yet), or too flat to
+                          be hashed.
+        """
+        import numpy as np
+
+        with self._lock:
+            position = self._positions[filename]
+            hashes, names = self._hashes, self._names
+        distances = hamming_distances(hashes, hashes[position])
+        matches = np.flatnonzero(distances <= max_distance)
+        matches = matches[matches != position]
+        matches = matches[np.argsort(distances[matches], kind="stable")]
+        return [(names[i], int(distances[i])) for i in matches]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_duplicate_index(photo_dir, index_dir=None):
+    """
+    Return the shared duplicate index of ``photo_dir``.
+
+    :param index_dir: Directory the hashes are saved in, or None to keep them
+                      in memory only.
+    """
+    photo_dir = os.path.abspath(photo_dir)
+    with _indexes_lock:
+        index = _indexes.get(photo_dir)
+        if index is None:
+            index_path = None
+            if index_dir:
+                os.makedirs(index_dir, exist_ok=True)
+                digest = hashlib.sha1(os.path.normcase(photo_dir).encode("utf-8"))
+                index_path = os.path.join(
+                    index_dir, f"{digest.hexdigest()[:16]}.dhash.npz"
+                )
+            index = _indexes[photo_dir] = DuplicateIndex(photo_dir, index_path)
+        return index
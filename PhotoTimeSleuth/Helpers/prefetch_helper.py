@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PhotoTimeSleuth.Helpers.exif_helper import read_image_date
+from PhotoTimeSleuth.Helpers.thumbnail_helper import (
+    DEFAULT_QUALITY,
+    FORMAT_JPEG,
+    get_thumbnail,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_LOOKAHEAD = 3
+MAX_CACHED_DATES = 4096
+# Clients with a batch of their own; the least recently active one is
+# dropped beyond this
+MAX_BATCHES = 256
+
+
+class Prefetcher:
+    """
+    Warm thumbnails and EXIF dates of the photos around the one being viewed.
+
+    Each call to :meth:`schedule` replaces the previous batch of the same
+    ``key`` (e.g. a browser session): queued work is cancelled and jobs that
+    already started stop at their next checkpoint. Batches of other keys keep
+    running, so one user's navigation does not cancel another's prefetch.
+    """
+
+    def __init__(
+        self, thumbnail_cache=None, workers=DEFAULT_WORKERS, lookahead=DEFAULT_LOOKAHEAD
+    ):
+        self.thumbnail_cache = thumbnail_cache
+        self.lookahead = lookahead
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="prefetch"
+        )
+        self._lock = threading.Lock()
+        self._batches = OrderedDict()  # key -> (token, futures), oldest first
+        self._dates = OrderedDict()  # (path, mtime_ns, size) -> date
+
+    def schedule(
+        self,
+        photo_dir,
+        photos,
+        index,
+        width=None,
+        height=None,
+        fmt=FORMAT_JPEG,
+        quality=DEFAULT_QUALITY,
+        key=None,
+    ):
+        """
+        Prefetch photos ``index + 1`` to ``index + lookahead`` and ``index - 1``.
+
+        Indices wrap around the list the same way the UI navigation does.
+        Thumbnails are rendered in the format and quality tier the UI will
+        request, so its requests hit the cache.
+
+        :param key: Client the batch belongs to; replaces its previous batch.
+        """
+        if not photos:
+            return
+        count = len(photos)
+        offsets = list(range(1, self.lookahead + 1)) + [-1]
+        indices = []
+        for offset in offsets:
+            i = (index + offset) % count
+            if i != index and i not in indices:
+                indices.append(i)
+
+        with self._lock:
+            self._cancel_locked(key)
+            # Registered before submitting, so workers see the batch current
+            token = object()
+            futures = []
+            self._batches[key] = (token, futures)
+            while len(self._batches) > MAX_BATCHES:
+                self._cancel_locked(next(iter(self._batches)))
+            for i in indices:
+                futures.append(
+                    self._executor.submit(
+                        self._warm,
+                        key,
+                        token,
+                        os.path.join(photo_dir, photos[i]),
+                        width,
+                        height,
+                        fmt,
+                        quality,
+                    )
+                )
+
+    def cancel(self, key=None):
+        """Drop the pending prefetch work of ``key``, e.g. after a directory change."""
+        with self._lock:
+            self._cancel_locked(key)
+
+    def _cancel_locked(self, key):
+        _, futures = self._batches.pop(key, (None, []))
+        for future in futures:
+            future.cancel()
+
+    def _is_current(self, key, token):
+        return self._batches.get(key, (None,))[0] is token
+
+    def _warm(self, key, token, image_path, width, height, fmt, quality):
+        if not self._is_current(key, token):
+            return
+        try:
+            self.get_image_date(image_path)
+            if not self._is_current(key, token):
+                return
+            if self.thumbnail_cache is not None and (width or height):
+                get_thumbnail(
+                    image_path, width, height, self.thumbnail_cache, fmt, quality
+                )
+        except Exception as e:
+            logger.debug(f"Prefetch of '{image_path}' failed | Reason: {str(e)}")
+
+    def get_image_date(self, image_path):
+        """Return the EXIF date of ``image_path``, memoized on mtime and size."""
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key in self._dates:
+                self._dates.move_to_end(key)
+                return self._dates[key]
+        date = read_image_date(image_path)
+        with self._lock:
+            self._dates[key] = date
+            while len(self._dates) > MAX_CACHED_DATES:
+                self._dates.popitem(last=False)
+        return date
+
+    def shutdown(self):
+        with self._lock:
+            for key in list(self._batches):
+                self._cancel_locked(key)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,415 @@
+import functools
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+
+from PhotoTimeSleuth.Helpers.decode_helper import DECODE_BUDGET
+from PhotoTimeSleuth.Helpers.metrics_helper import METRICS, timed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# Names of the decode paths reported by render_thumbnail
+DECODE_EXIF_THUMBNAIL = "exif_thumbnail"
+DECODE_DRAFT = "draft"
+DECODE_FULL = "full"
+
+# Output formats of render_thumbnail, as Pillow format names
+FORMAT_JPEG = "JPEG"
+FORMAT_WEBP = "WEBP"
+MIME_TYPES = {FORMAT_JPEG: "image/jpeg", FORMAT_WEBP: "image/webp"}
+
+# Encoder quality per tier, e.g. a quick preview before the sharper image
+QUALITY_TIERS = {"preview": 40, "standard": 75, "high": 90}
+DEFAULT_QUALITY = "standard"
+
+ORIENTATION_TAG = 0x0112
+JPEG_INTERCHANGE_FORMAT = 0x0201
+JPEG_INTERCHANGE_FORMAT_LENGTH = 0x0202
+
+# Same mapping as PIL.ImageOps.exif_transpose, as names of Image.Transpose
+# members so PIL is only imported once an image is decoded
+ORIENTATION_TRANSPOSE = {
+    2: "FLIP_LEFT_RIGHT",
+    3: "ROTATE_180",
+    4: "FLIP_TOP_BOTTOM",
+    5: "TRANSPOSE",
+    6: "ROTATE_270",
+    7: "TRANSVERSE",
+    8: "ROTATE_90",
+}
+
+
+def compute_target_size(orig_width, orig_height, width=None, height=None):
+    """
+    Work out the output size for a thumbnail, preserving the aspect ratio.
+
+    :param orig_width: Width of the (orientation-corrected) source image.
+    :param orig_height: Height of the (orientation-corrected) source image.
+    :param width: Requested width, or None.
+    :param height: Requested height, or None.
+    :return: (width, height) tuple that fits inside the requested box.
+    """
+    if width and not height:
+        height = int((width / orig_width) * orig_height)
+    elif height and not width:
+        width = int((height / orig_height) * orig_width)
+    elif width and height:
+        aspect_ratio = orig_width / orig_height
+        target_ratio = width / height
+
+        if target_ratio > aspect_ratio:
+            width = int(height * aspect_ratio)
+        else:
+            height = int(width / aspect_ratio)
+    return max(width, 1), max(height, 1)
+
+
+def _load_exif_thumbnail(img, exif, stored_size):
+    """
+    Return the embedded EXIF thumbnail if it covers ``stored_size``.
+
+    The thumbnail is only used when its aspect ratio matches the main image,
+    since many cameras pad it with black bars to a fixed 4:3 frame.
+    """
+    from PIL import ExifTags, Image
+
+    raw_exif = img.info.get("exif")
+    if not raw_exif or not raw_exif.startswith(b"Exif\x00\x00"):
+        return None
+    try:
+        ifd1 = exif.get_ifd(ExifTags.IFD.IFD1)
+    except Exception:
+        return None
+    offset = ifd1.get(JPEG_INTERCHANGE_FORMAT)
+    length = ifd1.get(JPEG_INTERCHANGE_FORMAT_LENGTH)
+    if not offset or not length:
+        return None
+
+    start = 6 + offset  # Offsets are relative to the TIFF header
+    data = raw_exif[start : start + length]
+    try:
+        thumb = Image.open(io.BytesIO(data))
+        thumb.load()
+    except Exception:
+        return None
+
+    if thumb.width < stored_size[0] or thumb.height < stored_size[1]:
+        return None
+    main_ratio = img.width / img.height
+    if abs(thumb.width / thumb.height - main_ratio) > 0.01 * main_ratio:
+        return None
+    return thumb
+
+
+def load_thumbnail(image_path, width=None, height=None, fast=True):
+    """
+    Decode a downsized copy of an image, respecting its EXIF orientation.
+
+    With ``fast`` enabled the smallest source that still covers the requested
+    size is decoded: the embedded EXIF thumbnail, a reduced-scale JPEG decode
+    (1/2, 1/4 or 1/8 through draft mode), or the full image as a last resort.
+    The decode waits for room in the shared ``DECODE_BUDGET``.
+
+    :param image_path: Path to the input image.
+    :param width: Requested width, or None.
+    :param height: Requested height, or None.
+    :param fast: Allow the EXIF thumbnail and draft decode paths.
+    :return: (RGB or L mode PIL image, name of the decode path used)
+    :raises ImageTooLarge: If the decode exceeds the pixel limit.
+    """
+    from PIL import Image
+
+    start = time.perf_counter()
+    # Held until the image is closed, which frees its pixels
+    with ExitStack() as reservation, Image.open(image_path) as img:
+        if img.format != "JPEG":
+            # Reading the EXIF data of e.g. PNGs decodes the whole image
+            edge = max(compute_target_size(img.width, img.height, width, height))
+            reservation.enter_context(
+                DECODE_BUDGET.reserve(img.size, (edge, edge), img.mode)
+            )
+        exif = img.getexif()
+        orientation = exif.get(ORIENTATION_TAG, 1)
+        swapped = orientation in (5, 6, 7, 8)
+        if swapped:
+            size = compute_target_size(img.height, img.width, width, height)
+            stored_size = (size[1], size[0])
+        else:
+            size = compute_target_size(img.width, img.height, width, height)
+            stored_size = size
+
+        source = None
+        decode_path = DECODE_FULL
+        if fast:
+            source = _load_exif_thumbnail(img, exif, stored_size)
+            if source is not None:
+                decode_path = DECODE_EXIF_THUMBNAIL
+            elif img.format == "JPEG":
+                full_size = img.size
+                img.draft("RGB", stored_size)
+                if img.size != full_size:
+                    decode_path = DECODE_DRAFT
+        if source is None:
+            source = img
+        if img.format == "JPEG":
+            # Sized after picking the draft scale
+            reservation.enter_context(
+                DECODE_BUDGET.reserve(source.size, stored_size, source.mode)
+            )
+        METRICS.observe_phase("thumbnail_open", time.perf_counter() - start)
+
+        # Resize in stored orientation, then transpose the small output.
+        # Pixel data is decoded lazily, so the resize phase includes decoding.
+        with timed("thumbnail_resize"):
+            thumb = source.resize(stored_size, Image.LANCZOS)
+        with timed("thumbnail_transpose"):
+            if orientation in ORIENTATION_TRANSPOSE:
+                thumb = thumb.transpose(
+                    getattr(Image.Transpose, ORIENTATION_TRANSPOSE[orientation])
+                )
+            if thumb.mode not in ("RGB", "L"):
+                thumb = thumb.convert("RGB")
+    return thumb, decode_path
+
+
+@functools.cache
+def webp_supported():
+    """Return whether Pillow was built with WebP encoding."""
+    from PIL import features
+
+    return features.check("webp")
+
+
+def encode_image(img, fmt=FORMAT_JPEG, quality=DEFAULT_QUALITY):
+    """
+    Encode a downsized image as WebP or progressive JPEG.
+
+    :param img: RGB or L mode PIL image.
+    :param fmt: FORMAT_JPEG or FORMAT_WEBP.
+    :param quality: Name of a tier in QUALITY_TIERS.
+    :return: Encoded bytes.
+    """
+    with timed("thumbnail_encode"):
+        img_io = io.BytesIO()
+        if fmt == FORMAT_WEBP:
+            img.save(img_io, format="WEBP", quality=QUALITY_TIERS[quality])
+        else:
+            # Progressive JPEGs always get optimized Huffman tables, which
+            # alone saves a few percent over the baseline encoder
+            img.save(
+                img_io,
+                format="JPEG",
+                quality=QUALITY_TIERS[quality],
+                progressive=True,
+            )
+    return img_io.getvalue()
+
+
+def render_thumbnail(
+    image_path,
+    width=None,
+    height=None,
+    fast=True,
+    fmt=FORMAT_JPEG,
+    quality=DEFAULT_QUALITY,
+):
+    """
+    Create a downsized image, respecting its EXIF orientation.
+
+    JPEGs are encoded progressively, so browsers can show a coarse version
+    while the rest arrives. See :func:`load_thumbnail` for the decode paths.
+
+    :param image_path: Path to the input image.
+    :param width: Requested width, or None.
+    :param height: Requested height, or None.
+    :param fast: Allow the EXIF thumbnail and draft decode paths.
+    :param fmt: FORMAT_JPEG or FORMAT_WEBP.
+    :param quality: Name of a tier in QUALITY_TIERS.
+    :return: (Encoded bytes, name of the decode path used)
+    """
+    start = time.perf_counter()
+    thumb, decode_path = load_thumbnail(image_path, width, height, fast)
+    data = encode_image(thumb, fmt, quality)
+
+    logger.debug(
+        f"Thumbnail of '{image_path}' at {thumb.size} as {fmt} ({quality}) "
+        f"via {decode_path} "
+        f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return data, decode_path
+
+
+_inflight_lock = threading.Lock()
+_inflight = {}  # (path, variant) -> Event set once the render finished
+
+
+def get_thumbnail(
+    image_path,
+    width=None,
+    height=None,
+    cache=None,
+    fmt=FORMAT_JPEG,
+    quality=DEFAULT_QUALITY,
+):
+    """
+    Return a thumbnail from ``cache`` or render it, filling the cache.
+
+    Concurrent requests for the same thumbnail (e.g. a prefetch racing the
+    browser) wait for the first render instead of decoding the image twice.
+
+    :return: (Encoded bytes, decode path or "cache" on a hit)
+    """
+    if cache is None:
+        return render_thumbnail(image_path, width, height, fmt=fmt, quality=quality)
+
+    variant = (width or 0, height or 0, fmt, quality)
+    key = (os.path.abspath(image_path), variant)
+    while True:
+        data = cache.get(image_path, variant)
+        if data is not None:
+            return data, "cache"
+        with _inflight_lock:
+            event = _inflight.get(key)
+            if event is None:
+                event = _inflight[key] = threading.Event()
+                break
+        event.wait()
+
+    try:
+        data, decode_path = render_thumbnail(
+            image_path, width, height, fmt=fmt, quality=quality
+        )
+        cache.put(image_path, variant, data)
+        return data, decode_path
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        event.set()
+
+
+class ThumbnailCache:
+    """
+    On-disk cache of generated thumbnails with a byte budget and LRU eviction.
+
+    Entries are keyed on the source path together with its mtime and size and
+    the requested variant (e.g. ``(width, height)``), so a rewritten file never
+    hits a stale entry. The file name of each entry starts with a digest of the
+    source path, which lets :meth:`invalidate` drop every variant of one photo.
+    Entries derived from several files (e.g. contact sheets of a directory)
+    pass their own ``identity`` instead of the mtime and size of the path.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # entry name -> size, oldest first
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def _path_digest(image_path):
+        full_path = os.path.normcase(os.path.abspath(image_path))
+        return hashlib.sha1(full_path.encode("utf-8")).hexdigest()[:16]
+
+    def _entry_name(self, image_path, variant, identity=None):
+        if identity is None:
+            stat = os.stat(image_path)
+            identity = (stat.st_mtime_ns, stat.st_size)
+        key = repr(tuple(identity) + tuple(variant))
+        variant_digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return f"{self._path_digest(image_path)}-{variant_digest}.bin"
+
+    def get(self, image_path, variant, identity=None):
+        """
+        Return the cached bytes for ``variant`` of ``image_path``, or None.
+
+        :param identity: Tuple identifying the content, instead of the mtime
+                         and size of ``image_path``.
+        """
+        try:
+            name = self._entry_name(image_path, variant, identity)
+        except OSError:
+            return None
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        entry_path = os.path.join(self.cache_dir, name)
+        try:
+            with open(entry_path, "rb") as f:
+                data = f.read()
+            os.utime(entry_path)  # Persist recency across restarts
+            return data
+        except OSError:
+            self._forget(name)
+            return None
+
+    def put(self, image_path, variant, data, identity=None):
+        """Store ``data`` as ``variant`` of ``image_path`` and enforce the budget."""
+        if len(data) > self.max_bytes:
+            return
+        try:
+            name = self._entry_name(image_path, variant, identity)
+        except OSError:
+            return
+        entry_path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.error(f"ERROR: Failed to cache thumbnail {name} | Reason: {e}")
+            return
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._evict_locked()
+
+    def invalidate(self, image_path):
+        """Drop every cached variant of ``image_path``."""
+        prefix = self._path_digest(image_path) + "-"
+        with self._lock:
+            names = [name for name in self._entries if name.startswith(prefix)]
+        for name in names:
+            self._forget(name)
+
+    def _forget(self, name):
+        with self._lock:
+            self._total_bytes -= self._entries.pop(name, 0)
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
@@ -0,0 +1,414 @@
+import hashlib
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+
+from PhotoTimeSleuth.Helpers.decode_helper import DECODE_BUDGET
+from PhotoTimeSleuth.Helpers.metrics_helper import timed
+from PhotoTimeSleuth.Helpers.thumbnail_helper import (
+    FORMAT_JPEG,
+    ORIENTATION_TAG,
+    ORIENTATION_TRANSPOSE,
+    encode_image,
+)
+
+logger = logging.getLogger(__name__)
+
+# Deep Zoom defaults: 254 pixel tiles with 1 pixel of overlap on inner edges
+TILE_SIZE = 254
+TILE_OVERLAP = 1
+TILE_FORMAT = "jpg"
+TILE_QUALITY = "high"
+# Bump when tile rendering changes, so old pyramids are not reused
+TILE_VERSION = 1
+DEFAULT_TILE_CACHE_BYTES = 1024 * 1024 * 1024
+DZI_NAMESPACE = "http://schemas.microsoft.com/deepzoom/2008"
+
+
+def max_level(width, height):
+    """Return the level of the full-size image; level 0 is 1x1 pixel."""
+    return max(math.ceil(math.log2(max(width, height, 1))), 0)
+
+
+def level_size(width, height, level):
+    """Return the (width, height) of ``level`` of a width x height image."""
+    scale = 2 ** (max_level(width, height) - level)
+    return math.ceil(width / scale), math.ceil(height / scale)
+
+
+def tile_grid(level_width, level_height, tile_size=TILE_SIZE):
+    """Return the (columns, rows) of tiles of a level."""
+    return math.ceil(level_width / tile_size), math.ceil(level_height / tile_size)
+
+
+def tile_box(
+    col, row, level_width, level_height, tile_size=TILE_SIZE, overlap=TILE_OVERLAP
+):
+    """Return the (left, upper, right, lower) pixels of a tile, with overlap."""
+    return (
+        max(col * tile_size - overlap, 0),
+        max(row * tile_size - overlap, 0),
+        min((col + 1) * tile_size + overlap, level_width),
+        min((row + 1) * tile_size + overlap, level_height),
+    )
+
+
+def stored_box(box, orientation, display_size):
+    """
+    Map a box of the orientation-corrected image onto the stored pixels.
+
+    Tiles are cut from the image as stored and each small tile is transposed,
+    so a pyramid level is never transposed as a whole.
+
+    :param box: (left, upper, right, lower) in display orientation.
+    :param orientation: EXIF orientation of the image.
+    :param display_size: (width, height) in display orientation.
+    :return: (left, upper, right, lower) in stored orientation.
+    """
+    x0, y0, x1, y1 = box
+    width, height = display_size
+    corners = {
+        1: lambda x, y: (x, y),
+        2: lambda x, y: (width - x, y),
+        3: lambda x, y: (width - x, height - y),
+        4: lambda x, y: (x, height - y),
+        5: lambda x, y: (y, x),
+        6: lambda x, y: (y, width - x),
+        7: lambda x, y: (height - y, width - x),
+        8: lambda x, y: (height - y, x),
+    }.get(orientation, lambda x, y: (x, y))
+    (ax, ay), (bx, by) = corners(x0, y0), corners(x1, y1)
+    return min(ax, bx), min(ay, by), max(ax, bx), max(ay, by)
+
+
+def _orientation(img):
+    # EXIF of JPEGs is in the header; for other formats only EXIF found while
+    # opening is used, since Pillow decodes e.g. a whole PNG to look further
+    if img.format == "JPEG":
+        return img.getexif().get(ORIENTATION_TAG, 1)
+    if "exif" not in img.info:
+        return 1
+    from PIL import Image
+
+    exif = Image.Exif()
+    exif.load(img.info["exif"])
+    return exif.get(ORIENTATION_TAG, 1)
+
+
+def image_geometry(image_path):
+    """Return (display width, display height, orientation) of a photo."""
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        orientation = _orientation(img)
+        width, height = img.size
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+    return width, height, orientation
+
+
+def dzi_descriptor(width, height):
+    """Return the Deep Zoom Image XML describing a width x height pyramid."""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="{DZI_NAMESPACE}" TileSize="{TILE_SIZE}" '
+        f'Overlap="{TILE_OVERLAP}" Format="{TILE_FORMAT}">'
+        f'<Size Width="{width}" Height="{height}"/></Image>\n'
+    )
+
+
+class TileCache:
+    """
+    On-disk Deep Zoom tile pyramids of photos, generated on demand.
+
+    The first request for a tile of a level decodes that level once (JPEGs at
+    the smallest draft scale that covers it) and writes only the requested
+    tile. A background thread then cuts the rest of the level from the
+    decoded image and derives every lower level from it by halving, so
+    zooming out never decodes the photo again; tiles it has not reached yet
+    are cut from the same image when requested. Each pyramid lives in a
+    directory named after the photo path, mtime and size; least recently used
+    pyramids are removed once the cache exceeds ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_TILE_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pyramids = OrderedDict()  # directory name -> bytes, oldest first
+        self._total_bytes = 0
+        self._level_locks = {}  # (directory name, level) -> Lock
+        self._levels = {}  # (directory name, level) -> decoded level being tiled
+        self._writing = {}  # tile path -> Event set once it is written
+        self._threads = []
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        pyramids = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+            size = 0
+            for root, dirs, files in os.walk(entry.path):
+                for name in list(dirs):
+                    if ".tmp-" in name:  # Level left behind by a crash
+                        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                        dirs.remove(name)
+                for name in files:
+                    path = os.path.join(root, name)
+                    if ".tmp-" in name:  # Tile left behind by a crash
+                        os.remove(path)
+                    else:
+                        size += os.path.getsize(path)
+            pyramids.append((entry.stat().st_mtime, entry.name, size))
+        for _, name, size in sorted(pyramids):
+            self._pyramids[name] = size
+            self._total_bytes += size
+
+    def pyramid_name(self, image_path):
+        """Return the directory name of the pyramid of the current file."""
+        stat = os.stat(image_path)
+        full_path = os.path.normcase(os.path.abspath(image_path))
+        key = repr((full_path, stat.st_mtime_ns, stat.st_size, TILE_VERSION))
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+    def _tile_path(self, name, level, col, row):
+        return os.path.join(
+            self.cache_dir, name, str(level), f"{col}_{row}.{TILE_FORMAT}"
+        )
+
+    def get_tile(self, image_path, level, col, row):
+        """
+        Return the path of one tile, rendering it first if needed.
+
+        :raises ValueError: If the level or tile does not exist.
+        :raises OSError: If the photo cannot be read.
+        """
+        width, height, orientation = image_geometry(image_path)
+        if not 0 <= level <= max_level(width, height):
+            raise ValueError(f"No level {level}")
+        size = level_size(width, height, level)
+        columns, rows = tile_grid(*size)
+        if not (0 <= col < columns and 0 <= row < rows):
+            raise ValueError(f"No tile {col}_{row} at level {level}")
+
+        name = self.pyramid_name(image_path)
+        tile_path = self._tile_path(name, level, col, row)
+        if not os.path.isfile(tile_path):
+            level_img = self._decoded_level(
+                image_path, name, level, (width, height), orientation, tile_path
+            )
+            if level_img is not None and not os.path.isfile(tile_path):
+                self._write_tile(
+                    level_img,
+                    name,
+                    tile_path,
+                    tile_box(col, row, *size),
+                    size,
+                    orientation,
+                )
+        with self._lock:
+            if name in self._pyramids:
+                self._pyramids.move_to_end(name)
+        try:
+            os.utime(os.path.join(self.cache_dir, name))  # Persist recency
+        except OSError:
+            pass
+        return tile_path
+
+    def _decoded_level(
+        self, image_path, name, level, display_size, orientation, tile_path
+    ):
+        """
+        Return the decoded image of a level being tiled.
+
+        If no thread is tiling the level, it is decoded and one is started.
+
+        :return: The level in stored orientation, or None if ``tile_path``
+                 was written meanwhile.
+        """
+        key = (name, level)
+        with self._lock:
+            level_lock = self._level_locks.setdefault(key, threading.Lock())
+        with level_lock:
+            with self._lock:
+                level_img = self._levels.get(key)
+            if level_img is not None or os.path.isfile(tile_path):
+                return level_img
+            level_img, budget = self._decode_level(
+                image_path, level, display_size, orientation
+            )
+            with self._lock:
+                if key in self._levels:  # Reached by the thread tiling a level above
+                    budget.close()
+                    return self._levels[key]
+                self._levels[key] = level_img
+                thread = threading.Thread(
+                    target=self._tile_levels,
+                    args=(image_path, name, level, level_img, budget),
+                    kwargs={"display_size": display_size, "orientation": orientation},
+                    name="tiles",
+                    daemon=True,
+                )
+                self._threads = [t for t in self._threads if t.is_alive()]
+                self._threads.append(thread)
+            thread.start()
+        return level_img
+
+    @staticmethod
+    def _decode_level(image_path, level, display_size, orientation):
+        """
+        Decode one level of a photo in stored orientation.
+
+        :return: (image, ExitStack holding the decode budget of the image)
+        """
+        from PIL import Image
+
+        width, height = display_size
+        target = level_size(width, height, level)
+        if orientation in (5, 6, 7, 8):
+            target = (target[1], target[0])
+        with Image.open(image_path) as img:
+            if img.format == "JPEG":
+                img.draft("RGB", target)
+            reservation = DECODE_BUDGET.reserve(img.size, target, img.mode)
+            with reservation, timed("tile_decode"):
+                if img.size != target:
+                    level_img = img.resize(target, Image.LANCZOS)
+                else:
+                    level_img = img.copy()  # Outlives the opened file
+                if level_img.mode not in ("RGB", "L"):
+                    level_img = level_img.convert("RGB")
+        # Held while the level is tiled in the background
+        budget = ExitStack()
+        budget.enter_context(
+            DECODE_BUDGET.reserve(level_img.size, (0, 0), level_img.mode)
+        )
+        return level_img, budget
+
+    def _tile_levels(
+        self, image_path, name, level, level_img, budget, display_size, orientation
+    ):
+        """Write the missing tiles of a level and of every level below it."""
+        start = time.perf_counter()
+        width, height = display_size
+        written = 0
+        current = level
+        try:
+            with budget:
+                while True:
+                    size = level_size(width, height, current)
+                    columns, rows = tile_grid(*size)
+                    for row in range(rows):
+                        for col in range(columns):
+                            tile_path = self._tile_path(name, current, col, row)
+                            if not os.path.isfile(tile_path):
+                                written += self._write_tile(
+                                    level_img,
+                                    name,
+                                    tile_path,
+                                    tile_box(col, row, *size),
+                                    size,
+                                    orientation,
+                                )
+                    lower = level_img.reduce(2) if current else None
+                    with self._lock:
+                        self._release_level(name, current, level_img)
+                        # Stop where another thread already tiles the levels
+                        if current == 0 or (name, current - 1) in self._levels:
+                            break
+                        current -= 1
+                        level_img = lower
+                        self._levels[(name, current)] = level_img
+        except Exception as e:
+            logger.error(
+                f"ERROR: Failed to render tiles of '{image_path}' | Reason: {str(e)}"
+            )
+            with self._lock:
+                self._release_level(name, current, level_img)
+        self._prune(keep=name)
+        logger.debug(
+            f"Tiles of '{image_path}' down from level {level}: {written} bytes "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+
+    def _release_level(self, name, level, level_img):
+        # Called with self._lock held
+        if self._levels.get((name, level)) is level_img:
+            del self._levels[(name, level)]
+            self._level_locks.pop((name, level), None)
+
+    def _write_tile(self, level_img, name, tile_path, box, size, orientation):
+        """
+        Cut one tile from a level in stored orientation and write it.
+
+        If another thread is writing the tile, wait for it instead.
+
+        :return: Bytes written.
+        """
+        with self._lock:
+            written = self._writing.get(tile_path)
+            if written is None:
+                written = self._writing[tile_path] = threading.Event()
+                writer = True
+            else:
+                writer = False
+        if not writer:
+            written.wait()
+            return 0
+        try:
+            if os.path.isfile(tile_path):  # Finished just before
+                return 0
+            return self._encode_tile(level_img, name, tile_path, box, size, orientation)
+        finally:
+            with self._lock:
+                del self._writing[tile_path]
+            written.set()
+
+    def _encode_tile(self, level_img, name, tile_path, box, size, orientation):
+        from PIL import Image
+
+        tile = level_img.crop(stored_box(box, orientation, size))
+        transpose = ORIENTATION_TRANSPOSE.get(orientation)
+        if transpose:
+            tile = tile.transpose(getattr(Image.Transpose, transpose))
+        with timed("tile_encode"):
+            data = encode_image(tile, FORMAT_JPEG, TILE_QUALITY)
+        os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+        # Published at once; an existing file is a complete tile
+        partial = f"{tile_path}.tmp-{threading.get_ident()}"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, tile_path)
+        with self._lock:
+            self._pyramids[name] = self._pyramids.get(name, 0) + len(data)
+            self._pyramids.move_to_end(name)
+            self._total_bytes += len(data)
+        return len(data)
+
+    def wait(self, timeout=None):
+        """Wait for background tiling; return whether none is running."""
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout)
+        return not any(thread.is_alive() for thread in threads)
+
+    def _prune(self, keep=None):
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes:
+                    return
+                # Pyramids still being tiled are kept
+                busy = {keep} | {name for name, _ in self._levels}
+                name = next((name for name in self._pyramids if name not in busy), None)
+                if name is None:
+                    return
+                self._total_bytes -= self._pyramids.pop(name)
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
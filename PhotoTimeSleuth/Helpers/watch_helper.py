@@ -0,0 +1,341 @@
+import bisect
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from collections import OrderedDict, deque
+
+from PhotoTimeSleuth.Helpers.file_helper import PHOTO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 1.0
+# Deltas kept for clients that reconnect; older clients re-list instead
+MAX_HISTORY = 1024
+
+BACKEND_INOTIFY = "inotify"
+BACKEND_POLLING = "polling"
+
+# From <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CLOSE_WRITE = 0x00000008
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+# Files appear once they are fully written (or moved in), so photos that an
+# import tool is still copying are not listed half-written
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+READ_SIZE = 64 * 1024
+
+
+def _is_photo(name):
+    return name.lower().endswith(PHOTO_EXTENSIONS)
+
+
+def _list_photo_set(photo_dir):
+    with os.scandir(photo_dir) as entries:
+        return {
+            entry.name for entry in entries if _is_photo(entry.name) and entry.is_file()
+        }
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+class PhotoWatcher:
+    """
+    Keep the sorted photo names of one directory up to date in memory.
+
+    The directory is listed once at start. After that, inotify events (or a
+    polling loop where inotify is unavailable) are applied as deltas, so
+    listing costs O(changes) instead of O(directory). Every change bumps
+    :attr:`version` and is kept in a short history for :meth:`changes_since`.
+
+    A delta is a dict with "version", "added", "removed" and "renamed"
+    (a list of [old, new] pairs) keys.
+    """
+
+    def __init__(
+        self, photo_dir, poll_interval=DEFAULT_POLL_INTERVAL, force_polling=False
+    ):
+        self.photo_dir = os.path.abspath(photo_dir)
+        self.poll_interval = poll_interval
+        self.version = 0
+        self._photos = []  # Sorted names
+        self._names = set()
+        self._history = deque(maxlen=MAX_HISTORY)
+        self._changed = threading.Condition()
+        self._stop = threading.Event()
+        self._fd = None
+        self._libc = None if force_polling else _load_libc()
+        self.backend = BACKEND_INOTIFY if self._libc is not None else BACKEND_POLLING
+        self._thread = None
+
+    def start(self):
+        if self.backend == BACKEND_INOTIFY:
+            try:
+                self._fd = self._add_inotify_watch()
+            except OSError as e:
+                logger.warning(
+                    f"inotify unavailable for '{self.photo_dir}', polling instead "
+                    f"| Reason: {str(e)}"
+                )
+                self.backend = BACKEND_POLLING
+        # List after the watch exists, so no file slips in between
+        names = _list_photo_set(self.photo_dir)
+        with self._changed:
+            self._names = names
+            self._photos = sorted(names)
+        target = (
+            self._run_inotify if self.backend == BACKEND_INOTIFY else self._run_polling
+        )
+        self._thread = threading.Thread(
+            target=target, name=f"watch-{self.backend}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        with self._changed:
+            self._changed.notify_all()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def snapshot(self):
+        """Return (version, sorted list of photo names)."""
+        with self._changed:
+            return self.version, list(self._photos)
+
+    def changes_since(self, version):
+        """
+        Return the deltas after ``version``, oldest first.
+
+        :return: List of deltas, or None if ``version`` is older than the
+                 history and the caller has to take a new snapshot.
+        """
+        with self._changed:
+            if version == self.version:
+                return []
+            if version > self.version or (
+                not self._history or self._history[0]["version"] > version + 1
+            ):
+                return None
+            return [delta for delta in self._history if delta["version"] > version]
+
+    def wait(self, version, timeout=None):
+        """Block until the version moves past ``version``; return the new version."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self.version != version or self._stop.is_set(), timeout
+            )
+            return self.version
+
+    def _apply(self, added=(), removed=(), renamed=()):
+        with self._changed:
+            delta = {"added": [], "removed": [], "renamed": []}
+            for old, new in renamed:
+                if old in self._names and new not in self._names:
+                    self._discard(old)
+                    self._insert(new)
+                    delta["renamed"].append([old, new])
+                elif old in self._names:
+                    self._discard(old)
+                    delta["removed"].append(old)
+                elif new not in self._names:
+                    self._insert(new)
+                    delta["added"].append(new)
+            for name in removed:
+                if name in self._names:
+                    self._discard(name)
+                    delta["removed"].append(name)
+            for name in added:
+                if name not in self._names:
+                    self._insert(name)
+                    delta["added"].append(name)
+            if not any(delta.values()):
+                return None
+            self.version += 1
+            delta["version"] = self.version
+            self._history.append(delta)
+            self._changed.notify_all()
+        logger.debug(f"Photo list of '{self.photo_dir}' changed: {delta}")
+        return delta
+
+    def _insert(self, name):
+        self._names.add(name)
+        bisect.insort(self._photos, name)
+
+    def _discard(self, name):
+        self._names.discard(name)
+        del self._photos[bisect.bisect_left(self._photos, name)]
+
+    def _resync(self):
+        """Diff a fresh listing against the set, e.g. after a queue overflow."""
+        try:
+            names = _list_photo_set(self.photo_dir)
+        except OSError as e:
+            logger.error(f"ERROR: Failed to list '{self.photo_dir}' | Reason: {str(e)}")
+            names = set()
+        with self._changed:
+            current = set(self._names)
+        self._apply(added=sorted(names - current), removed=sorted(current - names))
+
+    def _add_inotify_watch(self):
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = self._libc.inotify_add_watch(
+            fd, os.fsencode(self.photo_dir), ctypes.c_uint32(WATCH_MASK)
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, os.strerror(errno), self.photo_dir)
+        return fd
+
+    def _run_inotify(self):
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._fd], [], [], self.poll_interval)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                continue
+            if self._handle_events(data):
+                logger.warning(f"Stopped watching '{self.photo_dir}', it is gone")
+                self._resync()
+                self._stop.set()
+
+    def _handle_events(self, data):
+        """
+        Apply one batch of inotify events.
+
+        :return: True if the watched directory itself went away.
+        """
+        added, removed, renamed = [], [], []
+        moved_from = {}  # cookie -> name, paired with IN_MOVED_TO into renames
+        overflow = gone = False
+        offset = 0
+        while offset < len(data):
+            _, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                gone = True
+            elif mask & IN_ISDIR:
+                continue
+            elif mask & IN_MOVED_FROM:
+                if _is_photo(name):
+                    moved_from[cookie] = name
+            elif mask & IN_MOVED_TO:
+                old = moved_from.pop(cookie, None)
+                if old is not None and _is_photo(name):
+                    renamed.append((old, name))
+                elif old is not None:
+                    removed.append(old)
+                elif _is_photo(name):
+                    added.append(name)
+            elif mask & (IN_CLOSE_WRITE | IN_DELETE) and _is_photo(name):
+                (added if mask & IN_CLOSE_WRITE else removed).append(name)
+        # Moved out of the directory
+        removed.extend(moved_from.values())
+        self._apply(added, removed, renamed)
+        if overflow:
+            self._resync()
+        return gone
+
+    def _run_polling(self):
+        known_sizes = {}  # name -> size at the last poll, for unlisted files
+        while not self._stop.wait(self.poll_interval):
+            try:
+                with os.scandir(self.photo_dir) as entries:
+                    on_disk = {
+                        entry.name: entry.stat().st_size
+                        for entry in entries
+                        if _is_photo(entry.name) and entry.is_file()
+                    }
+            except OSError as e:
+                logger.error(
+                    f"ERROR: Failed to list '{self.photo_dir}' | Reason: {str(e)}"
+                )
+                continue
+            with self._changed:
+                current = set(self._names)
+            # New files are listed once their size stopped changing between
+            # two polls, so files still being copied are not listed yet
+            added = [
+                name
+                for name, size in on_disk.items()
+                if name not in current and known_sizes.get(name) == size
+            ]
+            known_sizes = {
+                name: size for name, size in on_disk.items() if name not in current
+            }
+            removed = [name for name in current if name not in on_disk]
+            self._apply(sorted(added), sorted(removed))
+
+
+# Directories watched at once, e.g. by several users in different folders
+MAX_WATCHERS = 8
+
+_watchers = OrderedDict()  # directory -> PhotoWatcher, least recently used first
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(photo_dir):
+    """
+    Return the running watcher of ``photo_dir``, starting one if needed.
+
+    At most MAX_WATCHERS directories are watched; the least recently used
+    watcher is stopped to make room for a new one.
+    """
+    photo_dir = os.path.abspath(photo_dir)
+    with _watchers_lock:
+        watcher = _watchers.get(photo_dir)
+        if watcher is not None and watcher.stopped:
+            watcher.stop()
+            watcher = None
+        if watcher is None:
+            while len(_watchers) >= MAX_WATCHERS:
+                _watchers.popitem(last=False)[1].stop()
+            watcher = _watchers[photo_dir] = PhotoWatcher(photo_dir).start()
+        _watchers.move_to_end(photo_dir)
+        return watcher
@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from PhotoTimeSleuth.Helpers.image_helper import change_image_date
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 256
+DEFAULT_WORKERS = 2
+DEFAULT_BATCH_SIZE = 16
+
+
+class WriteQueueFull(Exception):
+    """Raised by :meth:`MetadataWriter.submit` when too many writes are pending."""
+
+
+class _PendingWrite:
+    def __init__(self, image_path, new_date):
+        self.image_path = image_path
+        self.new_date = new_date
+        self.futures = []
+
+
+class MetadataWriter:
+    """
+    Bounded background queue for EXIF date writes.
+
+    Writes that are still queued for the same file are coalesced: only the
+    latest date is written, and every caller gets the result of that write.
+    Worker threads take writes in batches. A file being written by one
+    worker is not taken by another until that write is done, so a later date
+    can never be overwritten by an earlier one still in flight.
+    """
+
+    def __init__(
+        self,
+        journal=None,
+        max_pending=DEFAULT_MAX_PENDING,
+        workers=DEFAULT_WORKERS,
+        batch_size=DEFAULT_BATCH_SIZE,
+    ):
+        self.journal = journal
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.coalesced = 0
+        self._pending = OrderedDict()  # normalized path -> _PendingWrite
+        self._writing = set()  # normalized paths taken by a worker
+        self._condition = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+
+    def submit(self, image_path, new_date):
+        """
+        Queue a date change of one file.
+
+        :param image_path: Path to the image.
+        :param new_date: New date as a string in the format 'YYYY:MM:DD'.
+        :return: Future resolving to the (success, message) of
+                 ``change_image_date``.
+        :raises WriteQueueFull: If ``max_pending`` files are already queued.
+        """
+        future = Future()
+        key = os.path.normcase(os.path.abspath(image_path))
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Metadata writer is shut down")
+            write = self._pending.get(key)
+            if write is not None:
+                write.new_date = new_date
+                self.coalesced += 1
+            else:
+                if len(self._pending) >= self.max_pending:
+                    raise WriteQueueFull(f"{len(self._pending)} writes are pending")
+                write = self._pending[key] = _PendingWrite(image_path, new_date)
+                self._condition.notify()
+            write.futures.append(future)
+        return future
+
+    def _ready(self):
+        # Called with the condition held
+        return [key for key in self._pending if key not in self._writing]
+
+    def _take_batch(self):
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._ready() or (self._closed and not self._pending)
+            )
+            batch = []
+            for key in self._ready()[: self.batch_size]:
+                self._writing.add(key)
+                batch.append((key, self._pending.pop(key)))
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return  # Closed and drained
+            for key, write in batch:
+                try:
+                    result = change_image_date(
+                        write.image_path, write.new_date, journal=self.journal
+                    )
+                except Exception as e:
+                    result = (False, str(e))
+                with self._condition:
+                    self._writing.discard(key)
+                    # A newer write of the same file may be waiting for this one
+                    self._condition.notify_all()
+                for future in write.futures:
+                    future.set_result(result)
+
+    def shutdown(self):
+        """Finish the queued writes and stop the workers."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
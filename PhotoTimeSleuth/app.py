@@ -1,34 +1,126 @@
 import argparse
+import atexit
 import io
+import json
 import logging
+import multiprocessing
 import os
+import queue
+import secrets
 import shutil
 import sys
 import threading
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Start of the import of the app, for the cold-start time reported at launch
+IMPORT_STARTED = time.perf_counter()
 
 import flask.cli
 from flask import (
     Flask,
+    g,
     jsonify,
     render_template,
+    Response,
     request,
     send_file,
     send_from_directory,
+    session,
+    url_for,
 )
-from PIL import Image, ImageOps
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-import webview  # PyWebView import
 
 from PhotoTimeSleuth.Helpers.basic_helper import get_local_ip
-from PhotoTimeSleuth.Helpers.image_helper import change_image_date, get_image_date
+from PhotoTimeSleuth.Helpers.bulk_helper import (
+    apply_dates,
+    load_date_rows,
+    write_error_report,
+)
+from PhotoTimeSleuth.Helpers.image_helper import change_image_date
+from PhotoTimeSleuth.Helpers.exif_helper import read_image_date
 from PhotoTimeSleuth.Helpers.file_helper import (
-    load_names_and_bdays,
+    FormatError,
+    get_birthday_registry,
+    list_photos,
     load_api_key,
     save_api_key,
 )
-from PhotoTimeSleuth.Helpers.ai_helper import ask_ai_for_date
-from PhotoTimeSleuth.Helpers.date_helper import calculate_date
+from PhotoTimeSleuth.Helpers.ai_helper import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MAX_EDGE,
+    DEFAULT_RATE_LIMIT,
+    MODEL,
+    PROMPT_VERSION,
+    ask_ai_for_date,
+    iter_estimated_dates,
+)
+from PhotoTimeSleuth.Helpers.catalog_helper import REFRESH_INTERVAL, get_catalog
+from PhotoTimeSleuth.Helpers.contact_sheet_helper import (
+    DEFAULT_CELL,
+    DEFAULT_COLUMNS,
+    DEFAULT_PER_PAGE,
+    MAX_CELL,
+    MAX_COLUMNS,
+    MAX_PER_PAGE,
+    MAX_SHEET_EDGE,
+    MIN_CELL,
+    get_contact_sheet,
+    schedule_contact_sheet,
+    sheet_layout,
+    sheet_version,
+)
+from PhotoTimeSleuth.Helpers.date_helper import calculate_date, calculate_dates
+from PhotoTimeSleuth.Helpers.decode_helper import (
+    DECODE_BUDGET,
+    DEFAULT_DECODE_BYTES,
+    DEFAULT_MAX_PIXELS,
+    configure_decoding,
+)
+from PhotoTimeSleuth.Helpers.estimate_cache_helper import get_estimate_cache
+from PhotoTimeSleuth.Helpers.http_helper import (
+    PHOTO_CACHE_CONTROL,
+    negotiate_image_format,
+    photo_etag,
+)
+from PhotoTimeSleuth.Helpers.journal_helper import (
+    JOURNAL_FILE_NAME,
+    ChangeJournal,
+    parse_time,
+)
+from PhotoTimeSleuth.Helpers.metrics_helper import METRICS, peak_rss_bytes
+from PhotoTimeSleuth.Helpers.phash_helper import (
+    DEFAULT_MAX_DISTANCE,
+    get_duplicate_index,
+)
+from PhotoTimeSleuth.Helpers.prefetch_helper import (
+    DEFAULT_LOOKAHEAD,
+    DEFAULT_WORKERS,
+    Prefetcher,
+)
+from PhotoTimeSleuth.Helpers.thumbnail_helper import (
+    DEFAULT_CACHE_BYTES,
+    DEFAULT_QUALITY,
+    FORMAT_JPEG,
+    MIME_TYPES,
+    QUALITY_TIERS,
+    ThumbnailCache,
+    get_thumbnail,
+    webp_supported,
+)
+from PhotoTimeSleuth.Helpers.tile_helper import (
+    DEFAULT_TILE_CACHE_BYTES,
+    TileCache,
+    dzi_descriptor,
+    image_geometry,
+)
+from PhotoTimeSleuth.Helpers.watch_helper import get_watcher
+from PhotoTimeSleuth.Helpers.write_helper import MetadataWriter, WriteQueueFull
+
+logger = logging.getLogger(__name__)
 
 
 class API:
@@ -36,6 +128,8 @@ class API:
         self.window = window
 
     def pick_folder(self):
+        import webview  # GUI only, so headless servers do not need it
+
         result = self.window.create_file_dialog(webview.FOLDER_DIALOG)
         if result:
             return result[0]
@@ -61,15 +155,92 @@ app = Flask(
 )
 
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        METRICS.observe_request(
+            route,
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+        )
+    return response
+
+
+METRICS.set_gauge(
+    "startup_seconds",
+    "Seconds from importing the app until the server accepted connections.",
+    lambda: app.config.get("STARTUP_SECONDS"),
+)
+METRICS.set_gauge(
+    "process_peak_rss_bytes",
+    "Peak resident memory of the process since it started.",
+    peak_rss_bytes,
+)
+METRICS.set_gauge(
+    "decode_budget_bytes",
+    "Pixel memory concurrent image decodes may reserve.",
+    lambda: DECODE_BUDGET.max_bytes,
+)
+METRICS.set_gauge(
+    "decode_budget_in_use_bytes",
+    "Pixel memory reserved by running image decodes.",
+    lambda: DECODE_BUDGET.in_use,
+)
+METRICS.set_gauge(
+    "decode_budget_peak_bytes",
+    "Most pixel memory reserved by image decodes at once.",
+    lambda: DECODE_BUDGET.peak,
+)
+METRICS.set_gauge(
+    "decode_budget_waits",
+    "Image decodes that waited for room in the budget.",
+    lambda: DECODE_BUDGET.waits,
+)
+
+
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    """Request and phase timings in the Prometheus text format."""
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+
+def get_photo_directory():
+    """Return the photo directory of the current session, or the default one."""
+    return session.get("photo_directory") or app.config.get("PHOTO_DIRECTORY")
+
+
+def remember_image_format(fmt):
+    """Keep the thumbnail format this browser negotiated, for its prefetches."""
+    if app.secret_key and session.get("image_format") != fmt:
+        session["image_format"] = fmt
+
+
+def get_session_id():
+    """Return an id for the current browser session, or None without sessions."""
+    if not app.secret_key:
+        return None
+    if "session_id" not in session:
+        session["session_id"] = secrets.token_hex(8)
+    return session["session_id"]
+
+
 @app.route("/")
 def index():
     """Serve the main HTML page."""
-    names_and_bdays = load_names_and_bdays(app.config.get("BDAY_FILE"))
+    names_and_bdays = get_birthday_registry(app.config.get("BDAY_FILE")).people()
     return render_template(
         "index.html",
         names_and_bdays=names_and_bdays,
         ip_address_port=app.config.get("SERVER_IP_PORT"),
-        photo_directory=app.config.get("PHOTO_DIRECTORY"),
+        photo_directory=get_photo_directory(),
     )
 
 
@@ -82,7 +253,7 @@ def update_metadata():
     if not image_name or ".." in image_name or "/" in image_name:
         return jsonify({"error": "Invalid image path"}), 400
 
-    photo_dir = app.config.get("PHOTO_DIRECTORY")
+    photo_dir = get_photo_directory()
     if not photo_dir:
         return jsonify({"error": "Photo directory is not configured"}), 500
 
@@ -96,7 +267,28 @@ def update_metadata():
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
-    success, message = change_image_date(image_path, new_date)
+    writer = app.config.get("WRITER")
+    if writer is None:
+        success, message = change_image_date(
+            image_path, new_date, journal=app.config.get("JOURNAL")
+        )
+    else:
+        try:
+            future = writer.submit(image_path, new_date)
+        except WriteQueueFull:
+            response = jsonify({"error": "Too many pending changes, retry shortly"})
+            response.headers["Retry-After"] = "1"
+            return response, 503
+        success, message = future.result()
+
+    thumbnail_cache = app.config.get("THUMBNAIL_CACHE")
+    if thumbnail_cache is not None:
+        thumbnail_cache.invalidate(image_path)
+
+    if success and app.config.get("CATALOG_DIR"):
+        get_catalog(photo_dir, app.config["CATALOG_DIR"]).mark_corrected(
+            os.path.basename(image_path)
+        )
 
     if success:
         return jsonify({"message": message}), 200
@@ -104,6 +296,109 @@ def update_metadata():
         return jsonify({"error": message}), 500
 
 
+@app.route("/api/update_metadata_batch", methods=["POST"])
+def update_metadata_batch():
+    """
+    Set one date on several photos, e.g. a photo's near-duplicates.
+
+    All writes are queued before waiting on any of them, so the metadata
+    writer works through them in batches.
+    """
+    data = request.get_json()
+    image_names = data.get("image_paths")
+    new_date = data.get("new_date")
+
+    if not isinstance(image_names, list) or not image_names:
+        return jsonify({"error": "Missing image_paths"}), 400
+    if any(
+        not isinstance(name, str) or not name or ".." in name or "/" in name
+        for name in image_names
+    ):
+        return jsonify({"error": "Invalid image path"}), 400
+
+    photo_dir = get_photo_directory()
+    if not photo_dir:
+        return jsonify({"error": "Photo directory is not configured"}), 500
+
+    try:
+        datetime.strptime(new_date, "%Y:%m:%d")
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    writer = app.config.get("WRITER")
+    journal = app.config.get("JOURNAL")
+    pending = {}
+    results = {}
+    for image_name in dict.fromkeys(image_names):
+        image_path = os.path.join(photo_dir, secure_filename(image_name))
+        if not os.path.isfile(image_path):
+            results[image_name] = (False, "Image not found")
+        elif writer is None:
+            results[image_name] = change_image_date(
+                image_path, new_date, journal=journal
+            )
+        else:
+            try:
+                pending[image_name] = writer.submit(image_path, new_date)
+            except WriteQueueFull:
+                results[image_name] = (False, "Too many pending changes")
+    for image_name, future in pending.items():
+        results[image_name] = future.result()
+
+    thumbnail_cache = app.config.get("THUMBNAIL_CACHE")
+    catalog_dir = app.config.get("CATALOG_DIR")
+    catalog = get_catalog(photo_dir, catalog_dir) if catalog_dir else None
+    response = []
+    for image_name, (success, message) in results.items():
+        image_path = os.path.join(photo_dir, secure_filename(image_name))
+        if thumbnail_cache is not None:
+            thumbnail_cache.invalidate(image_path)
+        if success and catalog is not None:
+            catalog.mark_corrected(os.path.basename(image_path))
+        entry = {"image_path": image_name, "success": success}
+        entry["message" if success else "error"] = message
+        response.append(entry)
+    updated = sum(1 for entry in response if entry["success"])
+    return jsonify({"updated": updated, "results": response}), 200
+
+
+@app.route("/api/duplicates", methods=["GET"])
+def get_duplicates():
+    """
+    List the near-duplicates of a photo by perceptual hash distance.
+
+    "ready" is false while the directory is still being hashed; the photos
+    hashed so far are searched anyway.
+    """
+    image_name = request.args.get("image_path")
+    if not image_name or ".." in image_name or "/" in image_name:
+        return jsonify({"error": "Invalid image path"}), 400
+    max_distance = request.args.get("max_distance", DEFAULT_MAX_DISTANCE, type=int)
+    if not 0 <= max_distance <= 64:
+        return jsonify({"error": "max_distance must be between 0 and 64"}), 400
+
+    photo_dir = get_photo_directory()
+    if not photo_dir or not os.path.isdir(photo_dir):
+        return jsonify({"error": "Invalid directory"}), 400
+
+    index = get_duplicate_index(photo_dir, app.config.get("CATALOG_DIR"))
+    index.refresh_async()
+    try:
+        matches = index.near_duplicates(secure_filename(image_name), max_distance)
+    except KeyError:
+        matches = []
+    return jsonify(
+        {
+            "ready": not index.building,
+            "hashed": index.hashed,
+            "total": index.total,
+            "duplicates": [
+                {"filename": name, "distance": distance} for name, distance in matches
+            ],
+        }
+    ), 200
+
+
 @app.route("/api/get_age_date", methods=["POST"])
 def get_age_date():
     data = request.get_json()
@@ -121,13 +416,14 @@ def get_age_date():
     except ValueError:
         return jsonify({"error": "Invalid age"}), 400
 
-    bday = [
-        person
-        for person in load_names_and_bdays(app.config.get("BDAY_FILE"))
-        if person["name"] == person_name
-    ][0]["bday"]
+    try:
+        person = get_birthday_registry(app.config.get("BDAY_FILE")).get(person_name)
+    except FormatError as e:
+        return jsonify({"error": str(e)}), 500
+    if person is None:
+        return jsonify({"error": "Unknown person"}), 404
 
-    estimated_date = calculate_date(bday, age, season)
+    estimated_date = calculate_date(person["bday"], age, season)
 
     if not estimated_date:
         return jsonify({"error": "Invalid birthday or age"}), 400
@@ -135,10 +431,71 @@ def get_age_date():
     return jsonify({"estimated_date": estimated_date}), 200
 
 
+@app.route("/api/get_age_dates", methods=["POST"])
+def get_age_dates():
+    """
+    API route to estimate many dates at once.
+
+    Either pass ``requests``, a list of ``{person_name, age, season}`` objects,
+    or a ``person_name`` with lists of ``ages`` and ``seasons`` to estimate
+    every combination of them.
+    """
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    if "requests" in data:
+        items = data.get("requests")
+    else:
+        person_name = data.get("person_name")
+        ages = data.get("ages")
+        seasons = data.get("seasons")
+        if not isinstance(ages, list) or not isinstance(seasons, list):
+            return jsonify({"error": "Invalid ages or seasons"}), 400
+        items = [
+            {"person_name": person_name, "age": age, "season": season}
+            for age in ages
+            for season in seasons
+        ]
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        return jsonify({"error": "Invalid requests"}), 400
+
+    try:
+        registry = get_birthday_registry(app.config.get("BDAY_FILE"))
+        people = {item.get("person_name"): None for item in items}
+        for name in people:
+            people[name] = registry.get(name)
+    except FormatError as e:
+        return jsonify({"error": str(e)}), 500
+    unknown = [name for name, person in people.items() if person is None]
+    if unknown:
+        return jsonify({"error": f"Unknown person: {unknown[0]}"}), 404
+
+    try:
+        ages = [int(item.get("age")) for item in items]
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid age"}), 400
+
+    estimated_dates = calculate_dates(
+        [people[item.get("person_name")]["bday"] for item in items],
+        ages,
+        [item.get("season") for item in items],
+    )
+    estimates = [
+        {
+            "person_name": item.get("person_name"),
+            "age": age,
+            "season": item.get("season"),
+            "estimated_date": estimated_date,
+        }
+        for item, age, estimated_date in zip(items, ages, estimated_dates)
+    ]
+    return jsonify({"estimates": estimates}), 200
+
+
 @app.route("/api/get_current_photo_date", methods=["GET"])
 def get_current_photo_date():
     """API route to retrieve the current photo date."""
-    photo_dir = app.config.get("PHOTO_DIRECTORY")
+    photo_dir = get_photo_directory()
     if not photo_dir or not os.path.isdir(photo_dir):
         return jsonify({"error": "Invalid directory"}), 400
 
@@ -150,7 +507,11 @@ def get_current_photo_date():
         return jsonify({"error": "Image not found"}), 404
 
     try:
-        date = get_image_date(image_path)
+        prefetcher = app.config.get("PREFETCHER")
+        if prefetcher is not None:
+            date = prefetcher.get_image_date(image_path)
+        else:
+            date = read_image_date(image_path)
         if date:
             return jsonify({"current_date": date}), 200
         else:
@@ -162,7 +523,7 @@ def get_current_photo_date():
 @app.route("/api/folder_path", methods=["GET"])
 def get_folder_path():
     """API route to retrieve the folder path."""
-    photo_dir = app.config.get("PHOTO_DIRECTORY")
+    photo_dir = get_photo_directory()
     if not photo_dir:
         return jsonify({"error": "Photo directory is not configured"}), 500
     return jsonify({"folder_path": photo_dir}), 200
@@ -171,16 +532,296 @@ def get_folder_path():
 @app.route("/api/photos", methods=["GET"])
 def get_photos():
     """API route to retrieve a list of photos from the directory."""
-    photo_dir = app.config.get("PHOTO_DIRECTORY")
+    photo_dir = get_photo_directory()
     if not photo_dir or not os.path.isdir(photo_dir):
         return jsonify({"error": "Invalid directory"}), 400
 
-    photos = [
-        file
-        for file in os.listdir(photo_dir)
-        if file.lower().endswith(("jpg", "jpeg", "png"))
-    ]
-    return jsonify({"photos": photos}), 200
+    # Hash the directory in the background for near-duplicate lookups
+    get_duplicate_index(photo_dir, app.config.get("CATALOG_DIR")).refresh_async()
+
+    sort = request.args.get("sort", "name")
+    undated = request.args.get("undated", "").lower() in ("1", "true")
+    details = request.args.get("details", "").lower() in ("1", "true")
+    offset = request.args.get("offset", 0, type=int)
+    limit = request.args.get("limit", type=int)
+
+    if (
+        app.config.get("WATCH_DIRECTORY")
+        and sort == "name"
+        and not (undated or details)
+    ):
+        # Kept current by the watcher; "version" is where /api/photos/events
+        # picks up with deltas
+        version, photos = get_watcher(photo_dir).snapshot()
+        total = len(photos)
+        photos = photos[offset:][:limit]
+        return jsonify({"photos": photos, "total": total, "version": version}), 200
+
+    catalog_dir = app.config.get("CATALOG_DIR")
+    if not catalog_dir:
+        if sort != "name" or undated:
+            return jsonify({"error": "Photo catalog is not configured"}), 400
+        photos = list_photos(photo_dir)
+        total = len(photos)
+        photos = photos[offset:][:limit]
+        return jsonify({"photos": photos, "total": total}), 200
+
+    catalog = get_catalog(photo_dir, catalog_dir)
+    catalog.refresh(max_age=REFRESH_INTERVAL)
+    try:
+        total, items = catalog.query(sort, undated, offset, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    result = {"photos": [item["filename"] for item in items], "total": total}
+    if details:
+        result["items"] = items
+    return jsonify(result), 200
+
+
+@app.route("/api/photos/events", methods=["GET"])
+def photo_events():
+    """
+    Stream changes of the photo list as server-sent events.
+
+    Each event is a delta with "added", "removed" and "renamed" names after
+    the "version" given by /api/photos (or the Last-Event-ID on reconnect).
+    A "reset" event with the full list is sent when the client is too far
+    behind. The stream ends when the watcher of the directory is stopped.
+
+    Every open stream holds a server thread, so only MAX_EVENT_STREAMS are
+    served at once; further ones get a 503.
+    """
+    if not app.config.get("WATCH_DIRECTORY"):
+        return jsonify({"error": "Directory watching is disabled"}), 404
+    photo_dir = get_photo_directory()
+    if not photo_dir or not os.path.isdir(photo_dir):
+        return jsonify({"error": "Invalid directory"}), 400
+    try:
+        since = int(request.headers.get("Last-Event-ID") or request.args["since"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "Invalid or missing since"}), 400
+
+    streams = app.config.get("EVENT_STREAMS")
+    if streams is not None and not streams.acquire(blocking=False):
+        response = jsonify({"error": "Too many open event streams"})
+        response.headers["Retry-After"] = str(EVENTS_RETRY_MS // 1000)
+        return response, 503
+    watcher = get_watcher(photo_dir)
+
+    def generate():
+        # Sent right away so the client sees the stream open
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        version = since
+        while True:
+            deltas = watcher.changes_since(version)
+            if deltas is None:
+                version, photos = watcher.snapshot()
+                data = json.dumps({"version": version, "photos": photos})
+                yield f"event: reset\nid: {version}\ndata: {data}\n\n"
+            for delta in deltas or []:
+                version = delta["version"]
+                yield f"id: {version}\ndata: {json.dumps(delta)}\n\n"
+            if watcher.stopped:
+                return
+            if watcher.wait(version, EVENTS_KEEPALIVE) == version:
+                yield ": keepalive\n\n"
+
+    response = Response(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    if streams is not None:
+        # Called by the server once the stream ends or the client goes away
+        response.call_on_close(streams.release)
+    return response
+
+
+def _list_photo_names(photo_dir, sort="name", undated=False):
+    """Return the photo names in the order the UI was given them."""
+    if app.config.get("WATCH_DIRECTORY") and sort == "name" and not undated:
+        return get_watcher(photo_dir).snapshot()[1]
+    catalog_dir = app.config.get("CATALOG_DIR")
+    if not catalog_dir:
+        return list_photos(photo_dir)
+    catalog = get_catalog(photo_dir, catalog_dir)
+    catalog.refresh(max_age=REFRESH_INTERVAL)
+    return [item["filename"] for item in catalog.query(sort, undated)[1]]
+
+
+@app.route("/api/prefetch", methods=["POST"])
+def prefetch():
+    """API route to warm the photos around the one currently viewed."""
+    prefetcher = app.config.get("PREFETCHER")
+    if prefetcher is None:
+        return jsonify({"message": "Prefetching is disabled"}), 200
+
+    data = request.get_json()
+    image_name = data.get("image_path")
+    photo_dir = get_photo_directory()
+    if not photo_dir or not os.path.isdir(photo_dir):
+        return jsonify({"error": "Invalid directory"}), 400
+
+    # Warm the format the browser's own image requests negotiated; this
+    # fetch() sends a generic Accept header
+    fmt = session.get("image_format") or negotiate_image_format(
+        request.accept_mimetypes, webp_supported()
+    )
+    quality = data.get("quality", DEFAULT_QUALITY)
+    if quality not in QUALITY_TIERS:
+        return jsonify({"error": "Invalid quality"}), 400
+
+    try:
+        photos = _list_photo_names(
+            photo_dir, data.get("sort", "name"), bool(data.get("undated"))
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if image_name not in photos:
+        return jsonify({"error": "Image not found"}), 404
+
+    prefetcher.schedule(
+        photo_dir,
+        photos,
+        photos.index(image_name),
+        width=data.get("width"),
+        height=data.get("height"),
+        fmt=fmt,
+        quality=quality,
+        key=get_session_id(),
+    )
+    return jsonify({"message": "Prefetch scheduled"}), 200
+
+
+def _contact_sheet_page():
+    """
+    Read the contact sheet parameters of the request and list its page.
+
+    :return: ((photo directory, parameters dict, names of all photos, names
+             on the page), None), or (None, (JSON error, status)).
+    """
+    photo_dir = get_photo_directory()
+    if not photo_dir or not os.path.isdir(photo_dir):
+        return None, (jsonify({"error": "Invalid directory"}), 400)
+
+    params = {
+        "page": request.args.get("page", 0, type=int),
+        "per_page": request.args.get("per_page", DEFAULT_PER_PAGE, type=int),
+        "cell": request.args.get("cell", DEFAULT_CELL, type=int),
+        "columns": request.args.get("columns", DEFAULT_COLUMNS, type=int),
+        "sort": request.args.get("sort", "name"),
+        "undated": request.args.get("undated", "").lower() in ("1", "true"),
+        "quality": request.args.get("quality", DEFAULT_QUALITY),
+    }
+    if params["page"] < 0:
+        error = "page must not be negative"
+    elif not 1 <= params["per_page"] <= MAX_PER_PAGE:
+        error = f"per_page must be between 1 and {MAX_PER_PAGE}"
+    elif not MIN_CELL <= params["cell"] <= MAX_CELL:
+        error = f"cell must be between {MIN_CELL} and {MAX_CELL}"
+    elif not 1 <= params["columns"] <= MAX_COLUMNS:
+        error = f"columns must be between 1 and {MAX_COLUMNS}"
+    elif params["quality"] not in QUALITY_TIERS:
+        error = "Invalid quality"
+    elif (
+        max(params["columns"], -(-params["per_page"] // params["columns"]))
+        * params["cell"]
+        > MAX_SHEET_EDGE
+    ):
+        error = f"A page of the sheet must fit in {MAX_SHEET_EDGE} pixels"
+    else:
+        error = None
+    if error:
+        return None, (jsonify({"error": error}), 400)
+
+    try:
+        photos = _list_photo_names(photo_dir, params["sort"], params["undated"])
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    first = params["page"] * params["per_page"]
+    return (photo_dir, params, photos, photos[first : first + params["per_page"]]), None
+
+
+@app.route("/api/contact_sheet", methods=["GET"])
+def get_contact_sheet_manifest():
+    """
+    Describe one page of a contact sheet: a grid of thumbnails in one image.
+
+    The manifest gives the cell of every photo on the sprite served at
+    "image", and its index in the photo list, so a grid overview of a whole
+    folder takes one request per page instead of one per photo.
+    """
+    page, error = _contact_sheet_page()
+    if error:
+        return error
+    photo_dir, params, photos, names = page
+    width, height, cells = sheet_layout(names, params["cell"], params["columns"])
+    first = params["page"] * params["per_page"]
+    for i, cell in enumerate(cells):
+        cell["index"] = first + i
+    version = sheet_version(photo_dir, names, params["cell"], params["columns"])
+    image_args = {
+        key: int(value) if key == "undated" else value for key, value in params.items()
+    }
+    return jsonify(
+        {
+            **params,
+            "total": len(photos),
+            "pages": -(-len(photos) // params["per_page"]),
+            "width": width,
+            "height": height,
+            "version": version,
+            # The version makes a changed sheet a new URL for the browser
+            "image": url_for("get_contact_sheet_image", v=version, **image_args),
+            "photos": cells,
+        }
+    ), 200
+
+
+@app.route("/api/contact_sheet/image", methods=["GET"])
+def get_contact_sheet_image():
+    """
+    Serve the sprite of one contact sheet page, WebP or progressive JPEG.
+
+    Sheets are cached with the thumbnails and revalidated by ETag; the next
+    page is built in the background while this one is viewed.
+    """
+    page, error = _contact_sheet_page()
+    if error:
+        return error
+    photo_dir, params, photos, names = page
+    if not names:
+        return jsonify({"error": "Page out of range"}), 404
+
+    fmt = negotiate_image_format(request.accept_mimetypes, webp_supported())
+    cell, columns, quality = params["cell"], params["columns"], params["quality"]
+    version = sheet_version(photo_dir, names, cell, columns)
+    etag = f"{version}-{fmt}-{quality}"
+    if is_resource_modified(request.environ, etag=etag):
+        thumbnail_cache = app.config.get("THUMBNAIL_CACHE")
+        try:
+            data, cached = get_contact_sheet(
+                photo_dir, names, cell, columns, thumbnail_cache, fmt, quality, version
+            )
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        response = send_file(io.BytesIO(data), mimetype=MIME_TYPES[fmt])
+        response.headers["X-Cache"] = "hit" if cached else "miss"
+
+        first = (params["page"] + 1) * params["per_page"]
+        schedule_contact_sheet(
+            photo_dir,
+            photos[first : first + params["per_page"]],
+            cell,
+            columns,
+            thumbnail_cache,
+            fmt,
+            quality,
+        )
+    else:
+        response = Response(status=304)
+    response.set_etag(etag)
+    response.vary.add("Accept")
+    response.headers["Cache-Control"] = PHOTO_CACHE_CONTROL
+    return response
 
 
 @app.route("/api/names_and_bdays", methods=["GET"])
@@ -189,7 +830,11 @@ def get_names_and_bdays():
     try:
         return (
             jsonify(
-                {"names_and_bdays": load_names_and_bdays(app.config.get("BDAY_FILE"))}
+                {
+                    "names_and_bdays": get_birthday_registry(
+                        app.config.get("BDAY_FILE")
+                    ).people()
+                }
             ),
             200,
         )
@@ -221,24 +866,199 @@ def ask_ai():
     if not image_name or ".." in image_name or "/" in image_name:
         return jsonify({"error": "Invalid image path"}), 400
 
-    photo_dir = app.config.get("PHOTO_DIRECTORY")
+    photo_dir = get_photo_directory()
     image_path = os.path.join(photo_dir, secure_filename(image_name))
     if not os.path.isfile(image_path):
         return jsonify({"error": "Image not found"}), 404
 
+    cache = get_estimate_cache(app.config.get("BDAY_FILE"))
+    cached = cache.get(image_path, MODEL, PROMPT_VERSION)
+    if cached:
+        return jsonify({"estimated_date": cached, "cached": True}), 200
+
     api_key = load_api_key(app.config.get("BDAY_FILE"))
     if not api_key:
         return jsonify({"error": "API key not configured"}), 500
 
     try:
-        estimated = ask_ai_for_date(image_path, api_key)
+        estimated = ask_ai_for_date(
+            image_path,
+            api_key,
+            max_edge=app.config.get("AI_MAX_EDGE", DEFAULT_MAX_EDGE),
+        )
         if estimated:
-            return jsonify({"estimated_date": estimated}), 200
+            cache.put(image_path, MODEL, PROMPT_VERSION, estimated)
+            return jsonify({"estimated_date": estimated, "cached": False}), 200
         return jsonify({"error": "Not Sure on Date"}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/ask_ai_batch", methods=["POST"])
+def ask_ai_batch():
+    """
+    Estimate dates of several photos at once.
+
+    The body may contain "image_paths"; without it every photo of the current
+    directory is estimated. Results are streamed as newline-delimited JSON in
+    the order they finish, starting with the ones found in the estimate cache.
+    """
+    data = request.get_json(silent=True) or {}
+    photo_dir = get_photo_directory()
+    if not photo_dir or not os.path.isdir(photo_dir):
+        return jsonify({"error": "Invalid directory"}), 400
+    image_names = data.get("image_paths")
+    if image_names is None:
+        image_names = _list_photo_names(photo_dir)
+    if not isinstance(image_names, list) or any(
+        not isinstance(name, str) or not name or ".." in name or "/" in name
+        for name in image_names
+    ):
+        return jsonify({"error": "Invalid image path"}), 400
+
+    image_paths = {}
+    for name in image_names:
+        image_path = os.path.join(photo_dir, secure_filename(name))
+        if not os.path.isfile(image_path):
+            return jsonify({"error": f"Image not found: {name}"}), 404
+        image_paths[image_path] = name
+
+    cache = get_estimate_cache(app.config.get("BDAY_FILE"))
+    cached = {}
+    for image_path in image_paths:
+        estimated = cache.get(image_path, MODEL, PROMPT_VERSION)
+        if estimated:
+            cached[image_path] = estimated
+    uncached = [path for path in image_paths if path not in cached]
+
+    estimates = iter([])
+    if uncached:
+        api_key = load_api_key(app.config.get("BDAY_FILE"))
+        if not api_key:
+            return jsonify({"error": "API key not configured"}), 500
+        estimates = iter_estimated_dates(
+            uncached,
+            api_key,
+            concurrency=app.config.get("AI_CONCURRENCY", DEFAULT_CONCURRENCY),
+            rate_limit=app.config.get("AI_RATE_LIMIT", DEFAULT_RATE_LIMIT),
+            max_edge=app.config.get("AI_MAX_EDGE", DEFAULT_MAX_EDGE),
+        )
+
+    def line(image_path, estimated, error, was_cached):
+        return (
+            json.dumps(
+                {
+                    "image_path": image_paths[image_path],
+                    "estimated_date": estimated,
+                    "error": error,
+                    "cached": was_cached,
+                }
+            )
+            + "\n"
+        )
+
+    def generate():
+        for image_path, estimated in cached.items():
+            yield line(image_path, estimated, None, True)
+        try:
+            for image_path, estimated, error in estimates:
+                if estimated:
+                    cache.put(image_path, MODEL, PROMPT_VERSION, estimated)
+                yield line(image_path, estimated, error, False)
+        finally:
+            # Runs when the client disconnects, cancelling the pending requests
+            if uncached:
+                estimates.close()
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@app.route("/api/ai_cache", methods=["GET"])
+def get_ai_cache():
+    """List cached AI estimates together with the hit and miss counters."""
+    try:
+        offset = max(int(request.args.get("offset", 0)), 0)
+        limit = request.args.get("limit")
+        limit = max(int(limit), 0) if limit is not None else None
+    except ValueError:
+        return jsonify({"error": "Invalid offset or limit"}), 400
+
+    cache = get_estimate_cache(app.config.get("BDAY_FILE"))
+    total, entries = cache.entries(offset, limit)
+    return jsonify({**cache.stats(), "total": total, "entries": entries})
+
+
+def _journal_filters(values):
+    """Map request values to ChangeJournal filters; raise ValueError if invalid."""
+    image_path = None
+    image_name = values.get("file")
+    if image_name:
+        if ".." in image_name or "/" in image_name:
+            raise ValueError("Invalid image path")
+        photo_dir = get_photo_directory() or ""
+        image_path = os.path.join(photo_dir, secure_filename(image_name))
+    since, until = values.get("since"), values.get("until")
+    for value in (since, until):
+        parse_time(value)  # Reject bad times before reading the journal
+    return {
+        "image_path": image_path,
+        "since": since,
+        "until": until,
+        "session": values.get("session") or None,
+    }
+
+
+@app.route("/api/journal", methods=["GET"])
+def get_journal():
+    """List journaled date changes, newest last, filtered like /api/journal/undo."""
+    journal = app.config.get("JOURNAL")
+    if journal is None:
+        return jsonify({"error": "Change journal is not configured"}), 500
+    try:
+        filters = _journal_filters(request.args)
+        limit = request.args.get("limit")
+        limit = max(int(limit), 0) if limit is not None else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    entries = journal.entries(**filters)
+    total = len(entries)
+    if limit is not None:
+        entries = entries[-limit:] if limit else []
+    return jsonify({"session": journal.session, "total": total, "entries": entries})
+
+
+@app.route("/api/journal/<action>", methods=["POST"])
+def apply_journal(action):
+    """
+    Undo or replay journaled changes in bulk.
+
+    The body selects the changes by "file" (a photo in the current
+    directory), "since"/"until" (ISO 8601 or epoch seconds) and "session";
+    at least one is required. "dry_run" only lists what would be written.
+    """
+    journal = app.config.get("JOURNAL")
+    if journal is None:
+        return jsonify({"error": "Change journal is not configured"}), 500
+    if action not in ("undo", "replay"):
+        return jsonify({"error": "Unknown journal action"}), 404
+    data = request.get_json() or {}
+    try:
+        filters = _journal_filters(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not any(filters.values()):
+        return jsonify({"error": "Select a file, a time window or a session"}), 400
+
+    apply = journal.undo if action == "undo" else journal.replay
+    results = apply(**filters, dry_run=bool(data.get("dry_run")))
+    thumbnail_cache = app.config.get("THUMBNAIL_CACHE")
+    if thumbnail_cache is not None and not data.get("dry_run"):
+        for restored in results["restored"]:
+            thumbnail_cache.invalidate(restored["file"])
+    return jsonify(results)
+
+
 @app.route("/api/update_directory", methods=["POST"])
 def update_directory():
     data = request.get_json()
@@ -246,46 +1066,129 @@ def update_directory():
     if not photo_dir or ".." in photo_dir or "/" in photo_dir:
         return jsonify({"error": "Invalid photo directory"}), 400
 
-    app.config["PHOTO_DIRECTORY"] = photo_dir
+    if app.secret_key:
+        # Per browser session, so one user does not switch everyone's folder
+        session["photo_directory"] = photo_dir
+    else:
+        app.config["PHOTO_DIRECTORY"] = photo_dir
+    prefetcher = app.config.get("PREFETCHER")
+    if prefetcher is not None:
+        prefetcher.cancel(get_session_id())
     return jsonify({"message": "Directory updated successfully"}), 200
 
 
 @app.route("/photos/<path:filename>")
 def serve_photo(filename):
-    """Serve downsized photos from the configured photo directory."""
-    photo_dir = app.config.get("PHOTO_DIRECTORY")
+    """
+    Serve downsized photos from the configured photo directory.
+
+    Thumbnails are WebP when the Accept header allows it and progressive
+    JPEG otherwise, at the "quality" tier given in the query string.
+    Responses carry an ETag and Last-Modified so revisits are answered with
+    304 Not Modified without decoding the photo again. Originals keep their
+    own MIME type and also support Range requests.
+    """
+    photo_dir = get_photo_directory()
     full_path = os.path.join(photo_dir, filename)
 
     width = request.args.get("width", type=int)
     height = request.args.get("height", type=int)
 
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return "Photo not found", 404
+    last_modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+
     if width or height:
+        quality = request.args.get("quality", DEFAULT_QUALITY)
+        if quality not in QUALITY_TIERS:
+            return "Invalid quality", 400
+        fmt = negotiate_image_format(request.accept_mimetypes, webp_supported())
+        remember_image_format(fmt)
+        etag = photo_etag(stat, width or 0, height or 0, fmt, quality)
+        if is_resource_modified(
+            request.environ, etag=etag, last_modified=last_modified
+        ):
+            thumbnail_cache = app.config.get("THUMBNAIL_CACHE")
+            try:
+                data, decode_path = get_thumbnail(
+                    full_path, width, height, thumbnail_cache, fmt, quality
+                )
+            except Exception as e:
+                return f"Error processing image: {str(e)}", 500
+            response = send_file(io.BytesIO(data), mimetype=MIME_TYPES[fmt])
+            response.headers["X-Decode-Path"] = decode_path
+        else:
+            response = Response(status=304)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.vary.add("Accept")
+    else:
+        # The MIME type is guessed from the file name
+        response = send_file(
+            full_path,
+            etag=photo_etag(stat),
+            last_modified=last_modified,
+            conditional=True,
+        )
+    response.headers["Cache-Control"] = PHOTO_CACHE_CONTROL
+    return response
+
+
+@app.route("/tiles/<filename>.dzi")
+def get_tile_descriptor(filename):
+    """Describe the Deep Zoom tile pyramid of a photo, for zooming into details."""
+    photo_dir = get_photo_directory()
+    full_path = safe_join(photo_dir, filename) if photo_dir else None
+    if app.config.get("TILE_CACHE") is None or full_path is None:
+        return "Photo not found", 404
+    try:
+        stat = os.stat(full_path)
+        width, height, _ = image_geometry(full_path)
+    except OSError:
+        return "Photo not found", 404
+    response = Response(dzi_descriptor(width, height), mimetype="application/xml")
+    response.set_etag(photo_etag(stat, "dzi"))
+    response.headers["Cache-Control"] = PHOTO_CACHE_CONTROL
+    return response.make_conditional(request)
+
+
+@app.route("/tiles/<filename>_files/<int:level>/<int:col>_<int:row>.jpg")
+def get_tile(filename, level, col, row):
+    """
+    Serve one tile of a photo's pyramid.
+
+    The first request for a tile renders it into the tile cache, and the rest
+    of its level in the background; later requests are served from disk.
+    """
+    photo_dir = get_photo_directory()
+    tile_cache = app.config.get("TILE_CACHE")
+    full_path = safe_join(photo_dir, filename) if photo_dir else None
+    if tile_cache is None or full_path is None:
+        return "Photo not found", 404
+    for attempt in range(2):
         try:
-            with Image.open(full_path) as img:
-                img = ImageOps.exif_transpose(img)  # Respect EXIF orientation
-                orig_width, orig_height = img.size
-                if width and not height:
-                    height = int((width / orig_width) * orig_height)
-                elif height and not width:
-                    width = int((height / orig_height) * orig_width)
-                elif width and height:
-                    aspect_ratio = orig_width / orig_height
-                    target_ratio = width / height
-
-                    if target_ratio > aspect_ratio:
-                        width = int(height * aspect_ratio)
-                    else:
-                        height = int(width / aspect_ratio)
-
-                img = img.resize((width, height), Image.LANCZOS)
-                img_io = io.BytesIO()
-                img.save(img_io, format="JPEG")
-                img_io.seek(0)
-                return send_file(img_io, mimetype="image/jpeg")
+            tile_path = tile_cache.get_tile(full_path, level, col, row)
+            stat = os.stat(full_path)
+            response = send_file(
+                tile_path,
+                mimetype=MIME_TYPES[FORMAT_JPEG],
+                etag=photo_etag(stat, "tile", level, col, row),
+                conditional=True,
+            )
+            break
+        except FileNotFoundError:
+            # The pyramid may have been pruned between rendering and sending;
+            # rendering again restores the tile
+            if attempt:
+                return "Tile not found", 404
+        except (OSError, ValueError):
+            return "Tile not found", 404
         except Exception as e:
             return f"Error processing image: {str(e)}", 500
-
-    return send_file(full_path, mimetype="image/jpeg")
+    response.headers["Cache-Control"] = PHOTO_CACHE_CONTROL
+    return response
 
 
 @app.route("/favicon.ico")
@@ -300,14 +1203,190 @@ def make_default_bdays_file(bday_file):
     shutil.copyfile(sample_bdays_file, bday_file)
 
 
-def run_flask_app(bday_file):
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 5000
+DEFAULT_THREADS = 8
+LOG_MAX_BYTES = 5 * 1024 * 1024
+# Seconds between keepalive comments on idle event streams
+EVENTS_KEEPALIVE = 15
+# Reconnect delay for clients whose event stream dropped
+EVENTS_RETRY_MS = 2000
+# Open event streams served at once; with --watch the server gets this many
+# threads on top of --threads, so streams never starve other requests
+DEFAULT_MAX_EVENT_STREAMS = 8
+LOG_BACKUP_COUNT = 5
+
+
+def local_url(host, port):
+    """
+    Return the URL the desktop window opens for a server bound to ``host``.
+
+    Wildcard addresses are reached through the loopback interface; any other
+    address is used as is, since the server listens only there.
+    """
+    if host in ("", "0.0.0.0", "::"):
+        host = "127.0.0.1"
+    elif ":" in host:
+        host = f"[{host}]"  # IPv6 literal
+    return f"http://{host}:{port}"
+
+
+def create_server(
+    host=DEFAULT_HOST, port=DEFAULT_PORT, threads=DEFAULT_THREADS, production=False
+):
+    """
+    Bind the server socket and return a function that serves requests forever.
+
+    With ``production`` the app runs on waitress when it is installed, and on
+    the threaded Flask development server otherwise. Once this returns the
+    socket accepts connections, so clients can be started right away.
+    """
+    if production:
+        try:
+            from waitress import create_server as create_waitress_server
+        except ImportError:
+            print(
+                "waitress is not installed, falling back to the development server. "
+                "Install it with `pip install waitress` for production use."
+            )
+        else:
+            server = create_waitress_server(
+                app, host=host, port=port, threads=threads, ident="PhotoTimeSleuth"
+            )
+            return server.run
+
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=True)
+    return server.serve_forever
+
+
+def get_app_dir():
+    """Return ~/phototimesleuth, where settings, logs and caches live."""
+    home_dir = os.path.expanduser("~")
+    app_dir = os.path.join(home_dir, "phototimesleuth")
+    if not os.path.isdir(app_dir):
+        os.makedirs(app_dir)
+    return app_dir
+
+
+def configure_logging(app_dir):
+    """
+    Log to photo_changes.log in ``app_dir`` and return its path.
+
+    Log records are written by a background thread so requests never wait
+    for the disk; the structured change journal works the same way.
+    """
+    log_file_path = os.path.join(app_dir, "photo_changes.log")
+    log_handler = RotatingFileHandler(
+        log_file_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+    )
+    log_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    )
+    log_queue = queue.Queue()
+    log_listener = QueueListener(log_queue, log_handler)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    queue_handler = QueueHandler(log_queue)
+    # Formatted by log_handler in the listener thread
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    return log_file_path
+
+
+def run_apply(args):
+    """
+    Apply the dates of a CSV to photos without starting the app.
+
+    :return: Exit status, 1 if any row or file failed.
+    """
+    try:
+        rows, csv_errors = load_date_rows(args.csv)
+    except OSError as e:
+        print(f"Error: Cannot read {args.csv}: {e.strerror}")
+        return 1
+    directory = args.directory or os.getcwd()
+    if not os.path.isdir(directory):
+        print(f"Error: Directory {directory} does not exist or is not accessible.")
+        return 1
+    for line_number, filename, message in csv_errors:
+        print(f"{args.csv}:{line_number}: {filename}: {message}", file=sys.stderr)
+
+    app_dir = get_app_dir()
+    configure_logging(app_dir)
+    journal = None
+    if not args.dry_run:
+        journal = ChangeJournal(os.path.join(app_dir, JOURNAL_FILE_NAME))
+
+    def progress(result):
+        if result["status"] == "dry_run":
+            print(f"{result['file']}: {result['old'] or 'no date'} -> {result['new']}")
+        elif result["status"] == "error":
+            print(f"{result['file']}: {result['error']}", file=sys.stderr)
+
+    state_path = args.state or f"{args.csv}.state.jsonl"
+    try:
+        summary = apply_dates(
+            rows,
+            directory,
+            workers=args.workers,
+            dry_run=args.dry_run,
+            state_path=state_path,
+            resume=args.resume,
+            journal=journal,
+            progress=progress,
+        )
+    finally:
+        if journal is not None:
+            journal.close()
+
+    failed = len(csv_errors) + summary["failed"]
+    if failed:
+        report_path = args.report or f"{args.csv}.errors.csv"
+        write_error_report(report_path, csv_errors, summary["errors"])
+        print(f"Wrote {failed} error(s) to {report_path}")
+
+    seconds = max(summary["seconds"], 1e-9)
+    megabytes = summary["bytes"] / (1024 * 1024)
+    verb = "Would change" if args.dry_run else "Changed"
+    print(
+        f"{verb} {summary['changed']} file(s), skipped {summary['skipped']}, "
+        f"failed {failed} in {summary['seconds']:.2f} s "
+        f"({summary['changed'] / seconds:.1f} files/s, {megabytes / seconds:.1f} MB/s)"
+    )
+    logger.info(
+        f"Applied {args.csv}: {summary['changed']} changed, "
+        f"{summary['skipped']} skipped, {failed} failed"
+    )
+    return 1 if failed else 0
+
+
+def run_flask_app(
+    bday_file,
+    thumbnail_cache_bytes=DEFAULT_CACHE_BYTES,
+    prefetch_workers=DEFAULT_WORKERS,
+    prefetch_depth=DEFAULT_LOOKAHEAD,
+    ai_concurrency=DEFAULT_CONCURRENCY,
+    ai_rate_limit=DEFAULT_RATE_LIMIT,
+    ai_max_edge=DEFAULT_MAX_EDGE,
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    threads=DEFAULT_THREADS,
+    production=False,
+    watch=False,
+    decode_bytes=DEFAULT_DECODE_BYTES,
+    max_image_pixels=DEFAULT_MAX_PIXELS,
+    tile_cache_bytes=DEFAULT_TILE_CACHE_BYTES,
+    max_event_streams=DEFAULT_MAX_EVENT_STREAMS,
+    ready=None,
+):
     directory = os.getcwd()
 
+    app_dir = get_app_dir()
+
     if not bday_file:
-        home_dir = os.path.expanduser("~")
-        if not os.path.isdir(os.path.join(home_dir, "phototimesleuth")):
-            os.makedirs(os.path.join(home_dir, "phototimesleuth"))
-        bday_file = os.path.join(home_dir, "phototimesleuth", "bdays.txt")
+        bday_file = os.path.join(app_dir, "bdays.txt")
         if not os.path.isfile(bday_file):
             make_default_bdays_file(bday_file)
             print(f"Created default bday file at {bday_file}")
@@ -318,15 +1397,12 @@ def run_flask_app(bday_file):
         print(f"Error: Directory {directory} does not exist or is not accessible.")
         sys.exit(1)
 
-    log_file_path = os.path.join(home_dir, "phototimesleuth", "photo_changes.log")
-    logging.basicConfig(
-        filename=log_file_path,
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-    )
+    log_file_path = configure_logging(app_dir)
+
+    journal = ChangeJournal(os.path.join(app_dir, JOURNAL_FILE_NAME))
+    atexit.register(journal.close)
 
     ip_address = get_local_ip()
-    port = 5000
     if not ip_address:
         serving_ip = f"http://localhost:{port}"
     else:
@@ -334,15 +1410,62 @@ def run_flask_app(bday_file):
 
     print(f"Starting server for directory: {directory}")
     print(f"Log file will be saved at: {log_file_path}")
+    print(f"Change journal: {journal.path} (session {journal.session})")
     print(f"Serving on {serving_ip}")
 
     app.config["SERVER_IP_PORT"] = f"{ip_address}:{port}"
     app.config["PHOTO_DIRECTORY"] = directory
     app.config["BDAY_FILE"] = bday_file
-    app.run(host="0.0.0.0", port=port, debug=False)
+    app.config["CATALOG_DIR"] = os.path.join(app_dir, "catalogs")
+    app.config["JOURNAL"] = journal
+    if not app.secret_key:
+        # Signs the session cookie holding each user's photo directory
+        app.secret_key = secrets.token_hex(32)
+    writer = MetadataWriter(journal)
+    atexit.register(writer.shutdown)  # Runs before journal.close
+    app.config["WRITER"] = writer
+    METRICS.set_gauge(
+        "write_queue_pending", "Date writes waiting in the queue.", writer.pending
+    )
+    METRICS.set_gauge(
+        "write_queue_coalesced",
+        "Queued date writes replaced by a newer write to the same file.",
+        lambda: writer.coalesced,
+    )
+    app.config["AI_CONCURRENCY"] = ai_concurrency
+    app.config["AI_RATE_LIMIT"] = ai_rate_limit
+    app.config["AI_MAX_EDGE"] = ai_max_edge
+    app.config["WATCH_DIRECTORY"] = watch
+    if watch:
+        app.config["EVENT_STREAMS"] = threading.BoundedSemaphore(max_event_streams)
+        threads += max_event_streams
+    configure_decoding(decode_bytes, max_image_pixels)
+    if thumbnail_cache_bytes > 0:
+        app.config["THUMBNAIL_CACHE"] = ThumbnailCache(
+            os.path.join(app_dir, "thumbnails"), thumbnail_cache_bytes
+        )
+    if tile_cache_bytes > 0:
+        app.config["TILE_CACHE"] = TileCache(
+            os.path.join(app_dir, "tiles"), tile_cache_bytes
+        )
+    if prefetch_workers > 0 and prefetch_depth > 0:
+        app.config["PREFETCHER"] = Prefetcher(
+            app.config.get("THUMBNAIL_CACHE"), prefetch_workers, prefetch_depth
+        )
+    serve_forever = create_server(host, port, threads, production)
+    startup_seconds = time.perf_counter() - IMPORT_STARTED
+    app.config["STARTUP_SECONDS"] = startup_seconds
+    logger.info(f"Server ready {startup_seconds * 1000:.0f} ms after startup")
+    print(f"Ready in {startup_seconds * 1000:.0f} ms")
+    if ready is not None:
+        ready.set()
+    serve_forever()
 
 
 def main():
+    # In frozen builds, worker processes spawned by the process pools run
+    # this executable again; this hands them to multiprocessing instead
+    multiprocessing.freeze_support()
     parser = argparse.ArgumentParser(description="Photo Time Sleuth")
     parser.add_argument(
         "--bday-file",
@@ -352,23 +1475,193 @@ def main():
             "If not provided, the current working directory will be used."
         ),
     )
+    parser.add_argument(
+        "--thumbnail-cache-mb",
+        type=int,
+        default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+        help="Disk budget for cached thumbnails in MB. Use 0 to disable the cache.",
+    )
+    parser.add_argument(
+        "--prefetch-workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Number of threads warming upcoming photos. Use 0 to disable prefetching.",
+    )
+    parser.add_argument(
+        "--prefetch-depth",
+        type=int,
+        default=DEFAULT_LOOKAHEAD,
+        help="Number of photos ahead of the current one to prefetch.",
+    )
+    parser.add_argument(
+        "--ai-concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Maximum number of AI date estimates in flight at once.",
+    )
+    parser.add_argument(
+        "--ai-rate-limit",
+        type=float,
+        default=DEFAULT_RATE_LIMIT,
+        help="Maximum number of AI requests started per second.",
+    )
+    parser.add_argument(
+        "--ai-max-edge",
+        type=int,
+        default=DEFAULT_MAX_EDGE,
+        help="Long edge in pixels photos are downsized to before AI estimation.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help=(
+            "Run headless on a multi-threaded WSGI server (waitress) without "
+            "opening a window, e.g. to share the app on the LAN."
+        ),
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=DEFAULT_HOST,
+        help="Address to bind the server to.",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="Port to serve on.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=DEFAULT_THREADS,
+        help="Number of worker threads of the --serve server.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Watch the photo directory (inotify, or polling elsewhere) and "
+            "update the photo list live while files are added or removed."
+        ),
+    )
+    parser.add_argument(
+        "--decode-memory-mb",
+        type=int,
+        default=DEFAULT_DECODE_BYTES // (1024 * 1024),
+        help=(
+            "Memory in MB that concurrent image decodes may use; further "
+            "decodes wait until it is free."
+        ),
+    )
+    parser.add_argument(
+        "--max-image-pixels",
+        type=int,
+        default=DEFAULT_MAX_PIXELS,
+        help="Largest number of pixels decoded from one image. Use 0 for no limit.",
+    )
+    parser.add_argument(
+        "--tile-cache-mb",
+        type=int,
+        default=DEFAULT_TILE_CACHE_BYTES // (1024 * 1024),
+        help="Disk budget for zoom tiles in MB. Use 0 to disable zooming.",
+    )
+    parser.add_argument(
+        "--max-event-streams",
+        type=int,
+        default=DEFAULT_MAX_EVENT_STREAMS,
+        help=(
+            "Number of live photo list streams (--watch) served at once. Each "
+            "holds a server thread; --serve adds this many threads."
+        ),
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    apply_parser = subparsers.add_parser(
+        "apply",
+        help="Apply dates from a CSV of filename, date and optional time.",
+        description=(
+            "Apply dates from a CSV with the columns filename, date "
+            "(YYYY-MM-DD) and an optional time (HH:MM[:SS]) in a process pool."
+        ),
+    )
+    apply_parser.add_argument("csv", help="CSV file with the dates to apply.")
+    apply_parser.add_argument(
+        "--directory",
+        type=str,
+        help="Directory of the photos. Defaults to the current working directory.",
+    )
+    apply_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of worker processes. Defaults to one per CPU.",
+    )
+    apply_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the changes without writing any file.",
+    )
+    apply_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the files an interrupted run already changed.",
+    )
+    apply_parser.add_argument(
+        "--state",
+        type=str,
+        help="Progress file used by --resume. Defaults to CSV.state.jsonl.",
+    )
+    apply_parser.add_argument(
+        "--report",
+        type=str,
+        help="Where to write failed rows and files. Defaults to CSV.errors.csv.",
+    )
     args = parser.parse_args()
 
+    if args.command == "apply":
+        sys.exit(run_apply(args))
+
     bday_file = args.bday_file
+    flask_args = (
+        bday_file,
+        args.thumbnail_cache_mb * 1024 * 1024,
+        args.prefetch_workers,
+        args.prefetch_depth,
+        args.ai_concurrency,
+        args.ai_rate_limit,
+        args.ai_max_edge,
+        args.host,
+        args.port,
+        args.threads,
+        args.serve,
+        args.watch,
+        args.decode_memory_mb * 1024 * 1024,
+        args.max_image_pixels,
+        args.tile_cache_mb * 1024 * 1024,
+        args.max_event_streams,
+    )
+
+    if args.serve:
+        run_flask_app(*flask_args)
+        return
 
     # Start Flask in a separate thread
+    ready = threading.Event()
     flask_thread = threading.Thread(
-        target=run_flask_app, args=(bday_file,), daemon=True
+        target=run_flask_app, args=flask_args, kwargs={"ready": ready}, daemon=True
     )
     flask_thread.start()
 
-    # Give Flask a moment to start
-    import time
+    # Import the GUI toolkit while the server starts up
+    import webview  # PyWebView import
 
-    time.sleep(1)
+    # Wait until the server accepts connections
+    while not ready.wait(0.05):
+        if not flask_thread.is_alive():
+            print("Error: The server failed to start.")
+            sys.exit(1)
 
     # Determine the local URL for the webview
-    local_url = "http://127.0.0.1:5000"
+    url = local_url(args.host, args.port)
 
     min_width = 600
     min_height = 800
@@ -376,7 +1669,7 @@ def main():
     # Create and show the PyWebView window
     window = webview.create_window(
         "Photo Time Sleuth",
-        local_url,
+        url,
         width=min_width,
         min_size=(min_width, min_height),
     )
@@ -4,6 +4,16 @@ let currentIndex = 0;
 let rotationAngle = 0;
 let preloadedImages = {};
 let defaultImageWidth = 400;
+// Small low-quality image shown while the sharp one loads
+let previewImageWidth = 100;
+
+function photoUrl(photoName, width, quality = 'standard') {
+    return `/photos/${photoName}?width=${width}&quality=${quality}`;
+}
+
+let photoEvents = null;
+// Wait before asking again when the server refused a live update stream
+let photoEventsRetryMs = 30000;
 
 async function fetchPhotos() {
     try {
@@ -13,12 +23,97 @@ async function fetchPhotos() {
             photos = data.photos;
             currentIndex = 0;
             await updatePhoto();
+            watchPhotos(data.version);
+        }
+    } catch (error) {
+        console.error('Error fetching photos:', error);
+    }
+}
+
+function watchPhotos(version) {
+    // Only sent when the server runs with --watch
+    if (photoEvents) {
+        photoEvents.close();
+        photoEvents = null;
+    }
+    if (version === undefined) {
+        return;
+    }
+    const source = new EventSource(`/api/photos/events?since=${version}`);
+    photoEvents = source;
+    source.onmessage = event => applyPhotoDelta(JSON.parse(event.data));
+    source.addEventListener('reset', event => {
+        replacePhotos(JSON.parse(event.data).photos);
+    });
+    source.onerror = () => {
+        // The browser reconnects dropped streams itself, but not refused ones
+        // (e.g. too many open streams)
+        if (source.readyState === EventSource.CLOSED && photoEvents === source) {
+            photoEvents = null;
+            setTimeout(resumePhotoEvents, photoEventsRetryMs);
+        }
+    };
+}
+
+async function resumePhotoEvents() {
+    if (photoEvents) {
+        return;
+    }
+    try {
+        const response = await fetch('/api/photos');
+        const data = await response.json();
+        if (data.photos) {
+            replacePhotos(data.photos);
+            watchPhotos(data.version);
         }
     } catch (error) {
         console.error('Error fetching photos:', error);
     }
 }
 
+function insertSorted(list, name) {
+    let low = 0;
+    let high = list.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (list[mid] < name) {
+            low = mid + 1;
+        } else {
+            high = mid;
+        }
+    }
+    list.splice(low, 0, name);
+}
+
+function applyPhotoDelta(delta) {
+    const next = photos.slice();
+    const removed = new Set(delta.removed);
+    const renames = new Map(delta.renamed);
+    const kept = next.filter(name => !removed.has(name) && !renames.has(name));
+    delta.added.forEach(name => insertSorted(kept, name));
+    renames.forEach(newName => insertSorted(kept, newName));
+    const current = photos[currentIndex];
+    replacePhotos(kept, renames.get(current) || current);
+}
+
+function replacePhotos(newPhotos, current = photos[currentIndex]) {
+    // Stay on the photo being viewed, or its neighbour if it went away
+    photos = newPhotos;
+    const index = photos.indexOf(current);
+    if (index >= 0) {
+        const renamed = document.getElementById('photo-name').textContent !== current;
+        currentIndex = index;
+        if (renamed) {
+            updatePhoto();
+        } else {
+            updateProgressBar();
+        }
+    } else {
+        currentIndex = Math.min(currentIndex, Math.max(photos.length - 1, 0));
+        updatePhoto();
+    }
+}
+
 async function getCurrentPhotoDate() {
     try {
         const response = await fetch('/api/get_current_photo_date?image_path=' + photos[currentIndex]);
@@ -38,9 +133,20 @@ async function getCurrentPhotoDate() {
     }
 }
 
+function requestPrefetch(photoName) {
+    fetch('/api/prefetch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            image_path: photoName,
+            width: defaultImageWidth
+        })
+    }).catch(error => console.error('Error requesting prefetch:', error));
+}
+
 function preloadImage(index) {
     if (photos.length > 0 && index >= 0 && index < photos.length) {
-        const photoSrc = `/photos/${photos[index]}?width=${defaultImageWidth}`;
+        const photoSrc = photoUrl(photos[index], defaultImageWidth);
         if (!preloadedImages[photoSrc]) {
             const img = new Image();
             img.src = photoSrc;
@@ -48,21 +154,45 @@ function preloadImage(index) {
         }
     }
 }
+function showPhoto(photoElement, photoName) {
+    // Show a quick preview first unless the sharp image is already loaded
+    const sharpSrc = photoUrl(photoName, defaultImageWidth);
+    const preloaded = preloadedImages[sharpSrc];
+    if (preloaded && preloaded.complete) {
+        photoElement.src = sharpSrc;
+        return;
+    }
+    photoElement.src = photoUrl(photoName, previewImageWidth, 'preview');
+    const sharp = preloaded || new Image();
+    sharp.addEventListener('load', () => {
+        if (photos[currentIndex] === photoName) {
+            photoElement.src = sharpSrc;
+        }
+    }, { once: true });
+    if (!preloaded) {
+        sharp.src = sharpSrc;
+        preloadedImages[sharpSrc] = sharp;
+    }
+}
+
 async function updatePhoto() {
     const photoElement = document.getElementById('photo');
-    let photoSrc = ``;
     let currentPhoto = '';
     const photoNameElement = document.getElementById('photo-name');
     if (photos.length > 0) {
         currentPhoto = photos[currentIndex];
-        photoSrc = `/photos/${currentPhoto}?width=${defaultImageWidth}`;
+        // Same display size for the preview and the sharp image
+        photoElement.style.width = `${defaultImageWidth}px`;
+        showPhoto(photoElement, currentPhoto);
+        requestPrefetch(currentPhoto);
         
         // Preload previous and next images
         preloadImage((currentIndex - 1 + photos.length) % photos.length);
         preloadImage((currentIndex + 1) % photos.length);
-    } 
+    } else {
+        photoElement.src = '';
+    }
     photoNameElement.textContent = currentPhoto;
-    photoElement.src = photoSrc;
     rotationAngle = 0;
     photoElement.style.transform = `rotate(${rotationAngle}deg)`;
     // Update progress bar
@@ -123,6 +253,235 @@ function rotateRight() {
 }
 
 
+// Deep Zoom viewer: loads only the tiles in view, at the level closest to
+// the screen resolution
+let zoom = null;
+const maxZoomScale = 4;
+
+async function openZoom() {
+    if (photos.length === 0) {
+        return;
+    }
+    const photoName = photos[currentIndex];
+    const base = `/tiles/${encodeURIComponent(photoName)}`;
+    try {
+        const response = await fetch(`${base}.dzi`);
+        if (!response.ok) {
+            alert("Zooming is not available for this photo.");
+            return;
+        }
+        const descriptor = new DOMParser()
+            .parseFromString(await response.text(), 'application/xml').documentElement;
+        const size = descriptor.getElementsByTagName('Size')[0];
+        document.getElementById('zoom-viewer').style.display = 'block';
+        const canvas = document.getElementById('zoom-canvas');
+        canvas.innerHTML = '';
+        zoom = {
+            base: base,
+            canvas: canvas,
+            width: Number(size.getAttribute('Width')),
+            height: Number(size.getAttribute('Height')),
+            tileSize: Number(descriptor.getAttribute('TileSize')),
+            overlap: Number(descriptor.getAttribute('Overlap')),
+            format: descriptor.getAttribute('Format'),
+            tiles: new Map(),
+            pending: false,
+        };
+        zoom.maxLevel = Math.ceil(Math.log2(Math.max(zoom.width, zoom.height)));
+        zoom.minScale = Math.min(canvas.clientWidth / zoom.width, canvas.clientHeight / zoom.height);
+        zoom.scale = zoom.minScale;
+        zoom.x = (canvas.clientWidth - zoom.width * zoom.scale) / 2;
+        zoom.y = (canvas.clientHeight - zoom.height * zoom.scale) / 2;
+        // Shown under the tiles while they load
+        zoom.backdrop = document.createElement('img');
+        zoom.backdrop.src = photoUrl(photoName, defaultImageWidth);
+        canvas.appendChild(zoom.backdrop);
+        renderZoom();
+    } catch (error) {
+        console.error('Error opening zoom viewer:', error);
+    }
+}
+
+function closeZoom() {
+    document.getElementById('zoom-viewer').style.display = 'none';
+    document.getElementById('zoom-canvas').innerHTML = '';
+    zoom = null;
+}
+
+function scheduleZoomRender() {
+    if (zoom && !zoom.pending) {
+        zoom.pending = true;
+        requestAnimationFrame(renderZoom);
+    }
+}
+
+function renderZoom() {
+    if (!zoom) {
+        return;
+    }
+    zoom.pending = false;
+    const canvas = zoom.canvas;
+    Object.assign(zoom.backdrop.style, {
+        left: `${zoom.x}px`,
+        top: `${zoom.y}px`,
+        width: `${zoom.width * zoom.scale}px`,
+        height: `${zoom.height * zoom.scale}px`,
+    });
+
+    const wanted = Math.ceil(Math.log2(zoom.scale * window.devicePixelRatio));
+    const level = Math.min(zoom.maxLevel, Math.max(0, zoom.maxLevel + wanted));
+    const levelScale = Math.pow(2, zoom.maxLevel - level);
+    const levelWidth = Math.ceil(zoom.width / levelScale);
+    const levelHeight = Math.ceil(zoom.height / levelScale);
+    // Screen pixels per pixel of the level
+    const pixel = zoom.scale * levelScale;
+    const size = zoom.tileSize;
+    const firstCol = Math.max(0, Math.floor(-zoom.x / pixel / size));
+    const lastCol = Math.min(Math.ceil(levelWidth / size), Math.ceil((canvas.clientWidth - zoom.x) / pixel / size));
+    const firstRow = Math.max(0, Math.floor(-zoom.y / pixel / size));
+    const lastRow = Math.min(Math.ceil(levelHeight / size), Math.ceil((canvas.clientHeight - zoom.y) / pixel / size));
+
+    const visible = new Set();
+    for (let row = firstRow; row < lastRow; row++) {
+        for (let col = firstCol; col < lastCol; col++) {
+            const key = `${level}/${col}_${row}`;
+            visible.add(key);
+            let tile = zoom.tiles.get(key);
+            if (!tile) {
+                tile = document.createElement('img');
+                tile.src = `${zoom.base}_files/${key}.${zoom.format}`;
+                canvas.appendChild(tile);
+                zoom.tiles.set(key, tile);
+            }
+            // Inner tile edges carry the overlap
+            const left = col * size - (col > 0 ? zoom.overlap : 0);
+            const top = row * size - (row > 0 ? zoom.overlap : 0);
+            const right = Math.min((col + 1) * size + zoom.overlap, levelWidth);
+            const bottom = Math.min((row + 1) * size + zoom.overlap, levelHeight);
+            Object.assign(tile.style, {
+                left: `${zoom.x + left * pixel}px`,
+                top: `${zoom.y + top * pixel}px`,
+                width: `${(right - left) * pixel}px`,
+                height: `${(bottom - top) * pixel}px`,
+            });
+        }
+    }
+    for (const [key, tile] of zoom.tiles) {
+        if (!visible.has(key)) {
+            tile.remove();
+            zoom.tiles.delete(key);
+        }
+    }
+}
+
+function zoomAt(screenX, screenY, factor) {
+    const scale = Math.min(maxZoomScale, Math.max(zoom.minScale, zoom.scale * factor));
+    // Keep the point under the cursor in place
+    zoom.x = screenX - (screenX - zoom.x) * (scale / zoom.scale);
+    zoom.y = screenY - (screenY - zoom.y) * (scale / zoom.scale);
+    zoom.scale = scale;
+    scheduleZoomRender();
+}
+
+(function setUpZoomControls() {
+    const canvas = document.getElementById('zoom-canvas');
+    let drag = null;
+    canvas.addEventListener('wheel', event => {
+        if (!zoom) {
+            return;
+        }
+        event.preventDefault();
+        const bounds = canvas.getBoundingClientRect();
+        zoomAt(event.clientX - bounds.left, event.clientY - bounds.top, Math.exp(-event.deltaY * 0.002));
+    }, { passive: false });
+    canvas.addEventListener('pointerdown', event => {
+        if (zoom) {
+            drag = { x: event.clientX, y: event.clientY };
+            canvas.setPointerCapture(event.pointerId);
+        }
+    });
+    canvas.addEventListener('pointermove', event => {
+        if (zoom && drag) {
+            zoom.x += event.clientX - drag.x;
+            zoom.y += event.clientY - drag.y;
+            drag = { x: event.clientX, y: event.clientY };
+            scheduleZoomRender();
+        }
+    });
+    canvas.addEventListener('pointerup', () => {
+        drag = null;
+    });
+    canvas.addEventListener('dblclick', event => {
+        if (zoom) {
+            const bounds = canvas.getBoundingClientRect();
+            zoomAt(event.clientX - bounds.left, event.clientY - bounds.top, 2);
+        }
+    });
+    document.addEventListener('keydown', event => {
+        if (zoom && event.key === 'Escape') {
+            closeZoom();
+        }
+    });
+    window.addEventListener('resize', scheduleZoomRender);
+})();
+
+let contactSheet = null;
+let contactSheetPage = 0;
+
+async function toggleContactSheet() {
+    const container = document.getElementById('contact-sheet-container');
+    if (container.style.display === 'none') {
+        container.style.display = 'block';
+        // Open on the page of the current photo
+        await showContactSheet(Math.floor(currentIndex / (contactSheet ? contactSheet.per_page : 100)));
+    } else {
+        container.style.display = 'none';
+    }
+}
+
+async function showContactSheet(page) {
+    if (contactSheet && (page < 0 || page >= contactSheet.pages)) {
+        return;
+    }
+    try {
+        const response = await fetch(`/api/contact_sheet?page=${page}`);
+        const data = await response.json();
+        if (!response.ok) {
+            alert("Error: " + data.error);
+            return;
+        }
+        contactSheet = data;
+        contactSheetPage = data.page;
+        document.getElementById('contact-sheet').src = data.photos.length > 0 ? data.image : '';
+        document.getElementById('contact-sheet-page').textContent =
+            `${data.pages === 0 ? 0 : data.page + 1} / ${data.pages}`;
+    } catch (error) {
+        console.error('Error loading contact sheet:', error);
+    }
+}
+
+async function openFromContactSheet(event) {
+    const sheet = event.target;
+    if (!contactSheet || sheet.clientWidth === 0) {
+        return;
+    }
+    // The sheet may be shown scaled down
+    const scale = contactSheet.width / sheet.clientWidth;
+    const x = event.offsetX * scale;
+    const y = event.offsetY * scale;
+    const cell = contactSheet.photos.find(photo =>
+        x >= photo.x && x < photo.x + photo.width && y >= photo.y && y < photo.y + photo.height);
+    if (!cell) {
+        return;
+    }
+    const index = photos.indexOf(cell.filename);
+    if (index >= 0) {
+        currentIndex = index;
+        document.getElementById('contact-sheet-container').style.display = 'none';
+        await updatePhoto();
+    }
+}
+
 async function updateMetadata() {
     if (photos.length > 0) {
         const selectedDate = document.getElementById('date-picker').value;
@@ -145,6 +504,7 @@ async function updateMetadata() {
             if (response.ok) {
                 updatedPhotos[photos[currentIndex]] = true;
                 await getCurrentPhotoDate();
+                await applyDateToDuplicates(photos[currentIndex], formattedDate);
                 const autoProgress = document.getElementById('auto-progress').checked;
                 if (autoProgress) {
                     await nextPhoto();
@@ -158,6 +518,51 @@ async function updateMetadata() {
     }
 }
 
+async function applyDateToDuplicates(imagePath, formattedDate) {
+    try {
+        const response = await fetch(`/api/duplicates?image_path=${encodeURIComponent(imagePath)}`);
+        if (!response.ok) {
+            return;
+        }
+        const data = await response.json();
+        const duplicates = data.duplicates.map(duplicate => duplicate.filename);
+        if (duplicates.length === 0) {
+            return;
+        }
+        const shown = duplicates.slice(0, 10).join("\n");
+        const more = duplicates.length > 10 ? `\n... and ${duplicates.length - 10} more` : "";
+        if (!confirm(`${duplicates.length} photo(s) look like ${imagePath}:\n${shown}${more}\n\nSet the same date on them?`)) {
+            return;
+        }
+        const batchResponse = await fetch('/api/update_metadata_batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                image_paths: duplicates,
+                new_date: formattedDate
+            })
+        });
+        const batch = await batchResponse.json();
+        if (!batchResponse.ok) {
+            alert("Error: " + batch.error);
+            return;
+        }
+        const failed = [];
+        batch.results.forEach(result => {
+            if (result.success) {
+                updatedPhotos[result.image_path] = true;
+            } else {
+                failed.push(`${result.image_path}: ${result.error}`);
+            }
+        });
+        if (failed.length > 0) {
+            alert("Some photos could not be updated:\n" + failed.join("\n"));
+        }
+    } catch (error) {
+        console.error('Error updating near-duplicates:', error);
+    }
+}
+
 async function getAgeDate() {
     const ageInput = document.getElementById('age');
     const nameSelect = document.getElementById('names');
@@ -0,0 +1,259 @@
+"""Benchmark the app endpoints against a synthetic photo corpus.
+
+Measures /api/photos, /photos/<name>?width= (cold and cached, split by decode
+path), /api/get_current_photo_date, /api/update_metadata and calculate_date
+through Flask's test client and writes the latencies as JSON.
+
+Usage:
+    python benchmarks/bench_app.py [--count 1000] [--output results.json]
+    python benchmarks/bench_app.py --compare baseline.json [--threshold 0.25]
+    python benchmarks/bench_app.py --compare baseline.json --against results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import PIL
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from benchmarks.corpus import (
+    DEFAULT_COUNT,
+    DEFAULT_SIZES,
+    generate_corpus,
+    parse_sizes,
+)
+from PhotoTimeSleuth.app import app
+from PhotoTimeSleuth.Helpers.date_helper import SEASON_MAP, calculate_date
+from PhotoTimeSleuth.Helpers.thumbnail_helper import ThumbnailCache
+
+DEFAULT_SAMPLE = 200
+DEFAULT_REPEAT = 20
+DEFAULT_WIDTH = 800
+DEFAULT_THRESHOLD = 0.25
+# Differences below this are noise, whatever the ratio
+MIN_REGRESSION_MS = 0.05
+
+
+def summarize(timings):
+    """Return count and latency percentiles in ms of a list of seconds."""
+    ms = sorted(t * 1000 for t in timings)
+    return {
+        "count": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": ms[len(ms) // 2],
+        "p95_ms": ms[min(int(len(ms) * 0.95), len(ms) - 1)],
+        "max_ms": ms[-1],
+    }
+
+
+def _timed(timings, name, call):
+    start = time.perf_counter()
+    response = call()
+    timings[name].append(time.perf_counter() - start)
+    return response
+
+
+def _check(response, name):
+    if response.status_code not in (200, 404):
+        raise RuntimeError(f"{name} failed with {response.status_code}")
+    return response
+
+
+def run_benchmarks(corpus_dir, work_dir, sample, repeat, width):
+    manifest_path = os.path.join(corpus_dir, "manifest.json")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    rng = random.Random(0)
+    photos = rng.sample(manifest, min(sample, len(manifest)))
+
+    bday_file = os.path.join(work_dir, "bdays.txt")
+    with open(bday_file, "w", encoding="utf-8") as f:
+        f.write("Bench\t1980-06-15\n")
+    app.config.update(
+        PHOTO_DIRECTORY=corpus_dir,
+        BDAY_FILE=bday_file,
+        CATALOG_DIR=os.path.join(work_dir, "catalogs"),
+        THUMBNAIL_CACHE=ThumbnailCache(os.path.join(work_dir, "thumbnails")),
+        PREFETCHER=None,
+    )
+    client = app.test_client()
+    timings = defaultdict(list)
+
+    # The first listing builds the catalog, later ones only stat the directory
+    _timed(timings, "api_photos_cold", lambda: client.get("/api/photos"))
+    for _ in range(repeat):
+        _check(
+            _timed(timings, "api_photos", lambda: client.get("/api/photos")),
+            "api_photos",
+        )
+
+    for phase in ("cold", "cached"):
+        for photo in photos:
+            url = f"/photos/{photo['name']}?width={width}"
+            start = time.perf_counter()
+            response = _check(client.get(url), url)
+            elapsed = time.perf_counter() - start
+            decode_path = response.headers.get("X-Decode-Path", "unknown")
+            timings[f"thumbnail_{phase}"].append(elapsed)
+            if phase == "cold":
+                timings[f"thumbnail_cold[{decode_path}]"].append(elapsed)
+
+    for photo in photos:
+        kind = "exif" if photo["exif"] else "no_exif"
+        url = f"/api/get_current_photo_date?image_path={photo['name']}"
+        response = _timed(
+            timings, f"photo_date[{kind}]", lambda url=url: client.get(url)
+        )
+        _check(response, url)
+
+    # Writes go to copies so a reused corpus stays unchanged
+    scratch = os.path.join(work_dir, "scratch")
+    os.makedirs(scratch)
+    jpegs = [photo for photo in photos if photo["format"] == "JPEG"]
+    for photo in jpegs:
+        shutil.copy2(os.path.join(corpus_dir, photo["name"]), scratch)
+    app.config["PHOTO_DIRECTORY"] = scratch
+    for photo in jpegs:
+        kind = "exif" if photo["exif"] else "no_exif"
+        body = {"image_path": photo["name"], "new_date": "2001:02:03"}
+        # The first write to a file may rewrite its EXIF, later ones patch it
+        for name in (f"update_metadata[{kind}]", "update_metadata_repeat"):
+            response = _timed(
+                timings,
+                name,
+                lambda body=body: client.post("/api/update_metadata", json=body),
+            )
+            _check(response, name)
+
+    seasons = list(SEASON_MAP) + ["birthday", "christmas"]
+    for i in range(repeat * 100):
+        _timed(
+            timings,
+            "calculate_date",
+            lambda i=i: calculate_date("1980-06-15", 1 + i % 40, seasons[i % 6]),
+        )
+
+    return {name: summarize(values) for name, values in sorted(timings.items())}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold):
+    """
+    Print the p50 change of every benchmark.
+
+    :return: Names of the benchmarks whose p50 grew by more than ``threshold``.
+    """
+    regressions = []
+    print(f"{'benchmark':<36}{'base p50':>12}{'new p50':>12}{'change':>10}")
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        old = baseline["results"].get(name)
+        new = current["results"].get(name)
+        if old is None or new is None:
+            print(f"{name:<36}{'(only in one run)':>34}")
+            continue
+        change = new["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        flag = ""
+        if change > threshold and new["p50_ms"] - old["p50_ms"] > MIN_REGRESSION_MS:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<36}{old['p50_ms']:>10.3f}ms{new['p50_ms']:>10.3f}ms"
+            f"{change:>+9.0%}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="Existing corpus from corpus.py to reuse")
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT)
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=DEFAULT_SAMPLE,
+        help="Number of photos requested per per-photo benchmark",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare with")
+    parser.add_argument(
+        "--against", help="Compare this results JSON instead of running"
+    )
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+    # Expected failures (e.g. no EXIF in PNGs) would otherwise flood stderr
+    logging.disable(logging.ERROR)
+
+    if args.against:
+        with open(args.against, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        with tempfile.TemporaryDirectory() as work_dir:
+            corpus_dir = args.corpus
+            if corpus_dir is None:
+                corpus_dir = os.path.join(work_dir, "corpus")
+                start = time.perf_counter()
+                generate_corpus(corpus_dir, args.count, args.sizes)
+                print(
+                    f"Generated {args.count} photos in "
+                    f"{time.perf_counter() - start:.1f} s",
+                    file=sys.stderr,
+                )
+            results = run_benchmarks(
+                corpus_dir, work_dir, args.sample, args.repeat, args.width
+            )
+        current = {
+            "meta": {
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "pillow": PIL.__version__,
+                "platform": platform.platform(),
+                "count": args.count if args.corpus is None else None,
+                "sample": args.sample,
+                "width": args.width,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": results,
+        }
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+        if not args.compare:
+            print(json.dumps(current, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Compare the scalar and vectorized birthday/age/season date estimates.
+
+Usage: python benchmarks/bench_calculate_dates.py [--people 50] [--ages 3-12]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.date_helper import (
+    SEASON_MAP,
+    calculate_date,
+    calculate_dates,
+)
+
+SEASONS = list(SEASON_MAP) + ["birthday", "christmas"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--people", type=int, default=50)
+    parser.add_argument("--ages", default="3-12")
+    args = parser.parse_args()
+    first_age, last_age = (int(v) for v in args.ages.split("-"))
+
+    random.seed(0)
+    bdays, ages, seasons = [], [], []
+    for _ in range(args.people):
+        bday = f"{random.randint(1920, 2015)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+        for age in range(first_age, last_age + 1):
+            for season in SEASONS:
+                bdays.append(bday)
+                ages.append(age)
+                seasons.append(season)
+
+    start = time.perf_counter()
+    scalar = [calculate_date(*values) for values in zip(bdays, ages, seasons)]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = calculate_dates(bdays, ages, seasons)
+    vectorized_time = time.perf_counter() - start
+
+    assert scalar == vectorized, "Results differ"
+    count = len(bdays)
+    print(f"estimates:   {count}")
+    print(f"scalar:      {scalar_time * 1000:.1f} ms ({count / scalar_time:,.0f}/s)")
+    print(
+        f"vectorized:  {vectorized_time * 1000:.1f} ms "
+        f"({count / vectorized_time:,.0f}/s)"
+    )
+    print(f"speedup:     {scalar_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compare the header-only EXIF date reader and writer with the piexif path.
+
+Usage: python benchmarks/bench_exif.py [--count 500] [--size 2000x1500]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import piexif
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.exif_helper import (
+    patch_image_date,
+    read_image_date,
+)
+from PhotoTimeSleuth.Helpers.image_helper import get_image_date
+
+
+def make_corpus(directory, count, size):
+    # One noisy source image, written with different EXIF blocks
+    base = Image.effect_noise(size, 40).convert("RGB")
+    thumb = base.resize((160, 120))
+    paths = []
+    for i in range(count):
+        date = f"{1990 + i % 30}:01:01 12:00:00".encode()
+        # Roughly the tag set of a camera file, including a large MakerNote
+        exif = {
+            "0th": {
+                piexif.ImageIFD.Make: b"Bench",
+                piexif.ImageIFD.Model: b"Bench Camera 1",
+                piexif.ImageIFD.Software: b"Bench Firmware 1.0",
+                piexif.ImageIFD.Orientation: 1,
+                piexif.ImageIFD.XResolution: (72, 1),
+                piexif.ImageIFD.YResolution: (72, 1),
+                piexif.ImageIFD.ResolutionUnit: 2,
+                piexif.ImageIFD.DateTime: date,
+            },
+            "Exif": {
+                piexif.ExifIFD.DateTimeOriginal: date,
+                piexif.ExifIFD.DateTimeDigitized: date,
+                piexif.ExifIFD.ExposureTime: (1, 125),
+                piexif.ExifIFD.FNumber: (28, 10),
+                piexif.ExifIFD.ISOSpeedRatings: 200,
+                piexif.ExifIFD.FocalLength: (50, 1),
+                piexif.ExifIFD.LensModel: b"Bench Lens 50mm",
+                piexif.ExifIFD.PixelXDimension: size[0],
+                piexif.ExifIFD.PixelYDimension: size[1],
+                piexif.ExifIFD.MakerNote: bytes(range(256)) * 120,
+                piexif.ExifIFD.UserComment: b"\x00" * 2048,
+            },
+            "GPS": {
+                piexif.GPSIFD.GPSLatitudeRef: b"N",
+                piexif.GPSIFD.GPSLatitude: ((52, 1), (30, 1), (0, 1)),
+                piexif.GPSIFD.GPSLongitudeRef: b"E",
+                piexif.GPSIFD.GPSLongitude: ((13, 1), (24, 1), (0, 1)),
+            },
+            "1st": {},
+            "thumbnail": None,
+        }
+        if i % 2:
+            exif["thumbnail"] = thumb_bytes(thumb)
+        path = os.path.join(directory, f"{i:05d}.jpg")
+        base.save(path, format="JPEG", exif=piexif.dump(exif))
+        paths.append(path)
+    return paths
+
+
+def thumb_bytes(thumb):
+    import io
+
+    img_io = io.BytesIO()
+    thumb.save(img_io, format="JPEG")
+    return img_io.getvalue()
+
+
+def time_reader(reader, paths):
+    start = time.perf_counter()
+    results = [reader(path) for path in paths]
+    return time.perf_counter() - start, results
+
+
+def rewrite_with_piexif(path, new_date):
+    exif_dict = piexif.load(path)
+    exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal] = new_date
+    exif_dict["Exif"][piexif.ExifIFD.DateTimeDigitized] = new_date
+    exif_dict["0th"][piexif.ImageIFD.DateTime] = new_date
+    piexif.insert(piexif.dump(exif_dict), path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--size", default="2000x1500")
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.split("x"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_corpus(directory, args.count, size)
+        piexif_time, piexif_results = time_reader(get_image_date, paths)
+        fast_time, fast_results = time_reader(read_image_date, paths)
+        rewrite_time, _ = time_reader(
+            lambda path: rewrite_with_piexif(path, "2000:01:01 00:00:00"), paths
+        )
+        patch_time, _ = time_reader(
+            lambda path: patch_image_date(path, "2001:01:01 00:00:00"), paths
+        )
+
+    assert piexif_results == fast_results, "Readers disagree"
+    print(f"files:        {len(paths)}")
+    print(f"piexif:       {piexif_time * 1000:.1f} ms")
+    print(f"header-only:  {fast_time * 1000:.1f} ms")
+    print(f"speedup:      {piexif_time / fast_time:.1f}x")
+    print(f"piexif write: {rewrite_time * 1000:.1f} ms")
+    print(f"patch write:  {patch_time * 1000:.1f} ms (journaled)")
+    print(f"speedup:      {rewrite_time / patch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
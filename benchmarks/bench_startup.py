@@ -0,0 +1,154 @@
+"""Measure the cold-start time of the app and break down its imports.
+
+Runs ``python -X importtime`` on the app module and reports the slowest
+top-level packages, then starts the headless server and times how long it
+takes to answer its first request.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 10] [--json]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+APP_MODULE = "PhotoTimeSleuth.app"
+
+# Dependencies that should only be imported on first use
+DEFERRED = ("openai", "numpy", "PIL", "keyring", "psutil", "webview", "waitress")
+
+
+def _env(home=None):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    if home is not None:
+        env["HOME"] = env["USERPROFILE"] = home
+    return env
+
+
+def import_times():
+    """
+    Import the app once in a fresh interpreter.
+
+    :return: (total import time in ms, {top-level package: self time in ms},
+              deferred dependencies that were imported anyway)
+    """
+    code = (
+        f"import sys, {APP_MODULE}; "
+        f"print(','.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=_env(),
+        check=True,
+    )
+    total = 0.0
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        if name == APP_MODULE:
+            total = int(cumulative_us) / 1000
+    leaked = [m for m in result.stdout.strip().split(",") if m]
+    return total, dict(packages), leaked
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response(timeout=30):
+    """Start ``--serve`` and return ms until the first API request succeeds."""
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as home:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "PhotoTimeSleuth",
+                "--serve",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+            ],
+            cwd=home,
+            env=_env(home),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(
+                        f"Server exited with code {process.returncode} before answering"
+                    )
+                try:
+                    url = f"http://127.0.0.1:{port}/api/photos"
+                    with urllib.request.urlopen(url, timeout=1):
+                        return (time.perf_counter() - start) * 1000
+                except OSError:
+                    time.sleep(0.01)
+            raise RuntimeError("Server did not start in time")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print JSON results")
+    args = parser.parse_args()
+
+    totals, packages, leaked = [], defaultdict(list), set()
+    for _ in range(args.runs):
+        total, run_packages, run_leaked = import_times()
+        totals.append(total)
+        for name, ms in run_packages.items():
+            packages[name].append(ms)
+        leaked.update(run_leaked)
+    ready = [time_to_first_response() for _ in range(args.runs)]
+
+    slowest = sorted(
+        ((name, statistics.median(ms)) for name, ms in packages.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[: args.top]
+    results = {
+        "import_ms": statistics.median(totals),
+        "first_response_ms": statistics.median(ready),
+        "slowest_packages_ms": dict(slowest),
+        "eagerly_imported": sorted(leaked),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Import of {APP_MODULE}: {results['import_ms']:8.1f} ms (median)")
+    print(f"First response (--serve): {results['first_response_ms']:8.1f} ms")
+    print("Slowest packages (self time):")
+    for name, ms in slowest:
+        print(f"  {name:<24}{ms:8.1f} ms")
+    if leaked:
+        print(f"Deferred dependencies imported at startup: {', '.join(sorted(leaked))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Generate a synthetic photo corpus for the benchmarks.
+
+The corpus mixes JPEGs and PNGs at several resolutions. Some JPEGs have EXIF
+dates, an orientation tag or an embedded EXIF thumbnail, and some have no EXIF
+at all. A manifest.json describing every file is written next to the photos.
+
+Usage: python benchmarks/corpus.py OUTPUT_DIR [--count 1000] [--sizes 640x480,4000x3000]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import piexif
+from PIL import Image
+
+DEFAULT_COUNT = 1000
+DEFAULT_SIZES = ((640, 480), (1920, 1080), (4000, 3000))
+
+PNG_SHARE = 0.2
+EXIF_SHARE = 0.7  # Of the JPEGs
+ORIENTED_SHARE = 0.3  # Of the JPEGs with EXIF
+THUMBNAIL_SHARE = 0.5  # Of the JPEGs with EXIF
+ORIENTATIONS = (3, 6, 8)
+
+
+def parse_sizes(value):
+    return tuple(tuple(int(v) for v in size.split("x")) for size in value.split(","))
+
+
+def _base_images(rng, sizes):
+    """Return one base image and its EXIF thumbnail bytes per size."""
+    bases = {}
+    for size in sizes:
+        # Upscaled noise has smooth areas and texture, so it compresses
+        # roughly like a real photo and encodes quickly
+        small_size = (max(size[0] // 16, 1), max(size[1] // 16, 1))
+        bands = [
+            Image.frombytes(
+                "L", small_size, rng.randbytes(small_size[0] * small_size[1])
+            )
+            for _ in range(3)
+        ]
+        image = Image.merge("RGB", bands).resize(size, Image.BILINEAR)
+        thumb_io = io.BytesIO()
+        image.resize((160, max(160 * size[1] // size[0], 1))).save(
+            thumb_io, format="JPEG", quality=75
+        )
+        bases[size] = (image, thumb_io.getvalue())
+    return bases
+
+
+def _exif_bytes(rng, size, thumbnail, orientation):
+    date = (
+        f"{rng.randint(1950, 2020)}:{rng.randint(1, 12):02d}:"
+        f"{rng.randint(1, 28):02d} 12:00:00"
+    ).encode()
+    exif = {
+        "0th": {
+            piexif.ImageIFD.Make: b"Synthetic",
+            piexif.ImageIFD.Model: b"Corpus Camera",
+            piexif.ImageIFD.DateTime: date,
+        },
+        "Exif": {
+            piexif.ExifIFD.DateTimeOriginal: date,
+            piexif.ExifIFD.DateTimeDigitized: date,
+            piexif.ExifIFD.PixelXDimension: size[0],
+            piexif.ExifIFD.PixelYDimension: size[1],
+        },
+    }
+    if orientation:
+        exif["0th"][piexif.ImageIFD.Orientation] = orientation
+    if thumbnail is not None:
+        exif["1st"] = {piexif.ImageIFD.JPEGInterchangeFormat: 0}
+        exif["thumbnail"] = thumbnail
+    return piexif.dump(exif)
+
+
+_worker_bases = None
+
+
+def _init_worker(seed, sizes):
+    global _worker_bases
+    _worker_bases = _base_images(random.Random(seed), sizes)
+
+
+def _write_photo(directory, entry, exif):
+    image, _ = _worker_bases[tuple(entry["size"])]
+    path = os.path.join(directory, entry["name"])
+    if entry["format"] == "PNG":
+        image.save(path, compress_level=1)
+    elif exif is not None:
+        image.save(path, quality=85, exif=exif)
+    else:
+        image.save(path, quality=85)
+
+
+def generate_corpus(
+    directory, count=DEFAULT_COUNT, sizes=DEFAULT_SIZES, seed=0, workers=None
+):
+    """
+    Write ``count`` synthetic photos to ``directory``.
+
+    The same seed always produces the same corpus. Files are encoded in a
+    process pool of ``workers`` processes (default: one per CPU).
+
+    :return: List of manifest entries, one dict per photo.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    bases = _base_images(random.Random(seed), sizes)
+    manifest, exifs = [], []
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        entry = {
+            "size": list(size),
+            "exif": False,
+            "orientation": None,
+            "thumbnail": False,
+        }
+        exif = None
+        if rng.random() < PNG_SHARE:
+            entry.update(name=f"photo_{i:05d}.png", format="PNG")
+        else:
+            entry.update(name=f"photo_{i:05d}.jpg", format="JPEG")
+            if rng.random() < EXIF_SHARE:
+                entry["exif"] = True
+                if rng.random() < ORIENTED_SHARE:
+                    entry["orientation"] = rng.choice(ORIENTATIONS)
+                entry["thumbnail"] = rng.random() < THUMBNAIL_SHARE
+                exif = _exif_bytes(
+                    rng,
+                    size,
+                    bases[size][1] if entry["thumbnail"] else None,
+                    entry["orientation"],
+                )
+        manifest.append(entry)
+        exifs.append(exif)
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(seed, sizes)
+    ) as executor:
+        for _ in executor.map(
+            _write_photo, [directory] * count, manifest, exifs, chunksize=8
+        ):
+            pass
+
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_dir")
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT)
+    parser.add_argument(
+        "--sizes",
+        type=parse_sizes,
+        default=DEFAULT_SIZES,
+        help="Comma-separated WIDTHxHEIGHT list, used in turn",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="Encoder processes")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(
+        args.output_dir, args.count, args.sizes, args.seed, args.workers
+    )
+    print(f"Wrote {len(manifest)} photos to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
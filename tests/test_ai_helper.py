@@ -0,0 +1,204 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers import ai_helper
+from PhotoTimeSleuth.Helpers.ai_helper import (
+    ask_ai_for_date,
+    iter_estimated_dates,
+    prepare_image,
+)
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "1999-05-01"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+SLOW_DELAY = 10
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local chat-completions server that rate-limits its first request."""
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.05):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.delay = delay
+        self.slow_after = None  # Requests after this one take SLOW_DELAY
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.requests += 1
+            first = server.requests == 1
+            slow = server.slow_after is not None and server.requests > server.slow_after
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(SLOW_DELAY if slow else server.delay)
+            if first:
+                self._reply(
+                    429, {"error": {"message": "Slow down"}}, {"Retry-After": "0"}
+                )
+            else:
+                self._reply(200, COMPLETION)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_photos(directory, count):
+    paths = []
+    for i in range(count):
+        path = directory / f"{i}.jpg"
+        Image.new("RGB", (32, 32)).save(path, format="JPEG")
+        paths.append(str(path))
+    return paths
+
+
+def test_batch_estimates_stream_with_bounded_concurrency(tmp_path, server):
+    paths = make_photos(tmp_path, 8)
+    results = list(
+        iter_estimated_dates(
+            paths,
+            "test-key",
+            concurrency=3,
+            rate_limit=100,
+            base_url=server.base_url,
+        )
+    )
+
+    assert sorted(path for path, _, _ in results) == sorted(paths)
+    assert all(date == "1999-05-01" and error is None for _, date, error in results)
+    assert server.requests == len(paths) + 1  # One request was retried after 429
+    assert 1 < server.max_in_flight <= 3
+
+
+def test_batch_reports_missing_files(tmp_path, server):
+    missing = str(tmp_path / "missing.jpg")
+    results = list(
+        iter_estimated_dates([missing], "test-key", base_url=server.base_url)
+    )
+    assert len(results) == 1
+    assert results[0][0] == missing
+    assert results[0][1] is None and results[0][2]
+
+
+def test_batch_reports_any_error_per_photo(tmp_path, server, monkeypatch):
+    server.requests = 1  # Skip the simulated rate limit
+    paths = make_photos(tmp_path, 3)
+    real_encode = ai_helper._encode_image
+
+    def encode(image_path, max_edge):
+        if image_path == paths[1]:
+            raise RuntimeError("Too many pixels")
+        return real_encode(image_path, max_edge)
+
+    monkeypatch.setattr(ai_helper, "_encode_image", encode)
+    results = {
+        path: (date, error)
+        for path, date, error in iter_estimated_dates(
+            paths, "test-key", rate_limit=100, base_url=server.base_url
+        )
+    }
+    assert results == {
+        paths[0]: ("1999-05-01", None),
+        paths[1]: (None, "Too many pixels"),
+        paths[2]: ("1999-05-01", None),
+    }
+
+
+def test_closing_the_batch_cancels_requests_in_flight(tmp_path, server):
+    server.requests = 1  # Skip the simulated rate limit
+    server.slow_after = 2  # Only the first estimate comes back quickly
+    paths = make_photos(tmp_path, 4)
+    estimates = iter_estimated_dates(
+        paths, "test-key", concurrency=2, rate_limit=100, base_url=server.base_url
+    )
+    assert next(estimates)[1] == "1999-05-01"
+    estimates.close()
+
+    deadline = time.monotonic() + SLOW_DELAY / 2
+    while any(t.name == "ai-estimates" for t in threading.enumerate()):
+        assert time.monotonic() < deadline, "Requests in flight were not cancelled"
+        time.sleep(0.05)
+    assert server.requests <= 4
+
+
+def test_ask_ai_for_date_with_stand_in(tmp_path, server):
+    server.requests = 1  # Skip the simulated rate limit
+    path = make_photos(tmp_path, 1)[0]
+    assert ask_ai_for_date(path, "test-key", base_url=server.base_url) == "1999-05-01"
+
+
+def test_prepare_image_downsizes_and_orients(tmp_path):
+    path = tmp_path / "scan.png"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotated 90 degrees
+    noise = Image.effect_noise((3000, 2000), 64).convert("RGB")
+    noise.save(path, exif=exif)
+
+    data = prepare_image(str(path), max_edge=800, max_bytes=100 * 1024)
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.format == "JPEG"
+        assert max(img.size) <= 800
+        assert img.height > img.width
+    assert len(data) <= 100 * 1024
+
+
+def test_prepare_image_does_not_upscale(tmp_path):
+    path = make_photos(tmp_path, 1)[0]
+    with Image.open(io.BytesIO(prepare_image(path))) as img:
+        assert img.size == (32, 32)
@@ -0,0 +1,331 @@
+import io
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+import piexif
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth import app as app_module
+from PhotoTimeSleuth.Helpers.exif_helper import read_exif_dates
+from PhotoTimeSleuth.Helpers.journal_helper import ChangeJournal
+from PhotoTimeSleuth.Helpers.prefetch_helper import Prefetcher
+from PhotoTimeSleuth.Helpers.thumbnail_helper import (
+    DEFAULT_QUALITY,
+    FORMAT_WEBP,
+    ThumbnailCache,
+    webp_supported,
+)
+from PhotoTimeSleuth.Helpers.tile_helper import TileCache
+from PhotoTimeSleuth.Helpers.watch_helper import get_watcher
+
+ORIGINAL_DATE = "2001:02:03 04:05:06"
+
+
+def _noise(size, seed):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+    # Blocks rather than single pixels, so thumbnails keep the texture
+    return Image.fromarray(pixels).resize(size, Image.NEAREST)
+
+
+@pytest.fixture
+def photo_dir(tmp_path):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    exif = piexif.dump(
+        {"Exif": {piexif.ExifIFD.DateTimeOriginal: ORIGINAL_DATE.encode()}}
+    )
+    _noise((600, 400), 0).save(photos / "a.jpg", quality=90, exif=exif)
+    shutil.copy(photos / "a.jpg", photos / "a_copy.jpg")
+    _noise((400, 600), 1).save(photos / "c.png")
+    return photos
+
+
+@pytest.fixture
+def client(tmp_path, photo_dir, monkeypatch):
+    journal = ChangeJournal(str(tmp_path / "app" / "changes.jsonl"))
+    config = {
+        "PHOTO_DIRECTORY": str(photo_dir),
+        "BDAY_FILE": str(tmp_path / "app" / "bdays.txt"),
+        "CATALOG_DIR": str(tmp_path / "app" / "catalogs"),
+        "JOURNAL": journal,
+        "THUMBNAIL_CACHE": ThumbnailCache(str(tmp_path / "app" / "thumbnails")),
+        "TILE_CACHE": TileCache(str(tmp_path / "app" / "tiles")),
+    }
+    for key, value in config.items():
+        monkeypatch.setitem(app_module.app.config, key, value)
+    yield app_module.app.test_client()
+    journal.close()
+
+
+def test_thumbnails_revalidate_by_etag(client):
+    response = client.get("/photos/a.jpg?width=120", headers={"Accept": "image/jpeg"})
+    assert response.status_code == 200
+    assert response.mimetype == "image/jpeg"
+    etag = response.headers["ETag"]
+    assert "Accept" in response.headers["Vary"]
+
+    response = client.get(
+        "/photos/a.jpg?width=120",
+        headers={"Accept": "image/jpeg", "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+    assert not response.data
+
+    # Another format or size is another representation
+    response = client.get(
+        "/photos/a.jpg?width=120",
+        headers={"Accept": "image/webp,*/*", "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert client.get("/photos/a.jpg?width=120&quality=bad").status_code == 400
+
+
+def test_originals_support_range_requests(client, photo_dir):
+    data = (photo_dir / "a.jpg").read_bytes()
+    response = client.get("/photos/a.jpg", headers={"Range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.data == data[:100]
+    etag = response.headers["ETag"]
+    assert (
+        client.get("/photos/a.jpg", headers={"If-None-Match": etag}).status_code == 304
+    )
+    assert client.get("/photos/missing.jpg").status_code == 404
+
+
+@pytest.mark.skipif(not webp_supported(), reason="Pillow without WebP")
+def test_prefetch_warms_the_format_the_browser_negotiated(
+    client, photo_dir, monkeypatch
+):
+    monkeypatch.setattr(app_module.app, "secret_key", "test")
+    cache = app_module.app.config["THUMBNAIL_CACHE"]
+    prefetcher = Prefetcher(cache, workers=1, lookahead=1)
+    monkeypatch.setitem(app_module.app.config, "PREFETCHER", prefetcher)
+    try:
+        response = client.get(
+            "/photos/a.jpg?width=120", headers={"Accept": "image/webp,*/*"}
+        )
+        assert response.mimetype == "image/webp"
+        # fetch() sends a generic Accept header with the prefetch request
+        response = client.post(
+            "/api/prefetch", json={"image_path": "a.jpg", "width": 120}
+        )
+        assert response.status_code == 200
+        variant = (120, 0, FORMAT_WEBP, DEFAULT_QUALITY)
+        deadline = time.monotonic() + 10
+        while cache.get(str(photo_dir / "a_copy.jpg"), variant) is None:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        prefetcher.shutdown()
+
+
+def test_get_age_dates_rejects_a_body_that_is_not_an_object(client):
+    for body in ([1, 2], "text", 3):
+        response = client.post("/api/get_age_dates", json=body)
+        assert response.status_code == 400
+
+
+def test_ask_ai_batch_streams_cached_then_new_estimates(client, monkeypatch):
+    requested = []
+
+    def estimate(image_paths, api_key, **kwargs):
+        for image_path in image_paths:
+            requested.append(os.path.basename(image_path))
+            if image_path.endswith(".png"):
+                yield image_path, None, "Too many pixels"
+            else:
+                yield image_path, "1999-05-01", None
+
+    monkeypatch.setattr(app_module, "load_api_key", lambda bday_file: "test-key")
+    monkeypatch.setattr(app_module, "iter_estimated_dates", estimate)
+
+    def ask():
+        response = client.post(
+            "/api/ask_ai_batch", json={"image_paths": ["a.jpg", "c.png"]}
+        )
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        return {line["image_path"]: line for line in lines}
+
+    first = ask()
+    assert first["a.jpg"]["estimated_date"] == "1999-05-01"
+    assert first["c.png"]["error"] == "Too many pixels"
+    assert not first["a.jpg"]["cached"]
+
+    # Only the failed estimate is requested again
+    second = ask()
+    assert second["a.jpg"]["cached"]
+    assert requested == ["a.jpg", "c.png", "c.png"]
+
+    response = client.post("/api/ask_ai_batch", json={"image_paths": ["../x.jpg"]})
+    assert response.status_code == 400
+
+    monkeypatch.setitem(app_module.app.config, "PHOTO_DIRECTORY", None)
+    response = client.post("/api/ask_ai_batch", json={})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid directory"}
+
+
+def test_journal_undo_restores_the_previous_date(client, photo_dir):
+    response = client.post(
+        "/api/update_metadata",
+        json={"image_path": "a.jpg", "new_date": "2010:10:10"},
+    )
+    assert response.status_code == 200
+    path = str(photo_dir / "a.jpg")
+    assert read_exif_dates(path)["original"] == "2010:10:10 00:00:00"
+
+    entries = client.get("/api/journal?file=a.jpg").get_json()["entries"]
+    assert [entry["action"] for entry in entries] == ["change"]
+
+    response = client.post("/api/journal/undo", json={"file": "a.jpg"})
+    assert response.status_code == 200
+    assert len(response.get_json()["restored"]) == 1
+    assert read_exif_dates(path)["original"] == ORIGINAL_DATE
+
+    assert client.post("/api/journal/undo", json={}).status_code == 400
+    assert client.post("/api/journal/redo", json={"file": "a.jpg"}).status_code == 404
+
+
+def test_contact_sheet_manifest_and_image(client):
+    response = client.get("/api/contact_sheet?cell=64&columns=2")
+    assert response.status_code == 200
+    manifest = response.get_json()
+    assert manifest["total"] == 3
+    assert [cell["filename"] for cell in manifest["photos"]] == [
+        "a.jpg",
+        "a_copy.jpg",
+        "c.png",
+    ]
+    assert (manifest["width"], manifest["height"]) == (128, 128)
+
+    response = client.get(manifest["image"], headers={"Accept": "image/jpeg"})
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.data)) as sheet:
+        assert sheet.size == (128, 128)
+    etag = response.headers["ETag"]
+    response = client.get(
+        manifest["image"], headers={"Accept": "image/jpeg", "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    assert client.get("/api/contact_sheet?cell=1").status_code == 400
+    # 200 rows of 160 pixels are taller than an image can be
+    too_tall = "columns=1&per_page=200&cell=160"
+    assert client.get(f"/api/contact_sheet?{too_tall}").status_code == 400
+    assert client.get(f"/api/contact_sheet/image?{too_tall}").status_code == 400
+    assert client.get("/api/contact_sheet/image?page=5").status_code == 404
+
+
+def test_deep_zoom_descriptor_and_tiles(client):
+    response = client.get("/tiles/a.jpg.dzi")
+    assert response.status_code == 200
+    assert 'Width="600" Height="400"' in response.data.decode()
+    etag = response.headers["ETag"]
+    assert (
+        client.get("/tiles/a.jpg.dzi", headers={"If-None-Match": etag}).status_code
+        == 304
+    )
+
+    # Level 10 is the full 600x400 image: 3x2 tiles
+    response = client.get("/tiles/a.jpg_files/10/2_1.jpg")
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.data)) as tile:
+        assert tile.size == (600 - 2 * 254 + 1, 400 - 254 + 1)
+    assert client.get("/tiles/a_copy.jpg_files/0/0_0.jpg").status_code == 200
+
+    assert client.get("/tiles/a.jpg_files/10/3_0.jpg").status_code == 404
+    assert client.get("/tiles/a.jpg_files/11/0_0.jpg").status_code == 404
+    assert client.get("/tiles/missing.jpg.dzi").status_code == 404
+
+
+def test_tile_pruned_before_sending_is_rendered_again(client, monkeypatch):
+    tile_cache = app_module.app.config["TILE_CACHE"]
+    real_get_tile = tile_cache.get_tile
+    calls = []
+
+    def get_tile_then_prune(*args):
+        path = real_get_tile(*args)
+        calls.append(path)
+        if len(calls) == 1:
+            # As if another photo's tiles pushed this pyramid out meanwhile
+            tile_cache.wait()
+            shutil.rmtree(os.path.dirname(os.path.dirname(path)))
+        return path
+
+    monkeypatch.setattr(tile_cache, "get_tile", get_tile_then_prune)
+    response = client.get("/tiles/a.jpg_files/10/0_0.jpg")
+    assert response.status_code == 200
+    assert len(calls) == 2
+    tile_cache.wait()
+
+
+def test_duplicates_are_found_and_dated_together(client, photo_dir):
+    deadline = time.monotonic() + 30
+    while True:
+        response = client.get("/api/duplicates?image_path=a.jpg")
+        assert response.status_code == 200
+        result = response.get_json()
+        if result["ready"] and result["hashed"] == result["total"]:
+            break
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert result["duplicates"] == [{"filename": "a_copy.jpg", "distance": 0}]
+
+    response = client.post(
+        "/api/update_metadata_batch",
+        json={
+            "image_paths": ["a.jpg", "a_copy.jpg", "missing.jpg"],
+            "new_date": "2011:11:11",
+        },
+    )
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result["updated"] == 2
+    assert [entry["success"] for entry in result["results"]] == [True, True, False]
+    for name in ("a.jpg", "a_copy.jpg"):
+        assert read_exif_dates(str(photo_dir / name))["original"] == (
+            "2011:11:11 00:00:00"
+        )
+
+
+def test_open_event_streams_are_capped(client, photo_dir, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "WATCH_DIRECTORY", True)
+    monkeypatch.setitem(
+        app_module.app.config, "EVENT_STREAMS", threading.BoundedSemaphore(1)
+    )
+    try:
+        version = client.get("/api/photos").get_json()["version"]
+        url = f"/api/photos/events?since={version}"
+        stream = client.get(url, buffered=False)
+        assert stream.status_code == 200
+        assert next(iter(stream.response)).startswith(b"retry:")
+
+        refused = client.get(url, buffered=False)
+        assert refused.status_code == 503
+        assert refused.headers["Retry-After"]
+
+        # Closing a stream frees its slot
+        stream.close()
+        stream = client.get(url, buffered=False)
+        assert stream.status_code == 200
+        stream.close()
+    finally:
+        get_watcher(str(photo_dir)).stop()
+
+
+def test_local_url_uses_the_bound_address():
+    assert app_module.local_url("0.0.0.0", 5000) == "http://127.0.0.1:5000"
+    assert app_module.local_url("::", 5000) == "http://127.0.0.1:5000"
+    assert app_module.local_url("192.168.1.5", 80) == "http://192.168.1.5:80"
+    assert app_module.local_url("fe80::1", 80) == "http://[fe80::1]:80"
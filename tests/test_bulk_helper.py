@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.bulk_helper import apply_dates, load_date_rows
+from PhotoTimeSleuth.Helpers.exif_helper import read_image_date
+from PhotoTimeSleuth.Helpers.journal_helper import ChangeJournal
+
+
+def test_load_date_rows(tmp_path):
+    csv_path = tmp_path / "dates.csv"
+    csv_path.write_text(
+        "filename,date,time\n"
+        "a.jpg,2001-02-03,\n"
+        "b.jpg,2001:02:04,7:05\n"
+        "a.jpg,2001-02-05\n"
+        "c.jpg,2001-02-30\n"
+        "../d.jpg,2001-02-03\n"
+        "e.jpg\n",
+        encoding="utf-8",
+    )
+    rows, errors = load_date_rows(str(csv_path))
+    assert rows == [
+        ("a.jpg", "2001:02:03", "00:00:00"),
+        ("b.jpg", "2001:02:04", "07:05:00"),
+    ]
+    assert [(line, name) for line, name, _ in errors] == [
+        (4, "a.jpg"),
+        (5, "c.jpg"),
+        (6, "../d.jpg"),
+        (7, "e.jpg"),
+    ]
+
+
+def test_apply_dates_resumes_and_journals(tmp_path):
+    for name in ("a.jpg", "b.jpg"):
+        Image.new("RGB", (32, 24)).save(tmp_path / name, format="JPEG")
+    rows = [
+        ("a.jpg", "2001:02:03", "04:05:06"),
+        ("b.jpg", "2001:02:04", "00:00:00"),
+        ("missing.jpg", "2001:02:05", "00:00:00"),
+    ]
+    state_path = str(tmp_path / "state.jsonl")
+
+    dry = apply_dates(rows, str(tmp_path), workers=1, dry_run=True)
+    assert dry["changed"] == 2
+    assert read_image_date(str(tmp_path / "a.jpg")) is None
+
+    journal = ChangeJournal(str(tmp_path / "journal" / "changes.jsonl"))
+    summary = apply_dates(
+        rows[:1], str(tmp_path), workers=1, state_path=state_path, journal=journal
+    )
+    assert summary["changed"] == 1
+    assert read_image_date(str(tmp_path / "a.jpg")) == "2001:02:03 04:05:06"
+    assert [entry["new"] for entry in journal.entries()] == ["2001:02:03 04:05:06"]
+    journal.close()
+
+    summary = apply_dates(
+        rows, str(tmp_path), workers=1, state_path=state_path, resume=True
+    )
+    assert (summary["changed"], summary["skipped"], summary["failed"]) == (1, 1, 1)
+    assert summary["errors"][0][0] == "missing.jpg"
+    with open(state_path, encoding="utf-8") as f:
+        assert [json.loads(line)["file"] for line in f] == ["a.jpg", "b.jpg"]
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import piexif
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.catalog_helper import PhotoCatalog
+
+
+def make_photo(path, date=None):
+    exif = {"0th": {}, "Exif": {}}
+    if date:
+        exif["Exif"][piexif.ExifIFD.DateTimeOriginal] = date.encode("utf-8")
+    Image.new("RGB", (40, 30)).save(path, format="JPEG", exif=piexif.dump(exif))
+
+
+def test_refresh_is_incremental(tmp_path):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    make_photo(photos / "a.jpg", "2001:01:01 00:00:00")
+    make_photo(photos / "b.jpg")
+    (photos / "notes.txt").write_text("not a photo")
+    catalog = PhotoCatalog(str(photos), str(tmp_path / "catalog.sqlite"))
+
+    assert catalog.refresh() == (2, 0, 0)
+    assert catalog.refresh() == (0, 0, 0)
+
+    make_photo(photos / "b.jpg", "1999:05:05 00:00:00")
+    os.utime(photos / "b.jpg", ns=(1, 1))
+    os.remove(photos / "a.jpg")
+    assert catalog.refresh() == (0, 1, 1)
+
+    total, items = catalog.query()
+    assert total == 1
+    assert items[0]["filename"] == "b.jpg"
+    assert items[0]["date"] == "1999:05:05 00:00:00"
+    assert (items[0]["width"], items[0]["height"]) == (40, 30)
+
+
+def test_query_sort_filter_and_paginate(tmp_path):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    make_photo(photos / "a.jpg", "2005:01:01 00:00:00")
+    make_photo(photos / "b.jpg")
+    make_photo(photos / "c.jpg", "1990:01:01 00:00:00")
+    catalog = PhotoCatalog(str(photos), str(tmp_path / "catalog.sqlite"))
+    catalog.refresh()
+
+    _, items = catalog.query(sort="date")
+    assert [item["filename"] for item in items] == ["c.jpg", "a.jpg", "b.jpg"]
+
+    total, items = catalog.query(undated=True)
+    assert total == 1 and items[0]["filename"] == "b.jpg"
+
+    total, items = catalog.query(offset=1, limit=1)
+    assert total == 3 and [item["filename"] for item in items] == ["b.jpg"]
+
+    catalog.mark_corrected("b.jpg")
+    catalog.refresh()
+    assert catalog.query(offset=1, limit=1)[1][0]["corrected"]
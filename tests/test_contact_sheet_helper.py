@@ -0,0 +1,89 @@
+import io
+import os
+import sys
+
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers import contact_sheet_helper
+from PhotoTimeSleuth.Helpers.contact_sheet_helper import (
+    get_contact_sheet,
+    render_contact_sheet,
+    sheet_layout,
+    sheet_version,
+)
+from PhotoTimeSleuth.Helpers.thumbnail_helper import FORMAT_WEBP, ThumbnailCache
+
+COLORS = [(200, 0, 0), (0, 200, 0), (0, 0, 200)]
+
+
+def _make_photos(directory):
+    names = []
+    for i, color in enumerate(COLORS):
+        name = f"p{i}.jpg"
+        Image.new("RGB", (400, 300), color).save(directory / name)
+        names.append(name)
+    return names
+
+
+def test_sheet_layout_places_cells_row_by_row():
+    width, height, cells = sheet_layout(["a", "b", "c"], cell=50, columns=2)
+    assert (width, height) == (100, 100)
+    assert [(c["x"], c["y"]) for c in cells] == [(0, 0), (50, 0), (0, 50)]
+    assert all(c["width"] == c["height"] == 50 for c in cells)
+    # Fewer photos than columns shrink the sheet
+    assert sheet_layout(["a"], cell=50, columns=10)[:2] == (50, 50)
+
+
+def test_render_contact_sheet_centers_thumbnails(tmp_path):
+    names = _make_photos(tmp_path)
+    (tmp_path / "broken.jpg").write_bytes(b"not a jpeg")
+    data = render_contact_sheet(str(tmp_path), names + ["broken.jpg"], 64, 2)
+    sheet = Image.open(io.BytesIO(data)).convert("RGB")
+    assert sheet.size == (128, 128)
+    _, _, cells = sheet_layout(names, 64, 2)
+    for cell, color in zip(cells, COLORS):
+        center = sheet.getpixel((cell["x"] + 32, cell["y"] + 32))
+        assert all(abs(a - b) < 30 for a, b in zip(center, color))
+    # 4:3 photos leave a bar above and below in square cells
+    assert sum(sheet.getpixel((32, 3))) < 120
+    # The unreadable photo leaves its cell empty
+    assert sum(sheet.getpixel((96, 96))) < 120
+
+
+def test_sheets_are_cached_until_a_photo_changes(tmp_path, monkeypatch):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    names = _make_photos(photos)
+    cache = ThumbnailCache(str(tmp_path / "cache"))
+    renders = []
+    real_render = contact_sheet_helper.render_contact_sheet
+
+    def counting_render(*args):
+        renders.append(args)
+        return real_render(*args)
+
+    monkeypatch.setattr(contact_sheet_helper, "render_contact_sheet", counting_render)
+
+    version = sheet_version(str(photos), names, 64, 3)
+    data, cached = get_contact_sheet(str(photos), names, 64, 3, cache, FORMAT_WEBP)
+    assert not cached and Image.open(io.BytesIO(data)).format == "WEBP"
+    assert get_contact_sheet(str(photos), names, 64, 3, cache, FORMAT_WEBP) == (
+        data,
+        True,
+    )
+    assert len(renders) == 1
+
+    # Files coming and going next to the photos (e.g. journal sidecars) only
+    # change the directory, not the sheet
+    (photos / "a.jpg.ptsjournal").write_bytes(b"")
+    os.remove(photos / "a.jpg.ptsjournal")
+    os.utime(photos, ns=(1, 1))
+    assert get_contact_sheet(str(photos), names, 64, 3, cache, FORMAT_WEBP)[1]
+    assert len(renders) == 1
+
+    Image.new("RGB", (400, 300), (9, 9, 9)).save(photos / names[1])
+    os.utime(photos / names[1], ns=(1, 1))
+    assert sheet_version(str(photos), names, 64, 3) != version
+    assert not get_contact_sheet(str(photos), names, 64, 3, cache, FORMAT_WEBP)[1]
+    assert len(renders) == 2
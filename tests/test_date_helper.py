@@ -2,7 +2,7 @@ import os
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from PhotoTimeSleuth.Helpers.date_helper import calculate_date
+from PhotoTimeSleuth.Helpers.date_helper import calculate_date, calculate_dates
 
 
 def test_calculate_date_birthday():
@@ -15,3 +15,20 @@ def test_calculate_date_christmas():
 
 def test_calculate_date_invalid_bday():
     assert calculate_date("not-a-date", 2, "summer") is None
+
+
+def test_calculate_dates_matches_scalar():
+    bdays = ["2000-05-10", "2010-06-15", "1950-02-28", "not-a-date"]
+    seasons = ["spring", "summer", "fall", "winter", "birthday", "christmas"]
+    for bday in bdays:
+        for season in seasons:
+            ages = list(range(15))
+            expected = [calculate_date(bday, age, season) for age in ages]
+            assert calculate_dates(bday, ages, season) == expected
+
+
+def test_calculate_dates_invalid_season():
+    assert calculate_dates("2000-05-10", [1, 2], ["summer", "monsoon"]) == [
+        "2001-06-01",
+        None,
+    ]
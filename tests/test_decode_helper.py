@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.decode_helper import (
+    DECODE_BUDGET,
+    DecodeBudget,
+    ImageTooLarge,
+    decode_bytes,
+)
+from PhotoTimeSleuth.Helpers.thumbnail_helper import load_thumbnail
+
+
+def test_decode_bytes_counts_source_and_intermediate():
+    assert decode_bytes((1000, 500), (100, 50), "RGB") == 4 * 500 * 1100
+    assert decode_bytes((1000, 500), (100, 50), "L") == 500 * 1100
+
+
+def test_budget_serializes_decodes_that_do_not_fit_together():
+    budget = DecodeBudget(max_bytes=4 * 100 * 150)
+    inside = []
+    overlap = []
+
+    def decode():
+        with budget.reserve((100, 100), (50, 50), "RGB"):
+            inside.append(1)
+            overlap.append(len(inside))
+            time.sleep(0.05)
+            inside.pop()
+
+    threads = [threading.Thread(target=decode) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(overlap) == 1
+    assert budget.waits >= 1
+    assert budget.in_use == 0
+    assert budget.peak == decode_bytes((100, 100), (50, 50), "RGB")
+
+
+def test_budget_runs_oversized_decode_alone_and_enforces_pixel_limit():
+    budget = DecodeBudget(max_bytes=1, max_pixels=10_000)
+    with budget.reserve((100, 100), (10, 10), "L") as cost:
+        assert cost > budget.max_bytes
+    with pytest.raises(ImageTooLarge), budget.reserve((101, 100), (10, 10), "L"):
+        pass
+    assert budget.in_use == 0
+
+
+def test_pixel_limit_applies_to_the_reduced_decode(tmp_path):
+    Image.new("RGB", (800, 800)).save(tmp_path / "a.jpg")
+    Image.new("RGB", (800, 800)).save(tmp_path / "a.png")
+    max_pixels = DECODE_BUDGET.max_pixels
+    DECODE_BUDGET.configure(max_pixels=200 * 200)
+    try:
+        # Draft mode decodes the JPEG at 1/8 scale, under the limit
+        thumb, _ = load_thumbnail(str(tmp_path / "a.jpg"), 50, 50)
+        assert thumb.size == (50, 50)
+        with pytest.raises(ImageTooLarge):
+            load_thumbnail(str(tmp_path / "a.png"), 50, 50)
+    finally:
+        DECODE_BUDGET.configure(max_pixels=max_pixels)
+    assert DECODE_BUDGET.in_use == 0
@@ -0,0 +1,44 @@
+import os
+import shutil
+import sys
+
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.estimate_cache_helper import EstimateCache, content_hash
+from PhotoTimeSleuth.Helpers.image_helper import change_image_date
+
+
+def make_photo(path, color=(10, 20, 30)):
+    Image.new("RGB", (64, 48), color).save(path, format="JPEG")
+    return str(path)
+
+
+def test_content_hash_ignores_metadata(tmp_path):
+    path = make_photo(tmp_path / "a.jpg")
+    before = content_hash(path)
+    success, _ = change_image_date(path, "2010:10:10")
+    assert success
+    assert content_hash(path) == before
+    assert content_hash(make_photo(tmp_path / "b.jpg", (0, 0, 0))) != before
+
+
+def test_cache_shared_between_copies(tmp_path):
+    cache = EstimateCache(str(tmp_path / "cache.sqlite"))
+    path = make_photo(tmp_path / "a.jpg")
+    copy_dir = tmp_path / "other"
+    copy_dir.mkdir()
+    copy = str(copy_dir / "a.jpg")
+    shutil.copyfile(path, copy)
+
+    assert cache.get(path, "gpt-4o", 1) is None
+    cache.put(path, "gpt-4o", 1, "1999-05-01")
+    assert cache.get(copy, "gpt-4o", 1) == "1999-05-01"
+    assert cache.get(copy, "gpt-4o", 2) is None
+    assert cache.stats() == {"hits": 1, "misses": 2}
+
+    reopened = EstimateCache(cache.db_path)
+    total, entries = reopened.entries()
+    assert total == 1
+    assert entries[0]["estimated_date"] == "1999-05-01"
+    assert entries[0]["image_path"] == os.path.abspath(path)
@@ -0,0 +1,166 @@
+import io
+import json
+import os
+import struct
+import sys
+
+import piexif
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers import exif_helper
+from PhotoTimeSleuth.Helpers.exif_helper import (
+    PATCH_ATOMIC,
+    PATCH_DIRECT,
+    PATCH_JOURNAL,
+    get_image_dates,
+    locate_date_tags,
+    patch_image_date,
+    read_exif_dates,
+    read_image_date,
+    recover_patch_journal,
+)
+from PhotoTimeSleuth.Helpers.image_helper import change_image_date, get_image_date
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def jpeg_with_segments(*segments):
+    img_io = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(img_io, format="JPEG")
+    data = img_io.getvalue()
+    return data[:2] + b"".join(segments) + data[2:]
+
+
+def app1(payload):
+    return b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+
+DATE = b"2001:02:03 04:05:06"
+
+CORPUS = {
+    "all_tags": jpeg_with_segments(
+        app1(
+            piexif.dump(
+                {
+                    "0th": {piexif.ImageIFD.DateTime: b"2003:03:03 03:03:03"},
+                    "Exif": {
+                        piexif.ExifIFD.DateTimeOriginal: DATE,
+                        piexif.ExifIFD.DateTimeDigitized: b"2002:02:02 02:02:02",
+                    },
+                }
+            )
+        )
+    ),
+    "image_tag_only": jpeg_with_segments(
+        app1(piexif.dump({"0th": {piexif.ImageIFD.DateTime: DATE}}))
+    ),
+    "xmp_before_exif": jpeg_with_segments(
+        app1(b"http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta/>"),
+        app1(piexif.dump({"Exif": {piexif.ExifIFD.DateTimeOriginal: DATE}})),
+    ),
+    "no_exif": jpeg_with_segments(),
+    "empty_exif": jpeg_with_segments(app1(piexif.dump({}))),
+    "truncated_ifd": jpeg_with_segments(
+        app1(b"Exif\x00\x00MM\x00\x2a\x00\x00\x00\x08\x00")
+    ),
+    "bad_tiff_header": jpeg_with_segments(app1(b"Exif\x00\x00XX\x00\x2a\x00\x00")),
+    "truncated_file": b"\xff\xd8\xff\xe1\x00",
+}
+
+
+def write_corpus(directory):
+    paths = {}
+    for name, data in CORPUS.items():
+        path = directory / f"{name}.jpg"
+        path.write_bytes(data)
+        paths[name] = str(path)
+    png = directory / "photo.png"
+    Image.new("RGB", (16, 16)).save(png)
+    paths["png"] = str(png)
+
+    pillow_exif = Image.Exif()
+    pillow_exif[piexif.ImageIFD.DateTime] = DATE.decode()  # Little-endian TIFF
+    pillow = directory / "pillow.jpg"
+    Image.new("RGB", (16, 16)).save(pillow, format="JPEG", exif=pillow_exif)
+    paths["pillow"] = str(pillow)
+    return paths
+
+
+@pytest.mark.parametrize("name", list(CORPUS) + ["png", "pillow"])
+def test_read_image_date_matches_piexif(tmp_path, name):
+    path = write_corpus(tmp_path)[name]
+    assert read_image_date(path) == get_image_date(path)
+
+
+def test_read_exif_dates_values(tmp_path):
+    paths = write_corpus(tmp_path)
+    assert read_exif_dates(paths["all_tags"]) == get_image_dates(paths["all_tags"])
+    assert read_exif_dates(paths["no_exif"]) == {
+        "original": None,
+        "digitized": None,
+        "image": None,
+    }
+    assert read_exif_dates(paths["pillow"])["image"] == DATE.decode()
+    with pytest.raises(ValueError):
+        read_exif_dates(paths["truncated_ifd"])
+
+
+def test_read_exif_dates_beyond_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(exif_helper, "PREFIX_BYTES", 16)
+    paths = write_corpus(tmp_path)
+    assert read_exif_dates(paths["all_tags"]) == get_image_dates(paths["all_tags"])
+
+
+NEW_DATE = "2010:10:10 10:10:10"
+
+
+def test_patch_image_date_in_place(tmp_path):
+    path = write_corpus(tmp_path)["all_tags"]
+    before = read_bytes(path)
+
+    for mode in (PATCH_JOURNAL, PATCH_ATOMIC, PATCH_DIRECT):
+        old_dates = patch_image_date(path, NEW_DATE, mode)
+        assert old_dates["digitized"] in ("2002:02:02 02:02:02", NEW_DATE)
+        assert get_image_dates(path) == {
+            "original": NEW_DATE,
+            "digitized": NEW_DATE,
+            "image": NEW_DATE,
+        }
+
+    after = read_bytes(path)
+    assert len(after) == len(before)
+    assert sum(a != b for a, b in zip(before, after)) <= 3 * len(NEW_DATE)
+    assert not os.path.exists(path + ".ptsjournal")
+
+
+def test_patch_image_date_needs_existing_tags(tmp_path):
+    path = write_corpus(tmp_path)["image_tag_only"]
+    before = read_bytes(path)
+    assert patch_image_date(path, NEW_DATE) is None
+    assert read_bytes(path) == before
+
+
+def test_recover_patch_journal(tmp_path):
+    path = write_corpus(tmp_path)["all_tags"]
+    with open(path, "rb") as f:
+        segment = locate_date_tags(f)
+    offset = segment.tags[exif_helper.DATE_TIME].offset
+    with open(path + ".ptsjournal", "w", encoding="utf-8") as f:
+        json.dump({"patches": [(offset, (NEW_DATE.encode() + b"\x00").hex())]}, f)
+
+    assert recover_patch_journal(path)
+    assert get_image_dates(path)["image"] == NEW_DATE
+    assert not recover_patch_journal(path)
+
+
+def test_change_image_date_falls_back_to_rewrite(tmp_path):
+    paths = write_corpus(tmp_path)
+    for name in ("all_tags", "image_tag_only", "no_exif"):
+        success, _ = change_image_date(paths[name], "2010:10:10")
+        assert success
+        assert get_image_date(paths[name]) == "2010:10:10 00:00:00"
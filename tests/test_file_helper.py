@@ -3,7 +3,12 @@ import sys
 import pytest
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from PhotoTimeSleuth.Helpers.file_helper import load_names_and_bdays, FormatError
+from PhotoTimeSleuth.Helpers import file_helper
+from PhotoTimeSleuth.Helpers.file_helper import (
+    BirthdayRegistry,
+    FormatError,
+    load_names_and_bdays,
+)
 
 
 def test_load_names_and_bdays_basic(tmp_path):
@@ -29,3 +34,31 @@ def test_load_names_and_bdays_invalid_year(tmp_path):
     file_path.write_text("John\t1800-01-01\n")
     with pytest.raises(FormatError):
         load_names_and_bdays(str(file_path))
+
+
+def test_birthday_registry_lookup_and_reload(tmp_path):
+    file_path = tmp_path / "bdays.txt"
+    file_path.write_text("John\t2000-01-01\nJohn\t1990-01-01\n")
+    registry = BirthdayRegistry(str(file_path))
+    assert registry.get("John") == {"name": "John", "bday": "2000-01-01"}
+    assert registry.get("Nobody") is None
+
+    file_path.write_text("Jane\t1999-12-31\n")
+    os.utime(file_path, ns=(1, 1))
+    assert registry.people() == [{"name": "Jane", "bday": "1999-12-31"}]
+
+
+def test_birthday_registry_caches_errors(tmp_path, monkeypatch):
+    file_path = tmp_path / "bdays.txt"
+    file_path.write_text("John 2000-01-01\n")
+    registry = BirthdayRegistry(str(file_path))
+    with pytest.raises(FormatError):
+        registry.people()
+
+    calls = []
+    monkeypatch.setattr(
+        file_helper, "load_names_and_bdays", lambda path: calls.append(path)
+    )
+    with pytest.raises(FormatError):
+        registry.get("John")
+    assert calls == []
@@ -0,0 +1,33 @@
+import os
+import sys
+
+from PIL import Image
+from werkzeug.datastructures import MIMEAccept
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.http_helper import negotiate_image_format, photo_etag
+from PhotoTimeSleuth.Helpers.image_helper import change_image_date
+from PhotoTimeSleuth.Helpers.thumbnail_helper import FORMAT_JPEG, FORMAT_WEBP
+
+
+def test_etag_depends_on_variant_and_date_rewrites(tmp_path):
+    path = str(tmp_path / "a.jpg")
+    Image.new("RGB", (64, 48)).save(path, format="JPEG")
+    stat = os.stat(path)
+
+    assert photo_etag(stat) == photo_etag(os.stat(path))
+    assert photo_etag(stat, 800, 0) != photo_etag(stat)
+    assert photo_etag(stat, 800, 0) != photo_etag(stat, 400, 0)
+
+    assert change_image_date(path, "2010:10:10")[0]
+    # The first rewrite builds the EXIF block, the second patches it in place
+    assert change_image_date(path, "2011:11:11")[0]
+    assert photo_etag(os.stat(path), 800, 0) != photo_etag(stat, 800, 0)
+
+
+def test_negotiate_image_format():
+    browser = MIMEAccept([("image/webp", 1), ("image/*", 0.8), ("*/*", 0.5)])
+    assert negotiate_image_format(browser) == FORMAT_WEBP
+    assert negotiate_image_format(browser, webp_available=False) == FORMAT_JPEG
+    assert negotiate_image_format(MIMEAccept([("*/*", 1)])) == FORMAT_JPEG
+    assert negotiate_image_format(MIMEAccept([("image/webp", 0)])) == FORMAT_JPEG
@@ -0,0 +1,91 @@
+import json
+import os
+import sys
+
+import piexif
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.exif_helper import read_exif_dates
+from PhotoTimeSleuth.Helpers.image_helper import change_image_date
+from PhotoTimeSleuth.Helpers.journal_helper import ChangeJournal
+
+
+def make_photo(path, original=None, image=None):
+    exif = {"0th": {}, "Exif": {}}
+    if original:
+        exif["Exif"][piexif.ExifIFD.DateTimeOriginal] = original
+    if image:
+        exif["0th"][piexif.ImageIFD.DateTime] = image
+    Image.new("RGB", (32, 24)).save(path, format="JPEG", exif=piexif.dump(exif))
+    return str(path)
+
+
+def test_records_old_dates_and_undoes_session(tmp_path):
+    journal = ChangeJournal(str(tmp_path / "changes.jsonl"))
+    a = make_photo(tmp_path / "a.jpg", "1999:01:02 03:04:05", "2005:06:07 08:09:10")
+    b = make_photo(tmp_path / "b.jpg")
+
+    for path, date in ((a, "2001:01:01"), (a, "2002:02:02"), (b, "2003:03:03")):
+        assert change_image_date(path, date, journal=journal)[0]
+
+    entries = journal.entries(a)
+    assert [entry["new"] for entry in entries] == [
+        "2001:01:01 00:00:00",
+        "2002:02:02 00:00:00",
+    ]
+    assert entries[0]["old"] == {
+        "original": "1999:01:02 03:04:05",
+        "digitized": None,
+        "image": "2005:06:07 08:09:10",
+    }
+
+    results = journal.undo(session=journal.session)
+    assert not results["failed"]
+    # Each file gets the dates from before its first change back
+    assert read_exif_dates(a) == entries[0]["old"]
+    assert read_exif_dates(b) == dict.fromkeys(("original", "digitized", "image"))
+
+    journal.replay(image_path=a, session=journal.session)
+    assert read_exif_dates(a)["original"] == "2002:02:02 00:00:00"
+    assert [entry["action"] for entry in journal.entries(a)][-2:] == [
+        "undo",
+        "replay",
+    ]
+    journal.close()
+
+
+def test_rotation_keeps_all_records_readable(tmp_path):
+    journal = ChangeJournal(str(tmp_path / "changes.jsonl"), max_bytes=600)
+    path = str(tmp_path / "a.jpg")
+    for i in range(10):
+        journal.record(path, {"original": None}, f"2000:01:{i + 1:02d} 00:00:00")
+    journal.flush()
+
+    assert os.path.isfile(journal.path + ".1")
+    assert [entry["new"][8:10] for entry in journal.entries()] == [
+        f"{i + 1:02d}" for i in range(10)
+    ]
+    with open(journal.path, encoding="utf-8") as f:
+        assert all(json.loads(line)["session"] == journal.session for line in f)
+    journal.close()
+
+
+def test_restores_record_the_dates_the_file_actually_had(tmp_path):
+    journal = ChangeJournal(str(tmp_path / "changes.jsonl"))
+    path = make_photo(tmp_path / "a.jpg", "1999:01:02 03:04:05")
+    assert change_image_date(path, "2001:01:01", journal=journal)[0]
+    # Changed outside the journal after the journaled write
+    assert change_image_date(path, "2002:02:02")[0]
+
+    journal.undo(image_path=path)
+    undo = journal.entries(path)[-1]
+    assert undo["action"] == "undo"
+    assert undo["old"]["original"] == "2002:02:02 00:00:00"
+    assert undo["new"]["original"] == "1999:01:02 03:04:05"
+
+    journal.replay(image_path=path)
+    replay = journal.entries(path)[-1]
+    assert replay["old"]["original"] == "1999:01:02 03:04:05"
+    assert read_exif_dates(path)["original"] == "2001:01:01 00:00:00"
+    journal.close()
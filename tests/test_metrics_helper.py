@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.metrics_helper import Metrics, peak_rss_bytes
+
+
+def test_render_prometheus_histograms():
+    metrics = Metrics(buckets=(0.01, 0.1))
+    metrics.observe_request("/photos/<path:filename>", "GET", 200, 0.005)
+    metrics.observe_request("/photos/<path:filename>", "GET", 200, 0.01)
+    metrics.observe_request("/photos/<path:filename>", "GET", 500, 0.5)
+    metrics.set_gauge("startup_seconds", "Startup time.", lambda: 0.25)
+
+    lines = metrics.render().splitlines()
+    labels = 'route="/photos/<path:filename>",method="GET"'
+    name = "phototimesleuth_request_duration_seconds"
+    assert f'{name}_bucket{{{labels},le="0.01"}} 2' in lines
+    assert f'{name}_bucket{{{labels},le="0.1"}} 2' in lines
+    assert f'{name}_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f"{name}_count{{{labels}}} 3" in lines
+    assert f'phototimesleuth_requests_total{{{labels},status="500"}} 1' in lines
+    assert "phototimesleuth_startup_seconds 0.25" in lines
+
+
+def test_timed_records_failures():
+    metrics = Metrics()
+    with pytest.raises(ValueError), metrics.timed("exif_read"):
+        raise ValueError("broken")
+    assert 'phototimesleuth_phase_duration_seconds_count{phase="exif_read"} 1' in (
+        metrics.render().splitlines()
+    )
+
+
+def test_peak_rss_bytes_covers_current_memory():
+    import psutil
+
+    block = b"\x01" * (64 * 1024 * 1024)  # Touched, so it is resident
+    rss = psutil.Process().memory_info().rss
+    assert peak_rss_bytes() >= rss >= len(block)
@@ -0,0 +1,128 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers import phash_helper
+from PhotoTimeSleuth.Helpers.image_helper import change_image_date
+from PhotoTimeSleuth.Helpers.phash_helper import (
+    DuplicateIndex,
+    dhash,
+    hamming_distances,
+)
+
+
+def _scene(seed, size=(320, 240)):
+    """Draw a picture with structure a difference hash can tell apart."""
+    rng = np.random.default_rng(seed)
+    img = Image.new("RGB", size, tuple(int(c) for c in rng.integers(0, 255, 3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x0, y0 = rng.integers(0, size[0]), rng.integers(0, size[1])
+        x1, y1 = x0 + rng.integers(20, 160), y0 + rng.integers(20, 120)
+        draw.rectangle(
+            (x0, y0, x1, y1), fill=tuple(int(c) for c in rng.integers(0, 255, 3))
+        )
+    return img
+
+
+def test_hamming_distances_matches_bit_count():
+    hashes = np.array([0, 1, 0xFF, 2**64 - 1], dtype=np.uint64)
+    assert hamming_distances(hashes, 0).tolist() == [0, 1, 8, 64]
+    assert hamming_distances(hashes, 2**64 - 1).tolist() == [64, 63, 56, 0]
+
+
+def test_dhash_survives_resize_reencode_and_date_rewrite(tmp_path):
+    original = _scene(1)
+    original.save(tmp_path / "a.jpg", quality=95)
+    original.resize((160, 120)).save(tmp_path / "small.jpg", quality=60)
+    original.save(tmp_path / "a.png")
+    _scene(2).save(tmp_path / "other.jpg")
+
+    value = dhash(str(tmp_path / "a.jpg"))
+    assert 0 <= value < 2**64
+    for name in ("small.jpg", "a.png"):
+        assert bin(value ^ dhash(str(tmp_path / name))).count("1") <= 4
+    assert bin(value ^ dhash(str(tmp_path / "other.jpg"))).count("1") > 12
+
+    assert change_image_date(str(tmp_path / "a.jpg"), "2001:02:03")[0]
+    assert dhash(str(tmp_path / "a.jpg")) == value
+
+
+def test_index_finds_near_duplicates_and_persists(tmp_path, monkeypatch):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    _scene(1).save(photos / "a.jpg", quality=95)
+    _scene(1).resize((200, 150)).save(photos / "a_copy.jpg", quality=70)
+    _scene(2).save(photos / "b.jpg")
+    (photos / "broken.jpg").write_bytes(b"not a jpeg")
+    index_path = str(tmp_path / "index.npz")
+
+    index = DuplicateIndex(str(photos), index_path)
+    assert index.refresh() == (4, 0)
+    assert index.hashed == index.total == 4
+    assert len(index) == 3  # The unreadable file is left out
+    assert [name for name, _ in index.near_duplicates("a.jpg")] == ["a_copy.jpg"]
+    assert index.near_duplicates("b.jpg") == []
+    # Unchanged and unreadable files are not hashed again
+    assert index.refresh() == (0, 0)
+
+    # A new instance reuses the saved hashes and only retries the broken file
+    hashed = []
+    real_dhash = phash_helper.dhash
+
+    def counting_dhash(image_path):
+        hashed.append(os.path.basename(image_path))
+        return real_dhash(image_path)
+
+    monkeypatch.setattr(phash_helper, "dhash", counting_dhash)
+    reloaded = DuplicateIndex(str(photos), index_path)
+    assert reloaded.refresh() == (1, 0)
+    assert hashed == ["broken.jpg"]
+    assert reloaded.near_duplicates("a_copy.jpg") == index.near_duplicates("a_copy.jpg")
+
+    os.remove(photos / "a_copy.jpg")
+    assert reloaded.refresh() == (0, 1)
+    assert reloaded.near_duplicates("a.jpg") == []
+
+
+def test_flat_photos_are_not_hashed(tmp_path):
+    Image.new("RGB", (320, 240)).save(tmp_path / "black.jpg")
+    Image.new("RGB", (320, 240), (200, 0, 0)).save(tmp_path / "red.jpg")
+    Image.new("RGB", (160, 120), (200, 0, 0)).save(tmp_path / "red_small.jpg")
+    Image.new("RGB", (320, 240)).save(tmp_path / "black.png")
+    _scene(1).save(tmp_path / "a.jpg")
+    for name in ("black.jpg", "red.jpg", "black.png"):
+        assert dhash(str(tmp_path / name)) is None
+
+    index = DuplicateIndex(str(tmp_path))
+    assert index.refresh() == (5, 0)
+    assert len(index) == 1
+    assert index.near_duplicates("a.jpg") == []
+    with pytest.raises(KeyError):
+        index.near_duplicates("red.jpg")
+    # Skipped until they change
+    assert index.refresh() == (0, 0)
+
+
+def test_refresh_async_builds_in_background(tmp_path):
+    _scene(3).save(tmp_path / "a.jpg")
+    _scene(3).save(tmp_path / "b.jpg", quality=50)
+    index = DuplicateIndex(str(tmp_path))
+    assert index.refresh_async()
+    assert index.wait(timeout=30)
+    assert [name for name, _ in index.near_duplicates("a.jpg")] == ["b.jpg"]
+
+    # Listings of an unchanged directory do not scan it again
+    assert not index.refresh_async()
+    _scene(3).save(tmp_path / "c.jpg", quality=70)
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 1))
+    assert index.refresh_async()
+    assert index.wait(timeout=30)
+    assert sorted(name for name, _ in index.near_duplicates("a.jpg")) == [
+        "b.jpg",
+        "c.jpg",
+    ]
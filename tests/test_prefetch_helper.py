@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.prefetch_helper import Prefetcher
+from PhotoTimeSleuth.Helpers.thumbnail_helper import (
+    DEFAULT_QUALITY,
+    FORMAT_JPEG,
+    ThumbnailCache,
+)
+
+VARIANT = (50, 0, FORMAT_JPEG, DEFAULT_QUALITY)
+
+
+def make_photos(directory, count):
+    names = []
+    for i in range(count):
+        name = f"{i}.jpg"
+        Image.new("RGB", (200, 100)).save(directory / name, format="JPEG")
+        names.append(name)
+    return names
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_schedule_warms_neighbours(tmp_path):
+    names = make_photos(tmp_path, 6)
+    cache = ThumbnailCache(str(tmp_path / "cache"))
+    prefetcher = Prefetcher(cache, workers=2, lookahead=2)
+    try:
+        prefetcher.schedule(str(tmp_path), names, 0, width=50)
+        expected = [names[1], names[2], names[5]]
+        wait_for(
+            lambda: all(
+                cache.get(str(tmp_path / name), VARIANT) is not None
+                for name in expected
+            )
+        )
+        assert cache.get(str(tmp_path / names[3]), VARIANT) is None
+    finally:
+        prefetcher.shutdown()
+
+
+def test_cancel_skips_stale_work(tmp_path):
+    names = make_photos(tmp_path, 4)
+    cache = ThumbnailCache(str(tmp_path / "cache"))
+    prefetcher = Prefetcher(cache, workers=1, lookahead=3)
+    try:
+        prefetcher._executor.submit(time.sleep, 0.2)  # Keep the only worker busy
+        prefetcher.schedule(str(tmp_path), names, 0, width=50)
+        prefetcher.cancel()
+        prefetcher._executor.submit(lambda: None).result()
+        assert cache.total_bytes == 0
+    finally:
+        prefetcher.shutdown()
+
+
+def test_batches_of_other_keys_keep_running(tmp_path):
+    names = make_photos(tmp_path, 6)
+    cache = ThumbnailCache(str(tmp_path / "cache"))
+    prefetcher = Prefetcher(cache, workers=1, lookahead=1)
+    try:
+        prefetcher._executor.submit(time.sleep, 0.2)  # Keep the only worker busy
+        prefetcher.schedule(str(tmp_path), names, 0, width=50, key="alice")
+        prefetcher.schedule(str(tmp_path), names, 1, width=50, key="bob")
+        prefetcher.cancel("bob")
+        prefetcher._executor.submit(lambda: None).result()
+        # Only alice's batch (photos 1 and 5) was warmed
+        warmed = {
+            i
+            for i, name in enumerate(names)
+            if cache.get(str(tmp_path / name), VARIANT) is not None
+        }
+        assert warmed == {1, 5}
+    finally:
+        prefetcher.shutdown()
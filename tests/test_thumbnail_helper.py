@@ -0,0 +1,105 @@
+import io
+import os
+import sys
+
+import piexif
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.thumbnail_helper import (
+    DECODE_DRAFT,
+    DECODE_EXIF_THUMBNAIL,
+    DECODE_FULL,
+    FORMAT_WEBP,
+    ThumbnailCache,
+    render_thumbnail,
+)
+
+
+def make_photo(path, size=(400, 300)):
+    Image.new("RGB", size, (200, 100, 50)).save(path, format="JPEG")
+    return str(path)
+
+
+def test_render_thumbnail_keeps_aspect_ratio(tmp_path):
+    photo = make_photo(tmp_path / "a.jpg")
+    data, _ = render_thumbnail(photo, width=100)
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.size == (100, 75)
+
+
+def test_render_thumbnail_formats_and_quality(tmp_path):
+    photo = make_photo(tmp_path / "a.jpg")
+    data, _ = render_thumbnail(photo, width=100)
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.info.get("progressive")
+
+    data, _ = render_thumbnail(photo, width=100, fmt=FORMAT_WEBP)
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.format == "WEBP"
+
+    preview, _ = render_thumbnail(photo, width=100, quality="preview")
+    high, _ = render_thumbnail(photo, width=100, quality="high")
+    assert len(preview) < len(high)
+
+
+def test_render_thumbnail_decode_paths(tmp_path):
+    photo = make_photo(tmp_path / "a.jpg", size=(1600, 1200))
+    assert render_thumbnail(photo, width=100)[1] == DECODE_DRAFT
+    assert render_thumbnail(photo, width=1000)[1] == DECODE_FULL
+    assert render_thumbnail(photo, width=100, fast=False)[1] == DECODE_FULL
+
+    png = tmp_path / "a.png"
+    Image.new("RGBA", (400, 300)).save(png)
+    assert render_thumbnail(str(png), width=100)[1] == DECODE_FULL
+
+
+def test_render_thumbnail_uses_exif_thumbnail(tmp_path):
+    thumb_io = io.BytesIO()
+    Image.new("RGB", (160, 120)).save(thumb_io, format="JPEG")
+    exif = piexif.dump(
+        {
+            "0th": {piexif.ImageIFD.Orientation: 6},
+            "1st": {
+                piexif.ImageIFD.JPEGInterchangeFormat: 0,
+                piexif.ImageIFD.JPEGInterchangeFormatLength: 0,
+            },
+            "thumbnail": thumb_io.getvalue(),
+        }
+    )
+    photo = tmp_path / "a.jpg"
+    Image.new("RGB", (1600, 1200)).save(photo, format="JPEG", exif=exif)
+
+    data, decode_path = render_thumbnail(str(photo), width=90)
+    assert decode_path == DECODE_EXIF_THUMBNAIL
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.size == (90, 120)  # Rotated by the orientation tag
+
+
+def test_cache_round_trip_and_invalidate(tmp_path):
+    photo = make_photo(tmp_path / "a.jpg")
+    cache = ThumbnailCache(str(tmp_path / "cache"))
+    assert cache.get(photo, (100, 0)) is None
+    cache.put(photo, (100, 0), b"thumb")
+    assert cache.get(photo, (100, 0)) == b"thumb"
+    assert cache.get(photo, (200, 0)) is None
+
+    cache.invalidate(photo)
+    assert cache.get(photo, (100, 0)) is None
+    assert cache.total_bytes == 0
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    photos = [make_photo(tmp_path / f"{i}.jpg") for i in range(3)]
+    cache = ThumbnailCache(str(tmp_path / "cache"), max_bytes=20)
+    cache.put(photos[0], (1,), b"x" * 8)
+    cache.put(photos[1], (1,), b"x" * 8)
+    assert cache.get(photos[0], (1,)) is not None
+    cache.put(photos[2], (1,), b"x" * 8)
+
+    assert cache.get(photos[1], (1,)) is None
+    assert cache.get(photos[0], (1,)) is not None
+    assert cache.get(photos[2], (1,)) is not None
+
+    reloaded = ThumbnailCache(str(tmp_path / "cache"), max_bytes=20)
+    assert reloaded.total_bytes == 16
@@ -0,0 +1,140 @@
+import os
+import sys
+
+import numpy as np
+import piexif
+import pytest
+from PIL import Image, ImageOps
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.thumbnail_helper import ORIENTATION_TRANSPOSE
+from PhotoTimeSleuth.Helpers.tile_helper import (
+    TILE_OVERLAP,
+    TILE_SIZE,
+    TileCache,
+    dzi_descriptor,
+    image_geometry,
+    level_size,
+    max_level,
+    stored_box,
+    tile_box,
+    tile_grid,
+)
+
+
+def _noise(size):
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8))
+
+
+def test_level_geometry_follows_deep_zoom():
+    assert max_level(1000, 600) == 10
+    assert level_size(1000, 600, 10) == (1000, 600)
+    assert level_size(1000, 600, 9) == (500, 300)
+    assert level_size(1000, 600, 1) == (2, 2)
+    assert level_size(1000, 600, 0) == (1, 1)
+    assert tile_grid(1000, 600) == (4, 3)
+    # Inner edges overlap by one pixel, outer edges do not
+    assert tile_box(0, 0, 1000, 600) == (0, 0, TILE_SIZE + TILE_OVERLAP, 255)
+    assert tile_box(3, 2, 1000, 600) == (
+        3 * TILE_SIZE - 1,
+        2 * TILE_SIZE - 1,
+        1000,
+        600,
+    )
+    assert 'Width="1000" Height="600"' in dzi_descriptor(1000, 600)
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_stored_box_matches_transposing_the_whole_image(orientation):
+    stored = _noise((60, 40))
+    transpose = ORIENTATION_TRANSPOSE.get(orientation)
+    method = getattr(Image.Transpose, transpose) if transpose else None
+    display = stored.transpose(method) if method is not None else stored
+    box = (5, 7, 23, 31)
+    tile = stored.crop(stored_box(box, orientation, display.size))
+    if method is not None:
+        tile = tile.transpose(method)
+    assert tile.tobytes() == display.crop(box).tobytes()
+
+
+def test_tiles_are_rendered_per_level_in_display_orientation(tmp_path):
+    photo = str(tmp_path / "scan.jpg")
+    exif = piexif.dump({"0th": {piexif.ImageIFD.Orientation: 6}})
+    _noise((900, 500)).save(photo, quality=95, exif=exif)
+    assert image_geometry(photo) == (500, 900, 6)
+
+    cache = TileCache(str(tmp_path / "tiles"))
+    path = cache.get_tile(photo, 9, 0, 1)
+    assert cache.wait(timeout=30)
+    pyramid = os.path.join(cache.cache_dir, cache.pyramid_name(photo))
+    # Only the requested level and the levels below it exist
+    assert sorted(int(level) for level in os.listdir(pyramid)) == list(range(10))
+    with Image.open(path) as tile:
+        assert tile.size == (250, 450 - TILE_SIZE + 1)
+    with Image.open(cache.get_tile(photo, 0, 0, 0)) as tile:
+        assert tile.size == (1, 1)
+
+    # The full-size level is rendered on first use
+    path = cache.get_tile(photo, 10, 1, 3)
+    with Image.open(photo) as img, Image.open(path) as tile:
+        assert tile.size == (500 - TILE_SIZE + 1, 900 - 3 * TILE_SIZE + 1)
+        expected = ImageOps.exif_transpose(img).crop(tile_box(1, 3, 500, 900))
+        diff = np.abs(np.asarray(tile, np.int16) - np.asarray(expected, np.int16))
+        assert diff.mean() < 20  # JPEG noise; a misplaced tile is near 85
+    assert cache.wait(timeout=30)
+    assert sorted(int(level) for level in os.listdir(pyramid)) == list(range(11))
+
+    with pytest.raises(ValueError):
+        cache.get_tile(photo, 11, 0, 0)
+    with pytest.raises(ValueError):
+        cache.get_tile(photo, 9, 1, 0)
+
+
+def test_first_request_renders_only_its_tile(tmp_path, monkeypatch):
+    photo = str(tmp_path / "scan.png")
+    _noise((1200, 800)).save(photo)
+    cache = TileCache(str(tmp_path / "tiles"))
+    decodes = []
+    real_decode = cache._decode_level
+
+    def counting_decode(*args):
+        decodes.append(args)
+        return real_decode(*args)
+
+    jobs = []
+    monkeypatch.setattr(cache, "_decode_level", counting_decode)
+    monkeypatch.setattr(cache, "_tile_levels", lambda *args, **kw: jobs.append(kw))
+    level_dir = os.path.join(cache.cache_dir, cache.pyramid_name(photo), "11")
+
+    cache.get_tile(photo, 11, 2, 1)
+    assert os.listdir(level_dir) == ["2_1.jpg"]
+    # Other tiles of the level are cut from the image decoded once
+    cache.get_tile(photo, 11, 4, 3)
+    assert sorted(os.listdir(level_dir)) == ["2_1.jpg", "4_3.jpg"]
+    assert len(decodes) == len(jobs) == 1
+
+
+def test_cache_evicts_least_recently_used_pyramids(tmp_path):
+    photos = []
+    for i in range(3):
+        photo = str(tmp_path / f"p{i}.png")
+        _noise((300, 300)).save(photo)
+        photos.append(photo)
+    cache = TileCache(str(tmp_path / "tiles"))
+    cache.get_tile(photos[0], 9, 0, 0)
+    cache.wait()
+    one_pyramid = cache._total_bytes
+    cache.max_bytes = int(one_pyramid * 2.5)
+    cache.get_tile(photos[1], 9, 0, 0)
+    cache.wait()
+    cache.get_tile(photos[0], 9, 0, 0)  # Now the most recently used
+    cache.get_tile(photos[2], 9, 0, 0)
+    cache.wait()
+    assert sorted(os.listdir(cache.cache_dir)) == sorted(
+        cache.pyramid_name(photo) for photo in (photos[0], photos[2])
+    )
+
+    # A new instance finds the pyramids left on disk
+    reloaded = TileCache(cache.cache_dir)
+    assert reloaded._total_bytes == cache._total_bytes
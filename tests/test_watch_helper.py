@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.watch_helper import BACKEND_INOTIFY, PhotoWatcher
+
+
+def write(path):
+    with open(path, "wb") as f:
+        f.write(b"\xff\xd8\xff\xd9")
+
+
+@pytest.mark.parametrize("force_polling", [False, True])
+def test_watcher_applies_deltas(tmp_path, force_polling):
+    write(tmp_path / "b.jpg")
+    write(tmp_path / "notes.txt")
+    watcher = PhotoWatcher(
+        str(tmp_path), poll_interval=0.05, force_polling=force_polling
+    ).start()
+    try:
+        assert watcher.snapshot() == (0, ["b.jpg"])
+
+        write(tmp_path / "a.jpg")
+        write(tmp_path / "c.txt")
+        assert watcher.wait(0, timeout=5) > 0
+        version, photos = watcher.snapshot()
+        assert photos == ["a.jpg", "b.jpg"]
+
+        os.rename(tmp_path / "b.jpg", tmp_path / "z.jpg")
+        os.remove(tmp_path / "a.jpg")
+        for _ in range(50):
+            if watcher.snapshot()[1] == ["z.jpg"]:
+                break
+            watcher.wait(watcher.version, timeout=0.1)
+        assert watcher.snapshot()[1] == ["z.jpg"]
+
+        deltas = watcher.changes_since(version)
+        if watcher.backend == BACKEND_INOTIFY:
+            assert [delta["renamed"] for delta in deltas if delta["renamed"]] == [
+                [["b.jpg", "z.jpg"]]
+            ]
+        assert watcher.changes_since(watcher.version) == []
+        assert watcher.changes_since(watcher.version + 5) is None
+    finally:
+        watcher.stop()
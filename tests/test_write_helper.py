@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from PhotoTimeSleuth.Helpers.exif_helper import read_image_date
+from PhotoTimeSleuth.Helpers.image_helper import file_lock
+from PhotoTimeSleuth.Helpers.write_helper import MetadataWriter, WriteQueueFull
+
+
+def test_queued_writes_to_one_file_are_coalesced(tmp_path):
+    paths = []
+    for name in ("a.jpg", "b.jpg"):
+        Image.new("RGB", (32, 24)).save(tmp_path / name, format="JPEG")
+        paths.append(str(tmp_path / name))
+    writer = MetadataWriter(workers=1, max_pending=2)
+    try:
+        with file_lock(paths[0]):
+            # The worker takes the first write and waits for the lock
+            first = writer.submit(paths[0], "2001:01:01")
+            while writer.pending():
+                time.sleep(0.01)
+            second = writer.submit(paths[0], "2002:02:02")
+            third = writer.submit(paths[0], "2003:03:03")
+            other = writer.submit(paths[1], "2004:04:04")
+            with pytest.raises(WriteQueueFull):
+                writer.submit(str(tmp_path / "c.jpg"), "2005:05:05")
+            assert not first.done()
+
+        assert first.result(timeout=5)[0]
+        assert second.result(timeout=5) == third.result(timeout=5)
+        assert other.result(timeout=5)[0]
+        assert writer.coalesced == 1
+        assert read_image_date(paths[0]) == "2003:03:03 00:00:00"
+        assert read_image_date(paths[1]) == "2004:04:04 00:00:00"
+    finally:
+        writer.shutdown()
+
+
+def test_later_write_is_not_overtaken_by_an_earlier_one(tmp_path):
+    path = str(tmp_path / "x.jpg")
+    Image.new("RGB", (32, 24)).save(path, format="JPEG")
+    writer = MetadataWriter(workers=2)
+    try:
+        with file_lock(path):
+            # One worker takes the first write and waits for the lock
+            first = writer.submit(path, "2001:01:01")
+            while writer.pending():
+                time.sleep(0.01)
+            second = writer.submit(path, "2002:02:02")
+            # The idle worker leaves the second write queued behind the first
+            time.sleep(0.2)
+            assert writer.pending() == 1
+
+        assert first.result(timeout=5)[0]
+        assert second.result(timeout=5)[0]
+        assert read_image_date(path) == "2002:02:02 00:00:00"
+    finally:
+        writer.shutdown()